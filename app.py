@@ -1,30 +1,178 @@
+"""Flask 앱 생성
+
+앱은 모듈을 읽을 때 만들지 않고, `app` 속성에 처음 접근하거나(gunicorn app:app, flask --app app)
+get_app() 을 처음 호출할 때 프로세스에 하나만 만듭니다. create_app() 을 직접 부르는 테스트는 영향받지 않습니다.
+"""
 import os
-import sys
+import threading
+import time
 from flask import Flask
-from models import User
 from flask_login import LoginManager
-from firebase_config import get_db
+from cache import cache, default_shared_dir
+from audit import audit_log
+from instrumentation import db_metrics
+from compression import compress
+from fragments import fragment_cache
+from passwords import password_hasher
+from cascade import cascade_worker
+from posts_view import posts_view
+from ratelimit import rate_limiter, default_limit_dir
+from view_counter import view_counter
+from firebase_config import configure_backend
+from serving import serving_mode, init_async_runtime
 
-print(f"Current Python Version: {sys.version}")
+_app = None
+_app_lock = threading.Lock()
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     app.config['SECRET_KEY'] = 'dev-secret-key-12345'
+    # 데이터 백엔드: 'firestore' 또는 'memory' (네트워크 없이 테스트/프로파일링)
+    app.config['DATABASE_BACKEND'] = os.environ.get('DATABASE_BACKEND', 'firestore')
+    app.config['MEMORY_BACKEND_LATENCY'] = float(os.environ.get('MEMORY_BACKEND_LATENCY', 0.0))
+    # 서빙 모드: 'sync' (gthread) 또는 'async' (gevent, serving.py 참고)
+    app.config['SERVING_MODE'] = serving_mode()
+    # 홈 화면 피드 페이지 크기 및 고정 게시글 최대 개수
+    app.config['FEED_PAGE_SIZE'] = int(os.environ.get('FEED_PAGE_SIZE', 20))
+    app.config['FEED_PINNED_LIMIT'] = int(os.environ.get('FEED_PINNED_LIMIT', 10))
+    app.config['FEED_CACHE_TTL'] = int(os.environ.get('FEED_CACHE_TTL', 30))
+    # 피드 버전(meta/feed) 캐시 시간: 다른 인스턴스의 글 작성이 피드 캐시에 반영되기까지 최대 지연
+    app.config['FEED_VERSION_CACHE_TTL'] = int(os.environ.get('FEED_VERSION_CACHE_TTL', 5))
+    # 게시글 상세 화면의 댓글 페이지 크기
+    app.config['COMMENT_PAGE_SIZE'] = int(os.environ.get('COMMENT_PAGE_SIZE', 50))
+    # 관리자 전체 로그 화면 페이지 크기
+    app.config['LOG_PAGE_SIZE'] = int(os.environ.get('LOG_PAGE_SIZE', 50))
+    # 관리자 데이터 내보내기 시 한 번에 읽는 문서 수
+    app.config['EXPORT_PAGE_SIZE'] = int(os.environ.get('EXPORT_PAGE_SIZE', 500))
+
+    # 게시글 검색 (bigram 역색인): 페이지 크기, 토큰당 최대 postings 수, 결과 캐시 시간
+    app.config['SEARCH_PAGE_SIZE'] = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    app.config['SEARCH_MAX_POSTINGS'] = int(os.environ.get('SEARCH_MAX_POSTINGS', 2000))
+    app.config['SEARCH_CACHE_TTL'] = int(os.environ.get('SEARCH_CACHE_TTL', 60))
+
+    # 읽기 캐시 (프로세스 내 LRU + 워커 간 공유 /dev/shm), CACHE_SHARED_DIR='' 이면 공유 단계 비활성화
+    app.config['CACHE_ENABLED'] = os.environ.get('CACHE_ENABLED', '1') != '0'
+    app.config['CACHE_DEFAULT_TTL'] = int(os.environ.get('CACHE_DEFAULT_TTL', 60))
+    app.config['CACHE_LOCAL_MAX_ENTRIES'] = int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 512))
+    app.config['CACHE_SHARED_DIR'] = os.environ.get('CACHE_SHARED_DIR', default_shared_dir())
+    app.config['CACHE_SHARED_MAX_ENTRIES'] = int(os.environ.get('CACHE_SHARED_MAX_ENTRIES', 4096))
+    app.config['CACHE_SHARED_MAX_BYTES'] = int(os.environ.get('CACHE_SHARED_MAX_BYTES', 64 * 1024 * 1024))
+
+    # 앱 생성 시 관리자 계정 등 필수 데이터 준비 (완료 기록이 있으면 건너뜀)
+    # Firestore 는 배포 단계(`flask --app app provision`)에서 준비하므로 기본으로 끄고,
+    # 프로세스마다 비어 있는 인메모리 백엔드만 기본으로 켭니다.
+    app.config['PROVISION_ON_STARTUP'] = os.environ.get(
+        'PROVISION_ON_STARTUP', '1' if app.config['DATABASE_BACKEND'] == 'memory' else '0') != '0'
+    app.config['PROVISION_MARKER_PATH'] = os.environ.get(
+        'PROVISION_MARKER_PATH', os.path.join(os.path.dirname(default_shared_dir()), 'hyyum-provisioned'))
+    app.config['ADMIN_INITIAL_PASSWORD'] = os.environ.get('ADMIN_INITIAL_PASSWORD', 'admin123')
+
+    # 로그인 세션 사용자 캐시 유지 시간 (Firestore 콘솔에서 직접 바꾼 권한은 이 시간 안에 반영)
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # 감사 로그 비동기 일괄 기록 (AUDIT_LOG_ASYNC=0 이면 요청 안에서 바로 기록)
+    app.config['AUDIT_LOG_ASYNC'] = os.environ.get('AUDIT_LOG_ASYNC', '1') != '0'
+    app.config['AUDIT_LOG_QUEUE_SIZE'] = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', 1000))
+    app.config['AUDIT_LOG_BATCH_SIZE'] = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 100))
+    app.config['AUDIT_LOG_FLUSH_INTERVAL'] = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 2.0))
+    app.config['AUDIT_LOG_ENQUEUE_TIMEOUT'] = float(os.environ.get('AUDIT_LOG_ENQUEUE_TIMEOUT', 0.05))
+
+    # Firestore 호출 계측 (Server-Timing 헤더, /admin/metrics)
+    # 요청당 읽기 수가 DB_READ_BUDGET 을 넘으면 경고, DB_READ_BUDGET_STRICT=1 이면 500 (개발용)
+    app.config['DB_METRICS_ENABLED'] = os.environ.get('DB_METRICS_ENABLED', '1') != '0'
+    app.config['DB_READ_BUDGET'] = int(os.environ.get('DB_READ_BUDGET', 0))
+    app.config['DB_READ_BUDGET_STRICT'] = os.environ.get('DB_READ_BUDGET_STRICT', '0') == '1'
+
+    # 응답 압축 (Accept-Encoding 협상, brotli 패키지가 있으면 br 우선)과 스트리밍 렌더링 전송 단위(글자 수)
+    app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') != '0'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('STREAM_CHUNK_SIZE', 8192))
+
+    # 렌더링된 게시글 카드/댓글 조각 캐시 (프로세스별 LRU, 최대 바이트 수)
+    app.config['FRAGMENT_CACHE_ENABLED'] = os.environ.get('FRAGMENT_CACHE_ENABLED', '1') != '0'
+    app.config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+    app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+
+    # 비밀번호 해시: 방식(바꾸면 다음 로그인 때 재해시), 전용 프로세스 수(0 이면 요청 스레드에서 계산),
+    # 동시에 맡길 수 있는 작업 수와 빈자리를 기다리는 최대 시간(초, 0 이면 바로 503), 작업 완료를 기다리는 최대 시간(초, 넘으면 503)
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    app.config['PASSWORD_POOL_WORKERS'] = int(os.environ.get('PASSWORD_POOL_WORKERS', 2))
+    # 'process' 또는 'thread' (async 모드 기본값: gevent 가 막히지 않도록 네이티브 스레드에서 계산)
+    app.config['PASSWORD_POOL_KIND'] = os.environ.get(
+        'PASSWORD_POOL_KIND', 'thread' if app.config['SERVING_MODE'] == 'async' else 'process')
+    app.config['PASSWORD_POOL_MAX_PENDING'] = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 16))
+    app.config['PASSWORD_POOL_ACQUIRE_TIMEOUT'] = float(os.environ.get('PASSWORD_POOL_ACQUIRE_TIMEOUT', 0))
+    app.config['PASSWORD_POOL_TIMEOUT'] = float(os.environ.get('PASSWORD_POOL_TIMEOUT', 10.0))
+
+    # 삭제된 게시글 댓글 정리 워커: 배치당 삭제 수(최대 499), 배치 사이 휴식(초), 남은 작업 확인 주기(초),
+    # 작업 점유 시간(초, 워커가 죽으면 이 시간 뒤 다른 워커가 이어받음), 실패 시 최대 시도 횟수와 첫 재시도 대기(초)
+    app.config['CASCADE_WORKER_ENABLED'] = os.environ.get('CASCADE_WORKER_ENABLED', '1') != '0'
+    app.config['CASCADE_BATCH_SIZE'] = int(os.environ.get('CASCADE_BATCH_SIZE', 499))
+    app.config['CASCADE_BATCH_INTERVAL'] = float(os.environ.get('CASCADE_BATCH_INTERVAL', 0.5))
+    app.config['CASCADE_POLL_INTERVAL'] = float(os.environ.get('CASCADE_POLL_INTERVAL', 30.0))
+    app.config['CASCADE_LEASE_SECONDS'] = int(os.environ.get('CASCADE_LEASE_SECONDS', 60))
+    app.config['CASCADE_MAX_ATTEMPTS'] = int(os.environ.get('CASCADE_MAX_ATTEMPTS', 5))
+    app.config['CASCADE_RETRY_DELAY'] = float(os.environ.get('CASCADE_RETRY_DELAY', 30.0))
+
+    # posts 구체화 뷰 (워커마다 on_snapshot 리스너로 피드/게시글을 메모리에서 제공), 끊긴 뒤 뷰를 계속 쓸 최대 시간(초),
+    # 리스너 상태 확인 주기(초), 재연결 대기(초, 실패할 때마다 두 배, 최대값)
+    app.config['POSTS_VIEW_ENABLED'] = os.environ.get('POSTS_VIEW_ENABLED', '0') == '1'
+    app.config['POSTS_VIEW_MAX_STALENESS'] = float(os.environ.get('POSTS_VIEW_MAX_STALENESS', 30.0))
+    app.config['POSTS_VIEW_CHECK_INTERVAL'] = float(os.environ.get('POSTS_VIEW_CHECK_INTERVAL', 5.0))
+    app.config['POSTS_VIEW_RECONNECT_BASE'] = float(os.environ.get('POSTS_VIEW_RECONNECT_BASE', 1.0))
+    app.config['POSTS_VIEW_RECONNECT_MAX'] = float(os.environ.get('POSTS_VIEW_RECONNECT_MAX', 60.0))
+
+    # 쓰기 라우트 요청 수 제한 (토큰 버킷, ratelimit.py): 라우트별 한도 'N/second|minute|hour' (빈 값이면 제한 없음),
+    # 워커 간 공유 저장소 위치('' 이면 워커별)와 칸 수, X-Forwarded-For 를 붙이는 신뢰 프록시 수
+    # (0 이면 remote_addr. Procfile 과 functions/main.py 가 배포 환경에 맞는 값을 기본으로 넣음)
+    app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    app.config['RATE_LIMIT_LOGIN'] = os.environ.get('RATE_LIMIT_LOGIN', '10/minute')
+    app.config['RATE_LIMIT_LOGIN_ACCOUNT'] = os.environ.get('RATE_LIMIT_LOGIN_ACCOUNT', '30/hour')
+    app.config['RATE_LIMIT_SIGNUP'] = os.environ.get('RATE_LIMIT_SIGNUP', '5/minute')
+    app.config['RATE_LIMIT_POST'] = os.environ.get('RATE_LIMIT_POST', '5/minute')
+    app.config['RATE_LIMIT_COMMENT'] = os.environ.get('RATE_LIMIT_COMMENT', '10/minute')
+    app.config['RATE_LIMIT_SHARED_DIR'] = os.environ.get('RATE_LIMIT_SHARED_DIR', default_limit_dir())
+    app.config['RATE_LIMIT_SHARED_SLOTS'] = int(os.environ.get('RATE_LIMIT_SHARED_SLOTS', 65536))
+    app.config['RATE_LIMIT_TRUSTED_PROXIES'] = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+
+    # 게시글 조회 수 (view_counter.py): 샤드 수(늘리기만 가능), 메모리 집계를 샤드에 기록하는 주기(초, 비정상 종료 시 최대 손실 구간),
+    # 샤드 합계를 게시글의 view_count 에 옮기는 주기(초)
+    app.config['VIEW_COUNTER_ENABLED'] = os.environ.get('VIEW_COUNTER_ENABLED', '1') != '0'
+    app.config['VIEW_COUNTER_SHARDS'] = int(os.environ.get('VIEW_COUNTER_SHARDS', 8))
+    app.config['VIEW_COUNTER_FLUSH_INTERVAL'] = float(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', 10.0))
+    app.config['VIEW_COUNTER_ROLLUP_INTERVAL'] = float(os.environ.get('VIEW_COUNTER_ROLLUP_INTERVAL', 60.0))
+
+    if test_config:
+        app.config.update(test_config)
+
+    # 계측 설정을 먼저 읽어야 새로 만드는 클라이언트가 계측 래퍼로 감싸집니다.
+    db_metrics.init_app(app)
+    if app.config['SERVING_MODE'] == 'async':
+        # gRPC 채널(Firestore 클라이언트)을 만들기 전에 gevent 연동을 켜야 합니다.
+        init_async_runtime()
+    configure_backend(app.config['DATABASE_BACKEND'], latency=app.config['MEMORY_BACKEND_LATENCY'])
+    cache.init_app(app)
+    audit_log.init_app(app)
+    compress.init_app(app)
+    fragment_cache.init_app(app)
+    password_hasher.init_app(app)
+    cascade_worker.init_app(app)
+    posts_view.init_app(app)
+    rate_limiter.init_app(app)
+    view_counter.init_app(app)
     
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
+    from auth import load_user_cached
+
     @login_manager.user_loader
     def load_user(user_id):
-        db_fs = get_db()
-        if not db_fs:
-            return None
-        user_doc = db_fs.collection('users').document(user_id).get()
-        if user_doc.exists:
-            return User.from_dict(user_doc.to_dict(), user_doc.id)
-        return None
+        return load_user_cached(user_id)
 
     # blueprint for auth routes in our app
     from auth import auth as auth_blueprint
@@ -34,10 +182,51 @@ def create_app():
     from main import main as main_blueprint
     app.register_blueprint(main_blueprint)
 
+    import provisioning
+    provisioning.init_app(app)
+
     return app
 
-app = create_app()
+def get_app(config=None):
+    """이 프로세스의 앱을 반환합니다. (처음 호출 시 config 로 생성, 여러 스레드가 동시에 불러도 한 번만 생성)"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app(config)
+    return _app
+
+def warm_up(app):
+    """첫 요청이 기다리지 않도록 템플릿을 미리 컴파일하고 Firestore 채널을 미리 엽니다.
+
+    WARMUP_ON_STARTUP=1 일 때 진입점(functions/main.py, gunicorn.conf.py)이 워커/인스턴스마다 호출합니다.
+    단계별 소요 시간(ms)을 반환합니다.
+    """
+    from firebase_config import get_db
+    timings = {}
+
+    start = time.perf_counter()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    timings['templates'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    try:
+        db_fs = get_db()
+        if db_fs:
+            # 채널 연결과 인증 토큰 발급은 첫 RPC 때 일어나므로, 피드가 매번 읽는 작은 문서를 한 번 읽습니다.
+            db_fs.collection('meta').document('feed').get()
+    except Exception as e:
+        print(f"Error warming up Firestore: {e}")
+    timings['firestore'] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
+
+def __getattr__(name):
+    # `from app import app`, `gunicorn app:app` 은 처음 접근할 때 앱을 만듭니다.
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    get_app().run(host='0.0.0.0', port=port, debug=True)
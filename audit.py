@@ -0,0 +1,154 @@
+"""감사 로그(logs 컬렉션) 비동기 일괄 기록기
+
+요청 처리 스레드는 record()로 큐에 넣기만 하고 바로 응답합니다.
+백그라운드 스레드가 큐를 비우며 Firestore WriteBatch 단위로 커밋하고,
+배치 크기에 도달하거나 flush 간격이 지나면 기록합니다.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from repositories import get_repos, MAX_BATCH_WRITES
+from models import get_now_kst
+
+# 라우트들이 기록하는 action 값 (관리자 로그 필터 목록용)
+LOG_ACTIONS = (
+    '로그인', '회원가입', '게시글 작성', '게시글 수정', '게시글 삭제',
+    '게시글 고정', '게시글 고정 해제', '댓글 작성', '댓글 삭제',
+    '관리자 권한 부여', '관리자 권한 해제', '데이터 내보내기',
+)
+
+class AuditLogWriter:
+    """제한된 크기의 큐 + 백그라운드 배치 기록 스레드"""
+
+    def __init__(self, app=None):
+        self.async_mode = True
+        self.batch_size = 100
+        self.flush_interval = 2.0
+        self.enqueue_timeout = 0.05
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(('enqueued', 'written', 'dropped', 'delayed', 'failed_batches'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.async_mode = config.get('AUDIT_LOG_ASYNC', True)
+        self.batch_size = min(config.get('AUDIT_LOG_BATCH_SIZE', 100), MAX_BATCH_WRITES)
+        self.flush_interval = config.get('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        self.enqueue_timeout = config.get('AUDIT_LOG_ENQUEUE_TIMEOUT', 0.05)
+        self._queue = queue.Queue(maxsize=config.get('AUDIT_LOG_QUEUE_SIZE', 1000))
+        app.extensions['audit_log'] = self
+
+    def _incr(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def record(self, action, user_id, user_name, details):
+        """로그 항목을 기록 큐에 넣습니다. 예외를 던지지 않습니다."""
+        entry = {
+            'action': action,
+            'user_id': user_id,
+            'user_name': user_name,
+            'details': details,
+            'timestamp': get_now_kst()
+        }
+        if not self.async_mode:
+            self._commit([entry])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # 백프레셔: 큐가 가득 차면 잠깐 기다리고, 그래도 자리가 없으면 버립니다.
+            self._incr('delayed')
+            try:
+                self._queue.put(entry, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self._incr('dropped')
+                print(f"Audit log queue full, dropped entry: {action}")
+                return
+        self._incr('enqueued')
+
+    def _ensure_started(self):
+        # fork 된 워커에서는 부모의 스레드가 없으므로 pid 가 바뀌면 다시 시작합니다.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # 부모 프로세스의 큐 잠금 상태를 물려받지 않도록 새 큐를 만듭니다.
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                # flush 요청: 모아 둔 항목을 즉시 기록하고 알립니다.
+                self._commit(pending)
+                pending, deadline = [], None
+                item.set()
+                continue
+            if item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                self._commit(pending)
+                pending, deadline = [], None
+
+    def _commit(self, entries):
+        if not entries:
+            return
+        repos = get_repos()
+        if not repos:
+            self._incr('dropped', len(entries))
+            return
+        for start in range(0, len(entries), MAX_BATCH_WRITES):
+            chunk = entries[start:start + MAX_BATCH_WRITES]
+            try:
+                self._incr('written', repos.logs.add_many(chunk))
+            except Exception as e:
+                self._incr('failed_batches')
+                self._incr('dropped', len(chunk))
+                print(f"Error writing audit logs: {e}")
+
+    def flush(self, timeout=5.0):
+        """큐에 쌓인 로그를 모두 기록할 때까지 기다립니다. (워커 종료 시 자동 호출)"""
+        if not self.async_mode or self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        return stats
+
+audit_log = AuditLogWriter()
@@ -1,57 +1,83 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, get_now_kst
-from firebase_config import get_db
-from datetime import datetime
+from repositories import get_repos, UsernameTaken
+from cache import cache
+from audit import audit_log
+from passwords import password_hasher, PasswordHasherBusy
+from ratelimit import rate_limiter
 
 auth = Blueprint('auth', __name__)
 
+def load_user_cached(user_id):
+    """Flask-Login 세션 사용자를 프로세스 내 TTL 캐시에서 먼저 찾고, 없을 때만 Firestore를 조회합니다.
+
+    비밀번호 해시가 담긴 객체이므로 공유 메모리 단계에는 저장하지 않습니다.
+    권한/프로필이 바뀌면 invalidate_user() 로 모든 워커의 캐시를 무효화합니다.
+    """
+    def load():
+        repos = get_repos()
+        if not repos:
+            return None
+        return repos.users.get(user_id)
+
+    return cache.get_or_load(f'user:{user_id}', load,
+                             ttl=current_app.config['USER_CACHE_TTL'],
+                             namespaces=(f'user:{user_id}',), shared=False)
+
+def invalidate_user(user_id):
+    cache.invalidate(f'user:{user_id}')
+
+def busy_response(template):
+    """해시 작업이 밀려 있을 때 기다리지 않고 바로 거절합니다."""
+    flash('요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요.')
+    return render_template(template), 503, {'Retry-After': '2'}
+
 @auth.route('/login')
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     return render_template('login.html')
 
+def login_account_key():
+    """대상 아이디별 로그인 한도 키 (아이디가 비었으면 클라이언트 키로 셈)"""
+    username = (request.form.get('username') or '').strip().lower()
+    return f"account:{username}" if username else None
+
 @auth.route('/login', methods=['POST'])
+@rate_limiter.limit('login', template='login.html')
+@rate_limiter.limit('login_account', template='login.html', key=login_account_key)
 def login_post():
     username = request.form.get('username')
     password = request.form.get('password')
     remember = True if request.form.get('remember') else False
 
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         flash('데이터베이스 연동 설정이 필요합니다.')
         return redirect(url_for('auth.login'))
 
     # Firestore에서 사용자 조회
-    users_ref = db_fs.collection('users')
-    query = users_ref.where('username', '==', username).limit(1).stream()
-    user_doc = next(query, None)
-
-    if not user_doc:
+    user = repos.users.find_by_username(username)
+    try:
+        ok, new_hash = password_hasher.verify(user.password, password) if user else (False, None)
+    except PasswordHasherBusy:
+        return busy_response('login.html')
+    if not ok:
         flash('로그인 정보가 올바르지 않습니다.')
         return redirect(url_for('auth.login'))
 
-    user_data = user_doc.to_dict()
-    if not check_password_hash(user_data.get('password'), password):
-        flash('로그인 정보가 올바르지 않습니다.')
-        return redirect(url_for('auth.login'))
+    if new_hash:
+        # 해시 설정(PASSWORD_HASH_METHOD)이 바뀌었으면 로그인 성공 시 새 설정으로 교체합니다.
+        try:
+            repos.users.update(user.id, {'password': new_hash})
+            invalidate_user(user.id)
+        except Exception as e:
+            print(f"Error re-hashing password for {user.id}: {e}")
 
-    user = User.from_dict(user_data, user_doc.id)
     login_user(user, remember=remember)
     
     # [LOG] 로그인 기록
-    try:
-        db_fs.collection('logs').add({
-            'action': '로그인',
-            'user_id': user.id,
-            'user_name': user.name,
-            'details': f"'{user.username}' 계정으로 로그인했습니다.",
-            'timestamp': get_now_kst()
-        })
-    except Exception as e:
-        print(f"Error logging login: {e}")
+    audit_log.record('로그인', user.id, user.name, f"'{user.username}' 계정으로 로그인했습니다.")
 
     return redirect(url_for('main.index'))
 
@@ -62,45 +88,40 @@ def signup():
     return render_template('signup.html')
 
 @auth.route('/signup', methods=['POST'])
+@rate_limiter.limit('signup', template='signup.html')
 def signup_post():
     username = request.form.get('username')
     name = request.form.get('name')
     password = request.form.get('password')
 
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         flash('데이터베이스 연동 설정이 필요합니다.')
         return redirect(url_for('auth.signup'))
 
-    # 중복 확인
-    users_ref = db_fs.collection('users')
-    query = users_ref.where('username', '==', username).limit(1).stream()
-    if next(query, None):
+    if not username or not name or not password:
+        flash('모든 항목을 입력해주세요.')
+        return redirect(url_for('auth.signup'))
+
+    # 중복 확인 (해시 계산 전에 빠르게 거르고, 동시 가입은 create 트랜잭션이 막습니다)
+    if repos.users.username_exists(username):
         flash('이미 존재하는 아이디입니다.')
         return redirect(url_for('auth.signup'))
 
+    try:
+        password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return busy_response('signup.html')
+
     # 사용자 생성
-    new_user_data = {
-        'username': username,
-        'name': name,
-        'password': generate_password_hash(password, method='pbkdf2:sha256'),
-        'is_admin': False,
-        'created_at': get_now_kst()
-    }
-    
-    new_user_ref = db_fs.collection('users').add(new_user_data)
+    try:
+        new_user_id = repos.users.create(username, name, password_hash)
+    except UsernameTaken:
+        flash('이미 존재하는 아이디입니다.')
+        return redirect(url_for('auth.signup'))
     
     # [LOG] 회원가입 기록
-    try:
-        db_fs.collection('logs').add({
-            'action': '회원가입',
-            'user_id': new_user_ref[1].id,
-            'user_name': name,
-            'details': f"새로운 회원 '{username}'이 가입했습니다.",
-            'timestamp': get_now_kst()
-        })
-    except Exception as e:
-        print(f"Error logging signup: {e}")
+    audit_log.record('회원가입', new_user_id, name, f"새로운 회원 '{username}'이 가입했습니다.")
 
     flash('회원가입이 완료되었습니다! 로그인해주세요.')
     return redirect(url_for('auth.login'))
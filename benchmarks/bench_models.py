@@ -0,0 +1,123 @@
+"""모델 변환(hydration) 마이크로 벤치마크
+
+Firestore 스냅샷 N 개를 모델 목록으로 바꾸는 데 드는 객체당 시간과 메모리를
+이전 방식(인스턴스 __dict__ + 필드마다 즉시 KST 변환)과 현재 models 의 __slots__ + 지연 변환으로 비교합니다.
+
+사용법:
+    python benchmarks/bench_models.py [문서 수]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Log, User, hydrate, to_kst, get_now_kst  # noqa: E402
+
+class Snapshot:
+    """DocumentSnapshot 흉내 (id, to_dict 만 사용)"""
+    __slots__ = ('id', '_data')
+
+    def __init__(self, id, data):
+        self.id = id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+# --- 이전 방식 (비교 기준) ---
+
+class LegacyLog:
+    def __init__(self, id, action, user_id, user_name, details, timestamp=None):
+        self.id = id
+        self.action = action
+        self.user_id = user_id
+        self.user_name = user_name
+        self.details = details
+        self.timestamp = timestamp or get_now_kst()
+
+    @staticmethod
+    def from_dict(source, id):
+        return LegacyLog(
+            id=id,
+            action=source.get('action'),
+            user_id=source.get('user_id'),
+            user_name=source.get('user_name'),
+            details=source.get('details'),
+            timestamp=to_kst(source.get('timestamp'))
+        )
+
+class LegacyUser:
+    def __init__(self, id, username, name, password, is_admin=False, created_at=None):
+        self.id = id
+        self.username = username
+        self.name = name
+        self.password = password
+        self.is_admin = is_admin
+        self.created_at = created_at or get_now_kst()
+
+    @staticmethod
+    def from_dict(source, id):
+        return LegacyUser(
+            id=id,
+            username=source.get('username'),
+            name=source.get('name'),
+            password=source.get('password'),
+            is_admin=source.get('is_admin', False),
+            created_at=to_kst(source.get('created_at'))
+        )
+
+def legacy_hydrate(model, snapshots):
+    return [model.from_dict(snapshot.to_dict(), snapshot.id) for snapshot in snapshots]
+
+# --- 데이터 ---
+
+def make_snapshots(count):
+    # Firestore 는 시각을 UTC 로 돌려주므로 KST 변환이 필요한 값으로 만듭니다.
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    logs = [Snapshot(f'log{i:08d}', {
+        'action': '로그인', 'user_id': f'user{i % 100}', 'user_name': f'사용자{i % 100}',
+        'details': f"'user{i % 100}' 계정으로 로그인했습니다.", 'timestamp': base + timedelta(seconds=i),
+    }) for i in range(count)]
+    users = [Snapshot(f'user{i:08d}', {
+        'username': f'user{i}', 'name': f'사용자{i}', 'password': 'pbkdf2:sha256:600000$salt$' + 'f' * 64,
+        'is_admin': i % 50 == 0, 'created_at': base + timedelta(minutes=i),
+    }) for i in range(count)]
+    return logs, users
+
+def measure(hydrator, model, snapshots, repeat=5):
+    """(객체당 마이크로초, 객체당 바이트) — 시간은 repeat 번 중 최솟값"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hydrator(model, snapshots)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = hydrator(model, snapshots)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del objects
+    return best / len(snapshots) * 1e6, allocated / len(snapshots)
+
+def main(count=20000):
+    logs, users = make_snapshots(count)
+    cases = [
+        ('Log', logs, LegacyLog, Log),
+        ('User', users, LegacyUser, User),
+    ]
+    print(f"{count} documents per model")
+    print(f"{'model':<6} {'variant':<8} {'us/obj':>8} {'bytes/obj':>10}")
+    for name, snapshots, legacy, current in cases:
+        legacy_time, legacy_mem = measure(legacy_hydrate, legacy, snapshots)
+        time_, mem = measure(hydrate, current, snapshots)
+        print(f"{name:<6} {'before':<8} {legacy_time:8.2f} {legacy_mem:10.0f}")
+        print(f"{name:<6} {'after':<8} {time_:8.2f} {mem:10.0f}"
+              f"   ({legacy_time / time_:.2f}x faster, {1 - mem / legacy_mem:.0%} less memory)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
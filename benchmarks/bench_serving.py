@@ -0,0 +1,119 @@
+"""서빙 모드 비교 벤치마크 (sync: gthread vs async: gevent)
+
+각 모드로 gunicorn 워커 하나를 띄우고, 인메모리 백엔드에 RPC 마다 지연(--latency)을 주어
+Firestore 왕복을 흉내낸 뒤, 동시 클라이언트 수(--concurrency)를 바꿔 가며 처리량과 지연 시간을 잽니다.
+캐시를 끄므로 요청마다 피드 조회 RPC 가 실제로 일어납니다.
+
+사용법 (gunicorn, gevent 가 설치되어 있어야 합니다):
+    pip install -r requirements-async.txt
+    python benchmarks/bench_serving.py --latency 0.05 --concurrency 8 64 256
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(mode, port, latency, threads, connections):
+    env = dict(os.environ,
+               SERVING_MODE=mode,
+               DATABASE_BACKEND='memory',
+               MEMORY_BACKEND_LATENCY=str(latency),
+               CACHE_ENABLED='0',
+               COMPRESS_ENABLED='0',
+               CASCADE_WORKER_ENABLED='0',
+               WEB_THREADS=str(threads),
+               WORKER_CONNECTIONS=str(connections),
+               GUNICORN_WORKERS='1')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn ({mode}) exited with {process.returncode}")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"gunicorn ({mode}) did not start")
+
+def run_load(port, concurrency, duration):
+    """(초당 요청 수, p50 ms, p99 ms, 오류 수)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local, failed = [], 0
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', '/')
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    if not latencies:
+        return 0.0, 0.0, 0.0, errors[0]
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return len(latencies) / duration, p50, p99, errors[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='RPC 당 지연(초)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256], help='동시 클라이언트 수')
+    parser.add_argument('--duration', type=float, default=10.0, help='측정 시간(초)')
+    parser.add_argument('--threads', type=int, default=8, help='sync 모드 워커 스레드 수')
+    parser.add_argument('--connections', type=int, default=500, help='async 모드 워커 동시 연결 수')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'], choices=['sync', 'async'])
+    args = parser.parse_args()
+
+    print(f"RPC latency {args.latency * 1000:.0f} ms, {args.duration:.0f}s per run, 1 worker")
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for mode in args.modes:
+        port = free_port()
+        server = start_server(mode, port, args.latency, args.threads, args.connections)
+        try:
+            run_load(port, 4, 1.0)  # 워밍업
+            for concurrency in args.concurrency:
+                rps, p50, p99, errors = run_load(port, concurrency, args.duration)
+                print(f"{mode:<6} {concurrency:>7} {rps:8.1f} {p50:8.1f} {p99:8.1f} {errors:>6}")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""콜드 스타트 벤치마크 (import 시간, 앱 생성 시간, 첫 요청 지연)
+
+새 파이썬 프로세스를 --runs 번 띄워 매번 다음을 잽니다.
+- import: `import app` 에 걸린 시간
+- create: 앱 생성(get_app) 시간
+- warmup: --warmup 을 주었을 때 warm_up() 시간 (템플릿 컴파일, Firestore 채널 연결)
+- first: 첫 요청(--path) 응답 시간, second: 같은 요청 두 번째 응답 시간
+
+릴리스마다 비교할 수 있도록 --json 을 주면 중앙값을 한 줄 JSON 으로 출력합니다.
+기본은 인메모리 백엔드이며, 실제 Firestore 채널 비용을 보려면 자격 증명을 설정하고 --backend firestore 를 줍니다.
+
+사용법:
+    python benchmarks/bench_startup.py --runs 10 --path /login
+    python benchmarks/bench_startup.py --warmup --json >> startup-history.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ('import', 'create', 'warmup', 'first', 'second')
+
+def measure(path, warmup):
+    """(자식 프로세스) 단계별 시간(ms)을 JSON 으로 출력합니다."""
+    timings = {}
+    start = time.perf_counter()
+    import app as app_module
+    timings['import'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    app = app_module.get_app()
+    timings['create'] = (time.perf_counter() - start) * 1000
+
+    if warmup:
+        start = time.perf_counter()
+        app_module.warm_up(app)
+        timings['warmup'] = (time.perf_counter() - start) * 1000
+
+    client = app.test_client()
+    for step in ('first', 'second'):
+        start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        timings[step] = (time.perf_counter() - start) * 1000
+    print(json.dumps(timings))
+
+def run_child(args):
+    env = dict(os.environ,
+               DATABASE_BACKEND=args.backend,
+               PROVISION_ON_STARTUP='0',
+               CASCADE_WORKER_ENABLED='0',
+               AUDIT_LOG_ASYNC='0',
+               CACHE_SHARED_DIR='')
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--path', args.path]
+    if args.warmup:
+        command.append('--warmup')
+    output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    # 앱이 찍는 로그 다음의 마지막 줄이 측정 결과
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='측정할 프로세스 수')
+    parser.add_argument('--path', default='/login', help='첫 요청 경로')
+    parser.add_argument('--backend', default='memory', choices=['memory', 'firestore'])
+    parser.add_argument('--warmup', action='store_true', help='첫 요청 전에 warm_up() 실행')
+    parser.add_argument('--json', action='store_true', help='중앙값을 한 줄 JSON 으로 출력')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        measure(args.path, args.warmup)
+        return
+
+    runs = [run_child(args) for _ in range(args.runs)]
+    steps = [step for step in STEPS if step in runs[0]]
+    medians = {step: round(statistics.median(run[step] for run in runs), 1) for step in steps}
+    if args.json:
+        print(json.dumps(dict(medians, runs=args.runs, path=args.path, backend=args.backend,
+                              warmed_up=args.warmup, python=sys.version.split()[0])))
+        return
+    print(f"{args.runs} runs, backend={args.backend}, path={args.path}, warmup={args.warmup}")
+    print(f"{'step':<8} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for step in steps:
+        values = [run[step] for run in runs]
+        print(f"{step:<8} {medians[step]:10.1f} {min(values):8.1f} {max(values):8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""읽기 경로용 2단계 캐시
+
+1단계: 프로세스 내부 LRU (TTL, 최대 항목 수 제한)
+2단계: 같은 호스트의 모든 gunicorn 워커가 공유하는 tmpfs(/dev/shm) 파일 저장소
+       (pickle 로 읽으므로 이 프로세스 사용자만 쓸 수 있는 디렉터리일 때만 사용)
+
+무효화는 네임스페이스 버전으로 처리합니다. 쓰기 라우트가 `invalidate('feed')`처럼
+네임스페이스 버전을 바꾸면, 그 네임스페이스에 속한 키는 모든 워커에서 즉시 미스가 됩니다.
+"""
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_MISS = object()
+
+def default_shared_dir():
+    """/dev/shm 이 있으면 그곳을, 없으면 임시 디렉터리를 공유 캐시 위치로 사용합니다."""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'hyyum-cache')
+
+def ensure_private_dir(path):
+    """path 를 이 프로세스 사용자만 쓸 수 있는 디렉터리(0700)로 만듭니다.
+
+    다른 사용자가 먼저 만들었거나 다른 사용자도 쓸 수 있으면 PermissionError 를 던집니다.
+    (공유 디렉터리의 파일을 pickle 로 읽으므로, 다른 사용자가 넣은 파일은 워커 안에서 코드를 실행할 수 있음)
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a directory owned by uid {os.getuid()}")
+    if info.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+
+class LocalLRU:
+    """TTL과 최대 항목 수를 가진 스레드 안전 LRU 캐시입니다."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISS):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class SharedMemoryStore:
+    """tmpfs 디렉터리에 pickle 파일로 값을 저장하는 워커 간 공유 저장소입니다.
+
+    쓰기는 임시 파일 + os.replace 로 원자적으로 처리하므로 별도의 잠금이 필요 없습니다.
+    항목 수나 전체 크기가 한도를 넘으면 가장 오래 사용되지 않은(mtime) 파일부터 지웁니다.
+    """
+
+    # 몇 번의 쓰기마다 크기 한도를 점검할지
+    EVICT_CHECK_INTERVAL = 32
+
+    def __init__(self, directory, max_entries=4096, max_bytes=64 * 1024 * 1024, max_value_bytes=1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_value_bytes = max_value_bytes
+        self._entries_dir = os.path.join(directory, 'entries')
+        self._versions_dir = os.path.join(directory, 'versions')
+        for path in (directory, self._entries_dir, self._versions_dir):
+            ensure_private_dir(path)
+        self._writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _filename(key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _write_atomic(self, path, payload):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def get(self, key, default=_MISS):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """(값, 남은 TTL 초) 를 반환합니다. 없거나 만료되었으면 None"""
+        path = os.path.join(self._entries_dir, self._filename(key))
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 깨진 파일은 지우고 미스로 처리합니다.
+            self._unlink(path)
+            return None
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self._unlink(path)
+            return None
+        try:
+            # mtime 갱신으로 LRU 순서를 유지합니다.
+            os.utime(path)
+        except OSError:
+            pass
+        return value, remaining
+
+    def set(self, key, value, ttl):
+        payload = pickle.dumps((time.time() + ttl, value), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_value_bytes:
+            return False
+        self._write_atomic(os.path.join(self._entries_dir, self._filename(key)), payload)
+        self._writes += 1
+        if self._writes % self.EVICT_CHECK_INTERVAL == 0:
+            self.evict()
+        return True
+
+    def delete(self, key):
+        self._unlink(os.path.join(self._entries_dir, self._filename(key)))
+
+    def evict(self):
+        """항목 수/전체 크기 한도를 넘으면 오래된 항목을 90% 수준까지 제거합니다."""
+        entries = []
+        total_bytes = 0
+        with os.scandir(self._entries_dir) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+        if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+            return 0
+        entries.sort()
+        target_count = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if len(entries) - removed <= target_count and total_bytes <= target_bytes:
+                break
+            self._unlink(path)
+            total_bytes -= size
+            removed += 1
+        self.evictions += removed
+        return removed
+
+    def version(self, namespace):
+        try:
+            with open(os.path.join(self._versions_dir, self._filename(namespace)), 'rb') as f:
+                return f.read().decode('ascii')
+        except FileNotFoundError:
+            return '0'
+
+    def bump(self, namespace):
+        # 증가 대신 임의 토큰을 기록하므로 동시에 bump 해도 잠금 없이 안전합니다.
+        self._write_atomic(os.path.join(self._versions_dir, self._filename(namespace)),
+                           os.urandom(8).hex().encode('ascii'))
+
+    def clear(self):
+        for directory in (self._entries_dir, self._versions_dir):
+            with os.scandir(directory) as it:
+                for entry in it:
+                    self._unlink(entry.path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+class Cache:
+    """LocalLRU 와 SharedMemoryStore 를 묶은 캐시 (Flask 확장 형태)"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.default_ttl = 30
+        self.local = LocalLRU()
+        self.shared = None
+        self._local_versions = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self.reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('CACHE_ENABLED', True)
+        self.default_ttl = config.get('CACHE_DEFAULT_TTL', 30)
+        self.local = LocalLRU(config.get('CACHE_LOCAL_MAX_ENTRIES', 512))
+        self._local_versions = {}
+        self.shared = None
+        shared_dir = config.get('CACHE_SHARED_DIR')
+        if self.enabled and shared_dir:
+            try:
+                self.shared = SharedMemoryStore(
+                    shared_dir,
+                    max_entries=config.get('CACHE_SHARED_MAX_ENTRIES', 4096),
+                    max_bytes=config.get('CACHE_SHARED_MAX_BYTES', 64 * 1024 * 1024),
+                )
+            except OSError as e:
+                print(f"Shared cache disabled ({shared_dir}): {e}")
+        app.extensions['cache'] = self
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _versioned_key(self, key, namespaces):
+        if not namespaces:
+            return key
+        if self.shared is not None:
+            versions = [self.shared.version(ns) for ns in namespaces]
+        else:
+            versions = [self._local_versions.get(ns, '0') for ns in namespaces]
+        return f"{key}|{'.'.join(versions)}"
+
+    def get(self, key, namespaces=(), shared=True, default=None):
+        value = self._lookup(key, namespaces, shared)
+        return default if value is _MISS else value
+
+    def _lookup(self, key, namespaces, shared):
+        if not self.enabled:
+            return _MISS
+        full_key = self._versioned_key(key, namespaces)
+        value = self.local.get(full_key)
+        if value is not _MISS:
+            self._incr('local_hits')
+            return value
+        if shared and self.shared is not None:
+            entry = self.shared.get_entry(full_key)
+            if entry is not None:
+                value, remaining = entry
+                self._incr('shared_hits')
+                # 공유 단계의 남은 시간만큼만 보관합니다. (짧은 TTL 항목이 워커마다 더 오래 남지 않도록)
+                self.local.set(full_key, value, remaining)
+                return value
+        self._incr('misses')
+        return _MISS
+
+    def set(self, key, value, ttl=None, namespaces=(), shared=True):
+        if not self.enabled:
+            return
+        ttl = ttl or self.default_ttl
+        full_key = self._versioned_key(key, namespaces)
+        self.local.set(full_key, value, ttl)
+        if shared and self.shared is not None:
+            try:
+                self.shared.set(full_key, value, ttl)
+            except Exception as e:
+                print(f"Error writing shared cache: {e}")
+        self._incr('sets')
+
+    def get_or_load(self, key, loader, ttl=None, namespaces=(), shared=True):
+        """캐시에 있으면 반환하고, 없으면 loader() 결과를 저장 후 반환합니다. (None 은 저장하지 않음)"""
+        value = self._lookup(key, namespaces, shared)
+        if value is not _MISS:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl, namespaces, shared)
+        return value
+
+    def invalidate(self, *namespaces):
+        """네임스페이스 버전을 바꿔 해당 키들을 모든 워커에서 무효화합니다."""
+        for ns in namespaces:
+            if self.shared is not None:
+                self.shared.bump(ns)
+            else:
+                self._local_versions[ns] = os.urandom(8).hex()
+            self._incr('invalidations')
+
+    def clear(self):
+        self.local.clear()
+        self._local_versions.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = dict.fromkeys(('local_hits', 'shared_hits', 'misses', 'sets', 'invalidations'), 0)
+
+    def stats(self):
+        """현재 워커의 캐시 적중/미스 카운터를 반환합니다."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        stats['shared_enabled'] = self.shared is not None
+        stats['shared_evictions'] = self.shared.evictions if self.shared is not None else 0
+        stats['pid'] = os.getpid()
+        return stats
+
+cache = Cache()
@@ -0,0 +1,149 @@
+"""삭제된 게시글의 댓글과 조회 수 샤드 정리 (백그라운드 cascade 작업)
+
+게시글 삭제는 jobs 문서만 등록하고 바로 응답합니다. (repositories.PostRepository.delete)
+워커 스레드가 작업을 lease 로 맡아 댓글을 트랜잭션 단위(최대 499건 + 진행 기록 1건, lease 확인 포함)로 지우고
+(마지막 배치 전에 조회 수 샤드도 지움),
+배치 사이에 CASCADE_BATCH_INTERVAL 만큼 쉬어 요청 처리와 Firestore 쓰기 한도를 나눠 씁니다.
+
+워커가 도중에 죽어도 진행 상황은 jobs 문서에 남아 있으므로, lease 가 끝난 뒤 어느 워커든 이어서 처리합니다.
+등록 직후에는 깨워서 바로 처리합니다. CASCADE_POLL_INTERVAL 마다 남은 작업을 확인하는 감시 스레드는
+gunicorn 워커에서만 돌립니다. (gunicorn.conf.py 의 post_worker_init 이 start() 호출)
+Functions 인스턴스처럼 감시 스레드가 없는 프로세스에서는 wake() 가 남은 작업을 한 번 처리하고 끝나는 스레드를 띄웁니다.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from repositories import get_repos, MAX_BATCH_WRITES
+
+class CascadeWorker:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.batch_size = MAX_BATCH_WRITES - 1
+        self.batch_interval = 0.5
+        self.poll_interval = 30.0
+        self.lease_seconds = 60
+        self.max_attempts = 5
+        self.retry_delay = 30.0
+        self.owner = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._polling = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(('jobs_completed', 'jobs_failed', 'comments_deleted', 'batches', 'leases_lost'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('CASCADE_WORKER_ENABLED', True)
+        # 진행 기록 1건이 같은 배치에 들어가므로 삭제는 한도보다 1건 적게 담습니다.
+        self.batch_size = max(1, min(config.get('CASCADE_BATCH_SIZE', MAX_BATCH_WRITES - 1), MAX_BATCH_WRITES - 1))
+        self.batch_interval = config.get('CASCADE_BATCH_INTERVAL', 0.5)
+        self.poll_interval = config.get('CASCADE_POLL_INTERVAL', 30.0)
+        self.lease_seconds = config.get('CASCADE_LEASE_SECONDS', 60)
+        self.max_attempts = config.get('CASCADE_MAX_ATTEMPTS', 5)
+        self.retry_delay = config.get('CASCADE_RETRY_DELAY', 30.0)
+        app.extensions['cascade_worker'] = self
+
+    def _incr(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def start(self):
+        """이 프로세스에서 주기적으로 남은 작업을 확인하는 감시 스레드를 시작합니다. (gunicorn 워커마다 한 번)"""
+        if self.enabled:
+            self._ensure_started(poll=True)
+
+    def wake(self):
+        """새 작업이 등록되었음을 알려 다음 확인 주기를 기다리지 않고 바로 처리하게 합니다."""
+        if not self.enabled:
+            return
+        self._ensure_started(poll=False)
+        self._wakeup.set()
+
+    def _ensure_started(self, poll):
+        # fork 된 워커에서는 부모의 스레드가 없으므로 pid 가 바뀌면 다시 시작합니다.
+        if self._running() and (self._polling or not poll):
+            return
+        with self._start_lock:
+            if self._running() and (self._polling or not poll):
+                return
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+                self._wakeup = threading.Event()
+            # 감시 스레드로 바뀌면 실행 중인 일회성 스레드는 남은 작업을 마치고 스스로 끝납니다.
+            self._polling = poll
+            if not poll:
+                # 일회성 스레드는 시작하자마자 한 번은 처리하도록 미리 깨워 둡니다.
+                self._wakeup.set()
+            self._thread = threading.Thread(target=self._run, args=(poll,), name='cascade-worker', daemon=True)
+            self._thread.start()
+
+    def _running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _run(self, poll):
+        while True:
+            if poll:
+                self._wakeup.wait(self.poll_interval)
+            elif not self._wakeup.is_set():
+                # 감시 스레드가 없는 프로세스: 깨운 작업(과 남은 작업)을 처리했으면 끝납니다.
+                # (그사이 놓친 작업은 jobs 문서에 남아 다음 wake() 나 gunicorn 워커의 감시 스레드가 처리)
+                return
+            self._wakeup.clear()
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"Error running cascade jobs: {e}")
+
+    def run_pending(self, owner=None):
+        """맡을 수 있는 작업이 없을 때까지 처리하고, 끝낸 작업 수를 반환합니다."""
+        repos = get_repos()
+        if not repos:
+            return 0
+        owner = owner or self.owner or f"{socket.gethostname()}:{os.getpid()}"
+        finished = 0
+        while True:
+            job = repos.jobs.claim(owner, self.lease_seconds)
+            if job is None:
+                return finished
+            if self._process(repos, job, owner):
+                finished += 1
+
+    def _process(self, repos, job, owner):
+        try:
+            while True:
+                deleted = repos.jobs.delete_comment_batch(job, owner, self.batch_size, self.lease_seconds)
+                if deleted is None:
+                    self._incr('leases_lost')
+                    return False
+                self._incr('batches')
+                self._incr('comments_deleted', deleted)
+                if deleted < self.batch_size:
+                    self._incr('jobs_completed')
+                    return True
+                # 배치 사이에 쉬어 다른 요청의 읽기/쓰기가 밀리지 않게 합니다.
+                time.sleep(self.batch_interval)
+        except Exception as e:
+            print(f"Error in cascade job {job.id}: {e}")
+            try:
+                repos.jobs.fail(job, e, self.retry_delay, self.max_attempts)
+            except Exception as fail_error:
+                print(f"Error recording cascade job failure {job.id}: {fail_error}")
+            if job.attempts >= self.max_attempts:
+                self._incr('jobs_failed')
+            return False
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['running'] = self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+        return stats
+
+cascade_worker = CascadeWorker()
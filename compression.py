@@ -0,0 +1,133 @@
+"""응답 출력 파이프라인: gzip/brotli 압축 + 스트리밍 렌더링
+
+- Accept-Encoding 을 보고 br(brotli 패키지가 설치된 경우) 또는 gzip 으로 압축합니다.
+  COMPRESS_MIN_SIZE 보다 작은 응답은 압축 이득이 없어 그대로 보냅니다.
+- stream_page() 로 만든 스트리밍 응답은 크기를 미리 알 수 없으므로 항상 압축하며,
+  묶음마다 sync flush 하여 렌더링된 부분부터 바로 전송되게 합니다.
+- 압축된 응답의 ETag 에는 인코딩 이름을 붙여 원본과 다른 강한 검증값이 되게 합니다.
+"""
+import zlib
+from flask import current_app, request, get_flashed_messages, stream_template
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성: 없으면 gzip 만 사용
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+}
+
+def etag_variants(etag):
+    """압축 인코딩별로 바뀐 ETag 까지 포함한 후보 목록 (조건부 GET 비교용)"""
+    return [etag, f'{etag}-gzip', f'{etag}-br']
+
+def _coalesce(chunks, size):
+    # Jinja 는 아주 작은 조각을 많이 내보내므로 size 글자 단위로 묶어 전송/압축합니다.
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_page(template_name, **context):
+    """템플릿을 렌더링되는 대로 흘려보내는 응답을 만듭니다."""
+    # 본문 전송이 시작되면 세션 쿠키를 다시 쓸 수 없으므로 플래시 메시지를 미리 꺼내 둡니다.
+    get_flashed_messages()
+    chunks = stream_template(template_name, **context)
+    return current_app.response_class(_coalesce(chunks, current_app.config.get('STREAM_CHUNK_SIZE', 8192)),
+                                      mimetype='text/html')
+
+class Compress:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.min_size = 500
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('COMPRESS_ENABLED', True)
+        self.min_size = config.get('COMPRESS_MIN_SIZE', 500)
+        self.gzip_level = config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = config.get('COMPRESS_BROTLI_QUALITY', 4)
+        app.extensions['compress'] = self
+        if self.enabled:
+            app.after_request(self.after_request)
+
+    def _negotiate(self):
+        encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(encodings)
+
+    def _compressible(self, response):
+        return (response.status_code in (200, 304)
+                and not response.direct_passthrough
+                and 'Content-Encoding' not in response.headers
+                and response.mimetype in COMPRESSIBLE_MIMETYPES)
+
+    def after_request(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate()
+        if encoding is None:
+            return response
+
+        if response.status_code == 304:
+            # 본문은 없지만 브라우저가 가진 압축본의 ETag 와 맞춰 줍니다.
+            self._tag_etag(response, encoding)
+            return response
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self._compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        self._tag_etag(response, encoding)
+        return response
+
+    @staticmethod
+    def _tag_etag(response, encoding):
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            process = compressor.compress
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            finish = compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = process(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+compress = Compress()
@@ -1,56 +1,180 @@
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+"""Firestore 클라이언트 수명 관리
+
+클라이언트는 프로세스마다 하나를 만들어 재사용합니다. gRPC 채널은 fork 된 자식과 공유하면 안 되므로
+gunicorn --preload 환경에서는 마스터가 fork 전에 close_db() 로 채널을 닫고,
+워커는 post_fork 에서 reset_after_fork() 를 호출합니다. (gunicorn.conf.py)
+혹시 호출하지 않아도 get_db() 가 pid 가 바뀐 것을 보고 새 클라이언트를 만듭니다.
+
+firebase_admin 과 Firestore SDK(gRPC 포함)는 가져오는 데만 수백 ms 가 걸리므로, 모듈을 읽을 때가 아니라
+클라이언트를 처음 만들거나 firestore_module 속성을 처음 쓸 때 가져옵니다. (콜드 스타트)
+
+초기화 실패(자격 증명 없음, 잘못된 JSON 등)도 기록해 두고 RETRY_BASE 초부터 두 배씩(최대 RETRY_MAX 초)
+기다린 뒤에만 다시 시도하므로, 설정이 없을 때 요청마다 환경 변수를 파싱하고 파일을 확인하지 않습니다.
+"""
+import importlib
 import os
 import json
 import logging
+import threading
+import time
+from instrumentation import db_metrics
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 초기화 실패 후 재시도 대기(초): RETRY_BASE 부터 실패할 때마다 두 배, 최대 RETRY_MAX
+RETRY_BASE = float(os.environ.get('FIRESTORE_RETRY_BASE', 1.0))
+RETRY_MAX = float(os.environ.get('FIRESTORE_RETRY_MAX', 60.0))
+
 _db_fs = None
+# 데이터 백엔드: 'firestore' (기본) 또는 'memory' (네트워크 없이 테스트/프로파일링)
+_backend = os.environ.get('DATABASE_BACKEND', 'firestore')
+_lock = threading.Lock()
+# 클라이언트를 만든 프로세스, 연속 실패 횟수, 다음 재시도 시각(monotonic), 마지막 오류
+_pid = None
+_failures = 0
+_retry_at = 0.0
+_last_error = None
+
+def configure_backend(backend, client=None, latency=0.0):
+    """데이터 백엔드를 선택하고, 이후 get_db() 가 반환할 클라이언트를 초기화합니다.
+
+    latency: 인메모리 백엔드가 RPC 마다 기다릴 시간(초). 네트워크 왕복을 흉내내 서빙 모드를 비교할 때 씁니다.
+    """
+    global _db_fs, _backend, _pid
+    if backend not in ('memory', 'firestore'):
+        raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+    _reset_state()
+    _backend = backend
+    if backend == 'memory':
+        from memory_firestore import MemoryClient
+        _db_fs = db_metrics.instrument(client or MemoryClient(latency=latency))
+        _pid = os.getpid()
+    return _db_fs
+
+def _reset_state():
+    global _db_fs, _pid, _failures, _retry_at, _last_error
+    _db_fs = None
+    _pid = None
+    _failures = 0
+    _retry_at = 0.0
+    _last_error = None
+
+def _load_credentials():
+    """FIREBASE_CONFIG_JSON 환경 변수 또는 firebase-key.json 에서 자격 증명을 읽습니다. 없으면 None"""
+    from firebase_admin import credentials
+    firebase_json = os.environ.get('FIREBASE_CONFIG_JSON')
+    if firebase_json:
+        firebase_json = firebase_json.strip()
+        # 앞뒤 따옴표 제거
+        if firebase_json.startswith("'") and firebase_json.endswith("'"):
+            firebase_json = firebase_json[1:-1]
+        if firebase_json.startswith('"') and firebase_json.endswith('"'):
+            firebase_json = firebase_json[1:-1]
+        try:
+            return credentials.Certificate(json.loads(firebase_json)), 'environment variable'
+        except Exception as e:
+            logger.error(f"Failed to initialize Firebase with environment variable: {e}")
+
+    if os.path.exists('firebase-key.json'):
+        return credentials.Certificate('firebase-key.json'), 'local JSON file'
+    return None, None
+
+def _create_client():
+    import firebase_admin
+    cred, source = _load_credentials()
+    if cred is None:
+        raise RuntimeError("No Firebase credentials found.")
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+    # firebase_admin.firestore.client() 는 앱에 클라이언트를 캐시하므로 fork 후 부모의 채널을 돌려줍니다.
+    # 프로세스마다 새 채널을 쓰도록 클라이언트를 직접 만듭니다.
+    client = firestore_module.Client(project=cred.project_id, credentials=cred.get_credential())
+    logger.info(f"Firebase initialized with {source} (pid {os.getpid()}).")
+    return client
 
 def get_db():
-    """Firebase Admin SDK 초기화 및 Firestore 클라이언트 반환 (Lazy Loading)"""
-    global _db_fs
-    if _db_fs is not None:
+    """현재 프로세스의 Firestore 클라이언트를 반환합니다. (처음 호출 시 생성, 실패 시 재시도 대기 중이면 None)"""
+    global _db_fs, _pid, _failures, _retry_at, _last_error
+    if _db_fs is not None and _pid == os.getpid():
         return _db_fs
-
-    try:
-        firebase_json = os.environ.get('FIREBASE_CONFIG_JSON')
-        
-        if firebase_json:
-            firebase_json = firebase_json.strip()
-            # 앞뒤 따옴표 제거
-            if firebase_json.startswith("'") and firebase_json.endswith("'"):
-                firebase_json = firebase_json[1:-1]
-            if firebase_json.startswith('"') and firebase_json.endswith('"'):
-                firebase_json = firebase_json[1:-1]
-                
-            try:
-                cred_dict = json.loads(firebase_json)
-                cred = credentials.Certificate(cred_dict)
-                if not firebase_admin._apps:
-                    firebase_admin.initialize_app(cred)
-                logger.info("Firebase initialized successfully with environment variable.")
-                _db_fs = firestore.client()
+    with _lock:
+        if _pid != os.getpid():
+            # fork 후 처음 호출: 부모의 클라이언트와 실패 기록은 이 프로세스의 것이 아닙니다.
+            if _backend == 'memory' and _db_fs is not None:
+                # 인메모리 백엔드는 네트워크 채널이 없으므로 부모에게서 받은 데이터를 그대로 씁니다.
+                _pid = os.getpid()
                 return _db_fs
-            except Exception as e:
-                logger.error(f"Failed to initialize Firebase with environment variable: {e}")
-        
-        if os.path.exists('firebase-key.json'):
-            cred = credentials.Certificate('firebase-key.json')
-            if not firebase_admin._apps:
-                firebase_admin.initialize_app(cred)
-            logger.info("Firebase initialized with local JSON file.")
-            _db_fs = firestore.client()
+            _reset_state()
+        if _db_fs is not None:
+            return _db_fs
+        if _backend == 'memory':
+            return configure_backend('memory')
+        if time.monotonic() < _retry_at:
+            return None
+
+        try:
+            _db_fs = db_metrics.instrument(_create_client())
+            _pid = os.getpid()
+            _failures, _retry_at, _last_error = 0, 0.0, None
             return _db_fs
-        
-        logger.warning("No Firebase credentials found.")
-        return None
+        except Exception as e:
+            _failures += 1
+            delay = min(RETRY_BASE * 2 ** (_failures - 1), RETRY_MAX)
+            _retry_at = time.monotonic() + delay
+            _last_error = str(e)
+            _pid = os.getpid()
+            if _failures == 1:
+                logger.warning(f"Firestore client unavailable: {e}")
+            else:
+                logger.error(f"Firestore client unavailable ({_failures} attempts, retry in {delay:.0f}s): {e}")
+            return None
+
+def close_db():
+    """이 프로세스의 클라이언트(gRPC 채널)를 닫습니다. preload 마스터가 워커를 fork 하기 전에 호출합니다."""
+    with _lock:
+        if _backend == 'memory' or _db_fs is None or _pid != os.getpid():
+            return
+        client = _db_fs
+        _reset_state()
+    try:
+        client.close()
     except Exception as e:
-        logger.error(f"Critical error during Firebase initialization: {e}")
-        return None
+        logger.error(f"Error closing Firestore client: {e}")
+
+def reset_after_fork():
+    """fork 된 워커에서 호출합니다. 부모에게서 물려받은 클라이언트를 닫지 않고 버립니다."""
+    global _lock
+    # 부모가 잠금을 잡은 채 fork 되었을 수 있으므로 새 잠금을 씁니다.
+    _lock = threading.Lock()
+    if _backend != 'memory':
+        _reset_state()
+
+def db_status():
+    """준비 상태 점검용 정보"""
+    ready = _db_fs is not None and _pid == os.getpid()
+    status = {'backend': _backend, 'ready': ready, 'pid': os.getpid()}
+    if not ready and _pid == os.getpid():
+        status['failures'] = _failures
+        status['last_error'] = _last_error
+        status['retry_in'] = round(max(_retry_at - time.monotonic(), 0.0), 1)
+    return status
+
+class _LazyModule:
+    """처음 속성에 접근할 때 모듈을 가져옵니다."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# firestore 모듈 자체를 내보내어 쿼리 상수 사용 가능하게 함 (firebase_admin.firestore 가 다시 내보내는 것과 같은 모듈)
+firestore_module = _LazyModule('google.cloud.firestore')
 
-# firestore 모듈 자체를 내보내어 쿼리 상수 사용 가능하게 함
-firestore_module = firestore
+# NotFound 등 API 예외 (except 절은 예외가 났을 때만 평가되므로 평소에는 grpc 를 가져오지 않음)
+api_exceptions = _LazyModule('google.api_core.exceptions')
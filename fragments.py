@@ -0,0 +1,104 @@
+"""렌더링된 템플릿 조각 캐시 ({% cache %} 태그)
+
+    {% cache 'post-card', post.id, post.version %} ... {% endcache %}
+
+키 구성 요소(엔티티 ID + 버전)가 같으면 요청/사용자와 상관없이 이전에 렌더링한 HTML 을 재사용합니다.
+버전은 내용이 바뀔 때마다 올라가므로 무효화가 따로 필요 없고, 옛 버전은 LRU 로 밀려납니다.
+조각 안에는 보는 사람에 따라 달라지는 내용(로그인 사용자, 삭제 버튼 등)을 넣으면 안 됩니다.
+"""
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+class FragmentCache:
+    """전체 크기(바이트)와 항목 수를 제한하는 스레드 안전 LRU"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.max_bytes = 4 * 1024 * 1024
+        self.max_entries = 10000
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(('hits', 'misses', 'evictions'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('FRAGMENT_CACHE_ENABLED', True)
+        self.max_bytes = config.get('FRAGMENT_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+        self.max_entries = config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+        self.clear()
+        app.extensions['fragment_cache'] = self
+        app.jinja_env.add_extension(FragmentCacheExtension)
+
+    @staticmethod
+    def _sizeof(value):
+        # 대략적인 크기: 한글은 UTF-8 로 3바이트이므로 글자 수 * 3 을 상한으로 봅니다.
+        return len(value) * 3
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= self._sizeof(old)
+            self._data[key] = value
+            self._size += size
+            while self._size > self.max_bytes or len(self._data) > self.max_entries:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= self._sizeof(evicted)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._data)
+            stats['bytes'] = self._size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+class FragmentCacheExtension(Extension):
+    """{% cache 키1, 키2, ... %} 본문 {% endcache %}"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(parts)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        if not fragment_cache.enabled:
+            return caller()
+        key = ':'.join(str(part) for part in parts)
+        html = fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            fragment_cache.set(key, html)
+        return html
+
+fragment_cache = FragmentCache()
@@ -1,10 +1,35 @@
+"""Firebase Functions 진입점
+
+모듈을 읽을 때는 앱을 만들지 않습니다. (배포 시 함수 목록을 읽을 때와 인스턴스 시작이 빨라짐)
+앱은 첫 요청 때 한 번 만들고, WARMUP_ON_STARTUP=1 이면 인스턴스가 시작될 때 백그라운드 스레드에서
+앱 생성, 템플릿 컴파일, Firestore 채널 연결을 미리 해 둡니다. 첫 요청은 그 스레드가 만든 앱을 그대로 씁니다.
+필수 데이터 준비(provisioning)는 배포 단계에서 하므로 인스턴스에서는 PROVISION_ON_STARTUP 과 관계없이 건너뜁니다.
+"""
+import os
+import threading
 from firebase_functions import https_fn
-from app import create_app
+from app import get_app, warm_up
+
+# 콜드 스타트마다 Firestore 를 읽고 쓰지 않도록 준비 단계를 끕니다.
+# 요청은 Firebase Hosting 과 Google 프런트엔드를 거치며 둘 다 X-Forwarded-For 에 주소를 덧붙이므로,
+# 요청 수 제한은 뒤에서 두 번째 주소를 클라이언트로 봅니다. (함수를 직접 호출하게 배포했다면 1)
+APP_CONFIG = {
+    'PROVISION_ON_STARTUP': False,
+    'RATE_LIMIT_TRUSTED_PROXIES': int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 2)),
+}
+
+def _warm_up():
+    try:
+        print(f"Warm-up finished: {warm_up(get_app(APP_CONFIG))}")
+    except Exception as e:
+        print(f"Error during warm-up: {e}")
 
-app = create_app()
+if os.environ.get('WARMUP_ON_STARTUP', '0') == '1':
+    threading.Thread(target=_warm_up, name='warm-up', daemon=True).start()
 
 @https_fn.on_request()
 def flask_app(req):
     """Firebase Functions entry point for Flask app"""
-    with app.request_context(req):
+    app = get_app(APP_CONFIG)
+    with app.request_context(req.environ):
         return app.full_dispatch_request()
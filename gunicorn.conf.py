@@ -0,0 +1,49 @@
+"""gunicorn 설정 (Procfile 의 `gunicorn app:app` 이 자동으로 읽습니다)
+
+SERVING_MODE=sync  (기본) gthread 워커, 워커당 WEB_THREADS 개 요청 동시 처리
+SERVING_MODE=async gevent 워커, 워커당 WORKER_CONNECTIONS 개 요청 동시 처리 (requirements-async.txt 필요)
+
+sync 모드는 앱 코드를 마스터에서 미리 읽어(preload) 워커들이 copy-on-write 로 공유하고,
+코어마다 워커 하나(GUNICORN_WORKERS 로 변경)를 띄웁니다. Firestore gRPC 채널은 fork 전에 닫고
+워커마다 새로 만듭니다. (firebase_config.py)
+
+워커마다 삭제된 게시글의 댓글 정리 작업 감시 스레드를 시작합니다. (cascade.py)
+WARMUP_ON_STARTUP=1 이면 워커가 요청을 받기 전에 템플릿 컴파일과 Firestore 채널 연결을 해 둡니다. (app.warm_up)
+"""
+import multiprocessing
+import os
+
+worker_tmp_dir = '/dev/shm'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+
+if os.environ.get('SERVING_MODE', 'sync') == 'async':
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 500))
+    # gevent 패치는 워커에서 일어나므로, 마스터에서 미리 읽은 모듈은 패치되지 않습니다. preload 를 쓰지 않습니다.
+    preload_app = False
+else:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('WEB_THREADS', 8))
+    preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+def when_ready(server):
+    # preload 중 프로비저닝 등으로 마스터가 만든 gRPC 채널을 워커 fork 전에 닫습니다.
+    if preload_app:
+        from firebase_config import close_db
+        close_db()
+
+def post_fork(server, worker):
+    if preload_app:
+        from firebase_config import reset_after_fork
+        reset_after_fork()
+
+def post_worker_init(worker):
+    # 앱을 읽은 뒤(async 모드는 gevent 패치 뒤) 워커 프로세스 안에서 실행됩니다.
+    from app import get_app
+    app = get_app()
+    # 삭제된 게시글의 남은 댓글 정리 작업을 주기적으로 확인하는 스레드는 gunicorn 워커에서만 돌립니다.
+    from cascade import cascade_worker
+    cascade_worker.start()
+    if os.environ.get('WARMUP_ON_STARTUP', '0') == '1':
+        from app import warm_up
+        worker.log.info("Warm-up finished: %s", warm_up(app))
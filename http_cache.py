@@ -0,0 +1,43 @@
+"""조건부 GET (ETag / Last-Modified) 도우미
+
+라우트는 보이는 내용의 상태(피드: 캐시된 페이지의 카드별 version/댓글 수/조회 수, 게시글: posts 의 version 필드)로
+ETag 를 만들고, 브라우저가 보낸 If-None-Match 와 같으면 쿼리와 템플릿 렌더링 없이 304 를 돌려줍니다.
+
+같은 페이지도 보는 사람에 따라 달라지므로(로그인 여부, 이름, 관리자 버튼) 사용자 정보를 ETag 에 넣습니다.
+Last-Modified 에는 사용자 정보를 담을 수 없으므로 함께 보내기만 하고 304 판단에는 ETag 만 사용합니다.
+"""
+import hashlib
+from flask import request, session, current_app
+from flask_login import current_user
+from compression import etag_variants
+
+def viewer_key():
+    """현재 사용자에 따라 달라지는 화면 요소를 나타내는 값"""
+    if not current_user.is_authenticated:
+        return 'anon'
+    return f"{current_user.id}:{current_user.name}:{int(bool(current_user.is_admin))}"
+
+def make_etag(*parts):
+    """페이지 버전 정보와 사용자 정보를 합쳐 강한 ETag 값을 만듭니다."""
+    raw = '|'.join(str(part) for part in parts + (viewer_key(),))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def is_not_modified(etag):
+    """브라우저가 가진 페이지가 최신이면 True 를 반환합니다."""
+    if session.get('_flashes'):
+        # 한 번만 보여줄 메시지가 있으면 새로 렌더링해야 합니다.
+        return False
+    # 압축된 응답은 ETag 뒤에 인코딩 이름이 붙어 있습니다.
+    return any(request.if_none_match.contains(candidate) for candidate in etag_variants(etag))
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # 사용자별 페이지이므로 공유 캐시에 저장하지 않고, 매번 검증하도록 합니다.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def not_modified_response(etag, last_modified=None):
+    return set_validators(current_app.response_class(status=304), etag, last_modified)
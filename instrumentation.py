@@ -0,0 +1,430 @@
+"""Firestore 호출 계측 (요청별 RPC 수/지연 + 라우트별 히스토그램)
+
+firebase_config.get_db() 가 돌려주는 클라이언트를 InstrumentedClient 로 감싸
+쿼리/문서 조회/쓰기/커밋마다 걸린 시간과 읽은 문서 수를 기록합니다.
+- 요청 단위 합계는 flask.g 에 모아 Server-Timing 헤더로 내보냅니다.
+- 라우트별 지연 히스토그램과 읽기/쓰기 카운터는 /admin/metrics 에서 Prometheus 텍스트로 봅니다.
+- DB_READ_BUDGET 을 넘긴 요청은 호출 목록과 함께 경고를 남기고,
+  DB_READ_BUDGET_STRICT 이면 500 으로 실패시켜 N+1 조회를 개발 중에 바로 드러냅니다.
+"""
+import bisect
+import logging
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 요청당 보관하는 호출 기록 최대 개수 (예산 초과 경고에 사용)
+MAX_TRACE_CALLS = 50
+
+def _unwrap(value):
+    if isinstance(value, _Proxy):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+class _Proxy:
+    """대상 객체의 속성을 그대로 전달하고, 인자로 넘어온 프록시는 원래 객체로 풀어 줍니다."""
+    __slots__ = ('_target', '_metrics')
+    # 메서드 이름 -> 반환값을 감쌀 프록시 클래스 이름
+    _wrap_results = {}
+
+    def __init__(self, target, metrics):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_metrics', metrics)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        proxy_name = self._wrap_results.get(name)
+
+        def call(*args, **kwargs):
+            result = attr(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+            if proxy_name is not None and result is not None:
+                return _PROXIES[proxy_name](result, self._metrics)
+            return result
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"<instrumented {self._target!r}>"
+
+    def _timed(self, op, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+        except Exception:
+            self._metrics.record(op, time.perf_counter() - start, error=True)
+            raise
+        return result, time.perf_counter() - start
+
+    def _timed_stream(self, op, func, *args, **kwargs):
+        # 스트림은 소비하는 동안에만 시간을 재고, 다 읽거나 닫힐 때 한 번 기록합니다.
+        elapsed = 0.0
+        docs = 0
+        error = False
+        try:
+            start = time.perf_counter()
+            try:
+                iterator = iter(func(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()}))
+            finally:
+                elapsed += time.perf_counter() - start
+            while True:
+                start = time.perf_counter()
+                try:
+                    doc = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                docs += 1
+                yield doc
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._metrics.record(op, elapsed, reads=docs, docs=docs, error=error)
+
+class QueryProxy(_Proxy):
+    """Query / CollectionReference"""
+    __slots__ = ()
+    _wrap_results = {
+        'where': 'QueryProxy', 'order_by': 'QueryProxy', 'limit': 'QueryProxy',
+        'limit_to_last': 'QueryProxy', 'offset': 'QueryProxy', 'select': 'QueryProxy',
+        'start_at': 'QueryProxy', 'start_after': 'QueryProxy',
+        'end_at': 'QueryProxy', 'end_before': 'QueryProxy',
+        'document': 'DocumentProxy', 'count': 'AggregationProxy',
+    }
+
+    def stream(self, *args, **kwargs):
+        return self._timed_stream('query', self._target.stream, *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+    def add(self, *args, **kwargs):
+        (update_time, ref), elapsed = self._timed('write', self._target.add, *args, **kwargs)
+        self._metrics.record('write', elapsed, writes=1)
+        return update_time, DocumentProxy(ref, self._metrics)
+
+    def list_documents(self, *args, **kwargs):
+        refs, elapsed = self._timed('query', lambda *a, **kw: list(self._target.list_documents(*a, **kw)),
+                                    *args, **kwargs)
+        self._metrics.record('query', elapsed, docs=len(refs))
+        return [DocumentProxy(ref, self._metrics) for ref in refs]
+
+class AggregationProxy(_Proxy):
+    """count() 등 집계 쿼리 (결과 크기와 상관없이 최소 1회 읽기)"""
+    __slots__ = ()
+
+    def get(self, *args, **kwargs):
+        result, elapsed = self._timed('query', self._target.get, *args, **kwargs)
+        self._metrics.record('query', elapsed, reads=1, docs=1)
+        return result
+
+class DocumentProxy(_Proxy):
+    __slots__ = ()
+    _wrap_results = {'collection': 'QueryProxy'}
+
+    @property
+    def parent(self):
+        return QueryProxy(self._target.parent, self._metrics)
+
+    def get(self, *args, **kwargs):
+        snapshot, elapsed = self._timed('get', self._target.get, *args, **kwargs)
+        self._metrics.record('get', elapsed, reads=1, docs=1 if snapshot.exists else 0)
+        return snapshot
+
+    def _write(self, method, *args, **kwargs):
+        result, elapsed = self._timed('write', getattr(self._target, method), *args, **kwargs)
+        self._metrics.record('write', elapsed, writes=1)
+        return result
+
+    def set(self, *args, **kwargs):
+        return self._write('set', *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._write('create', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write('update', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write('delete', *args, **kwargs)
+
+class BatchProxy(_Proxy):
+    """WriteBatch: 담은 작업 수를 세어 두었다가 commit 때 쓰기 수로 기록합니다."""
+    __slots__ = ('_ops',)
+
+    def __init__(self, target, metrics):
+        super().__init__(target, metrics)
+        object.__setattr__(self, '_ops', 0)
+
+    def _add(self, method, *args, **kwargs):
+        object.__setattr__(self, '_ops', self._ops + 1)
+        return getattr(self._target, method)(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+
+    def set(self, *args, **kwargs):
+        return self._add('set', *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._add('create', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._add('update', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._add('delete', *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        ops = self._ops
+        object.__setattr__(self, '_ops', 0)
+        result, elapsed = self._timed('commit', self._target.commit, *args, **kwargs)
+        self._metrics.record('commit', elapsed, writes=ops)
+        return result
+
+class TransactionProxy(BatchProxy):
+    """트랜잭션: 읽기는 바로 기록하고, 쓰기는 커밋이 내부에서 일어나므로 담을 때 셉니다."""
+    __slots__ = ()
+
+    def _add(self, method, *args, **kwargs):
+        self._metrics.record('commit', None, writes=1)
+        return getattr(self._target, method)(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+
+    def get(self, *args, **kwargs):
+        return self._timed_stream('get', self._target.get, *args, **kwargs)
+
+    def get_all(self, *args, **kwargs):
+        return self._timed_stream('get', self._target.get_all, *args, **kwargs)
+
+class InstrumentedClient(_Proxy):
+    """firestore.Client 와 같은 모양의 계측 래퍼"""
+    __slots__ = ()
+    _wrap_results = {
+        'collection': 'QueryProxy', 'collection_group': 'QueryProxy',
+        'document': 'DocumentProxy', 'batch': 'BatchProxy', 'transaction': 'TransactionProxy',
+    }
+
+    def __getattr__(self, name):
+        if name == 'run_transaction':
+            # 인메모리 백엔드 전용: func 에 넘어가는 트랜잭션도 계측합니다.
+            run = getattr(self._target, name)
+
+            def run_transaction(func, *args, **kwargs):
+                return run(lambda transaction, *a, **kw: func(TransactionProxy(transaction, self._metrics), *a, **kw),
+                           *args, **kwargs)
+            return run_transaction
+        return super().__getattr__(name)
+
+    def get_all(self, *args, **kwargs):
+        return self._timed_stream('get', self._target.get_all, *args, **kwargs)
+
+_PROXIES = {cls.__name__: cls for cls in (QueryProxy, AggregationProxy, DocumentProxy, BatchProxy, TransactionProxy)}
+
+class Histogram:
+    """Prometheus 누적 버킷 히스토그램"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class RequestStats:
+    """한 요청 동안의 Firestore 호출 합계"""
+    __slots__ = ('calls', 'queries', 'gets', 'commits', 'reads', 'writes', 'docs', 'errors', 'db_time', 'trace')
+
+    def __init__(self):
+        self.calls = self.queries = self.gets = self.commits = 0
+        self.reads = self.writes = self.docs = self.errors = 0
+        self.db_time = 0.0
+        self.trace = []
+
+    def add(self, op, elapsed, reads, writes, docs, error):
+        if elapsed is not None:
+            self.calls += 1
+            self.db_time += elapsed
+            if op == 'query':
+                self.queries += 1
+            elif op == 'get':
+                self.gets += 1
+            else:
+                self.commits += 1
+            if len(self.trace) < MAX_TRACE_CALLS:
+                self.trace.append((op, round(elapsed * 1000, 2), docs))
+        self.reads += reads
+        self.writes += writes
+        self.docs += docs
+        self.errors += int(error)
+
+    def server_timing(self, total):
+        desc = f"{self.queries} queries, {self.gets} gets, {self.reads} reads, {self.writes} writes"
+        return f'db;dur={self.db_time * 1000:.1f};desc="{desc}", total;dur={total * 1000:.1f}'
+
+class DatabaseMetrics:
+    """Flask 확장: 요청 훅 등록 + 라우트/호출 종류별 집계"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.read_budget = 0
+        self.strict_budget = False
+        self._lock = threading.Lock()
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('DB_METRICS_ENABLED', True)
+        self.read_budget = config.get('DB_READ_BUDGET', 0)
+        self.strict_budget = config.get('DB_READ_BUDGET_STRICT', False)
+        self.reset()
+        app.extensions['db_metrics'] = self
+        if self.enabled:
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+
+    def reset(self):
+        with self._lock:
+            self._call_latency = {}
+            self._call_errors = {}
+            self._routes = {}
+
+    def instrument(self, client):
+        """클라이언트를 계측 래퍼로 감쌉니다. (비활성화 상태면 그대로 반환)"""
+        if client is None or not self.enabled or isinstance(client, InstrumentedClient):
+            return client
+        return InstrumentedClient(client, self)
+
+    def record(self, op, elapsed, reads=0, writes=0, docs=0, error=False):
+        """호출 하나를 기록합니다. elapsed 가 None 이면 횟수만 셉니다. (트랜잭션 안의 쓰기)"""
+        if elapsed is not None:
+            with self._lock:
+                self._call_latency.setdefault(op, Histogram()).observe(elapsed)
+                if error:
+                    self._call_errors[op] = self._call_errors.get(op, 0) + 1
+        # 백그라운드 스레드(감사 로그 등)의 호출은 요청 합계에 넣지 않습니다.
+        if has_request_context():
+            stats = g.get('db_stats')
+            if stats is not None:
+                stats.add(op, elapsed, reads, writes, docs, error)
+
+    def _before_request(self):
+        g.db_stats = RequestStats()
+        g.db_request_started = time.perf_counter()
+
+    def _after_request(self, response):
+        stats = g.get('db_stats')
+        if stats is None:
+            return response
+        total = time.perf_counter() - g.db_request_started
+        route = request.url_rule.rule if request.url_rule is not None else '(unmatched)'
+        response.headers['Server-Timing'] = stats.server_timing(total)
+
+        over_budget = bool(self.read_budget) and stats.reads > self.read_budget
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    'duration': Histogram(), 'db_duration': Histogram(),
+                    'requests': 0, 'calls': 0, 'reads': 0, 'writes': 0, 'over_budget': 0,
+                }
+            entry['duration'].observe(total)
+            entry['db_duration'].observe(stats.db_time)
+            entry['requests'] += 1
+            entry['calls'] += stats.calls
+            entry['reads'] += stats.reads
+            entry['writes'] += stats.writes
+            entry['over_budget'] += int(over_budget)
+
+        if over_budget:
+            logger.warning("Read budget exceeded on %s %s: %d reads > %d, calls=%s",
+                           request.method, route, stats.reads, self.read_budget, stats.trace)
+            if self.strict_budget:
+                return current_app.response_class(
+                    f"Firestore read budget exceeded: {stats.reads} reads > {self.read_budget} ({route})\n",
+                    status=500, mimetype='text/plain')
+        return response
+
+    def stats(self):
+        """라우트별 요청 수/평균 지연/읽기·쓰기 합계를 JSON 용 dict 로 반환합니다."""
+        with self._lock:
+            return {
+                route: {
+                    'requests': entry['requests'],
+                    'avg_ms': round(entry['duration'].sum / entry['requests'] * 1000, 2),
+                    'avg_db_ms': round(entry['db_duration'].sum / entry['requests'] * 1000, 2),
+                    'reads_per_request': round(entry['reads'] / entry['requests'], 2),
+                    'writes': entry['writes'],
+                    'over_budget': entry['over_budget'],
+                }
+                for route, entry in self._routes.items()
+            }
+
+    def render_prometheus(self):
+        """Prometheus 텍스트 형식(0.0.4)으로 현재 워커의 지표를 출력합니다."""
+        lines = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+            calls = sorted(self._call_latency.items())
+            errors = dict(self._call_errors)
+
+            lines.append('# HELP hyyum_request_duration_seconds Request latency by route.')
+            lines.append('# TYPE hyyum_request_duration_seconds histogram')
+            for route, entry in routes:
+                lines.extend(entry['duration'].render('hyyum_request_duration_seconds', f'route="{route}"'))
+            lines.append('# HELP hyyum_request_db_seconds Time spent in Firestore calls per request by route.')
+            lines.append('# TYPE hyyum_request_db_seconds histogram')
+            for route, entry in routes:
+                lines.extend(entry['db_duration'].render('hyyum_request_db_seconds', f'route="{route}"'))
+            for name, key, help_text in (
+                    ('hyyum_firestore_calls_total', 'calls', 'Firestore RPCs issued by route.'),
+                    ('hyyum_firestore_reads_total', 'reads', 'Firestore document reads by route.'),
+                    ('hyyum_firestore_writes_total', 'writes', 'Firestore document writes by route.'),
+                    ('hyyum_read_budget_exceeded_total', 'over_budget', 'Requests over DB_READ_BUDGET by route.')):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for route, entry in routes:
+                    lines.append(f'{name}{{route="{route}"}} {entry[key]}')
+
+            lines.append('# HELP hyyum_firestore_call_duration_seconds Firestore RPC latency by operation.')
+            lines.append('# TYPE hyyum_firestore_call_duration_seconds histogram')
+            for op, histogram in calls:
+                lines.extend(histogram.render('hyyum_firestore_call_duration_seconds', f'op="{op}"'))
+            lines.append('# HELP hyyum_firestore_errors_total Failed Firestore RPCs by operation.')
+            lines.append('# TYPE hyyum_firestore_errors_total counter')
+            for op, _ in calls:
+                lines.append(f'hyyum_firestore_errors_total{{op="{op}"}} {errors.get(op, 0)}')
+        return '\n'.join(lines) + '\n'
+
+db_metrics = DatabaseMetrics()
@@ -1,87 +1,135 @@
-from flask import Blueprint, render_template, url_for, flash, redirect, request, abort
+from flask import Blueprint, render_template, url_for, flash, redirect, request, abort, current_app, jsonify, make_response
 from flask_login import current_user, login_required
-from werkzeug.security import generate_password_hash
-from models import Post, User, get_now_kst, Log, Comment
-from firebase_config import get_db, firestore_module
-from datetime import datetime
+from models import Post, get_now_kst, Comment, make_excerpt
+from repositories import get_repos, parse_feed_cursor
+from firebase_config import get_db, db_status, api_exceptions
+from cache import cache
+from audit import audit_log, LOG_ACTIONS
+from instrumentation import db_metrics
+from auth import invalidate_user
+from compression import stream_page
+from fragments import fragment_cache
+from passwords import password_hasher
+from cascade import cascade_worker
+from posts_view import posts_view
+from ratelimit import rate_limiter
+from view_counter import view_counter
+from export import EXPORT_FIELDS, EXPORT_FORMATS, generate_export
+from http_cache import make_etag, is_not_modified, set_validators, not_modified_response
 
 main = Blueprint('main', __name__)
 
+@main.route('/healthz')
+def healthz():
+    """프로세스 생존 확인 (데이터베이스를 확인하지 않음)"""
+    return jsonify({'status': 'ok'})
+
+@main.route('/readyz')
+def readyz():
+    """이 워커가 Firestore 클라이언트를 가지고 있어 요청을 받을 수 있는지 확인합니다. (아니면 503)
+
+    클라이언트를 아직 만들지 않았으면 여기서 만들고, 실패 후 재시도 대기 중이면 바로 503 을 돌려줍니다.
+    """
+    get_db()
+    status = db_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @main.route('/')
 def index():
-    db_fs = get_db()
-    if not db_fs:
-        return render_template('index.html', posts=[])
+    repos = get_repos()
+    if not repos:
+        return render_template('index.html', posts=[], next_cursor=None, cursor=None)
     
-    # [FIX] 관리자 계정이 없으면 여기서 한 번만 생성 (마스터 프로세스 충돌 방지용)
+    cursor = request.args.get('cursor', '').strip() or None
     try:
-        admin_username = 'admin'
-        users_ref = db_fs.collection('users')
-        # 이미 있는지 확인
-        if not next(users_ref.where('username', '==', admin_username).limit(1).stream(), None):
-            admin_data = {
-                'username': admin_username,
-                'name': '관리자',
-                'password': generate_password_hash('admin123', method='pbkdf2:sha256'),
-                'is_admin': True,
-                'created_at': get_now_kst()
-            }
-            db_fs.collection('users').add(admin_data)
-            print(f"Admin user created in Firestore: {admin_username}")
+        parse_feed_cursor(cursor)
+    except ValueError:
+        abort(400)
+    page_size = current_app.config['FEED_PAGE_SIZE']
+    if posts_view.ready():
+        return index_from_view(cursor, page_size)
+    try:
+        # 피드 버전은 쓰기마다 올라가며, 다른 인스턴스의 변경도 FEED_VERSION_CACHE_TTL 안에 반영됩니다.
+        feed_version, feed_updated = cache.get_or_load(
+            'feed-version', repos.posts.feed_version,
+            ttl=current_app.config['FEED_VERSION_CACHE_TTL'],
+            namespaces=('feed',)
+        )
     except Exception as e:
-        print(f"Error during admin user check/creation: {e}")
+        print(f"Error fetching feed version: {e}")
+        feed_version, feed_updated = None, None
 
     try:
-        posts_ref = db_fs.collection('posts')
-        # [FIX] Firestore order_by는 해당 필드가 없는 문서를 결과에서 누락시킵니다.
-        # 모든 게시글을 안전하게 가져오기 위해 정렬 없이 스트림을 받은 후 파이썬에서 정렬합니다.
-        docs = posts_ref.stream()
-        posts = [Post.from_dict(doc.to_dict(), doc.id) for doc in docs]
-        
-        # 1순위: 고정 여부(is_pinned), 2순위: 작성 시간(date_posted) 내림차순 정렬
-        # timestamp()를 사용하여 안전하게 비교
-        posts.sort(key=lambda x: (x.is_pinned, x.date_posted.timestamp() if x.date_posted else 0), reverse=True)
+        # 모든 워커가 같은 피드 페이지를 공유 캐시에서 재사용합니다. (글 쓰기 시 'feed' 무효화)
+        # 댓글 수와 조회 수는 피드 버전을 올리지 않으므로 캐시가 만료될 때(FEED_CACHE_TTL) 반영됩니다.
+        pinned_posts, posts, next_cursor = cache.get_or_load(
+            f'feed:{feed_version}:{cursor}:{page_size}',
+            lambda: repos.posts.feed_page(cursor, page_size, current_app.config['FEED_PINNED_LIMIT']),
+            ttl=current_app.config['FEED_CACHE_TTL'],
+            namespaces=('feed',)
+        )
     except Exception as e:
         print(f"Error fetching posts: {e}")
-        posts = []
-        
-    return render_template('index.html', posts=posts)
+        return stream_page('index.html', posts=[], next_cursor=None, cursor=cursor)
+
+    # ETag 는 페이지에 보이는 카드들의 상태로 만듭니다. (내용이 그대로면 캐시를 다시 읽은 뒤에도 304)
+    etag = make_etag('feed', cursor, page_size, next_cursor, *map(feed_card_state, pinned_posts + posts))
+    if is_not_modified(etag):
+        return not_modified_response(etag, feed_updated)
+    # 카드 목록이 길어도 머리 부분부터 바로 전송되도록 스트리밍으로 렌더링합니다.
+    response = stream_page('index.html', posts=pinned_posts + posts, next_cursor=next_cursor, cursor=cursor)
+    return set_validators(response, etag, feed_updated)
+
+def feed_card_state(post):
+    """피드 카드 하나의 표시 상태 (글 수정/고정/댓글은 version 을 올리고, 조회 수는 따로 반영됨)"""
+    return f"{post.id}:{post.version}:{post.comment_count}:{post.view_count}"
+
+def index_from_view(cursor, page_size):
+    """구체화 뷰로 피드를 만듭니다. (Firestore 호출 없음)"""
+    digest, view_updated = posts_view.state()
+    etag = make_etag('feed-view', digest, cursor, page_size)
+    if is_not_modified(etag):
+        return not_modified_response(etag, view_updated)
+    pinned_posts, posts, next_cursor = posts_view.feed_page(cursor, page_size, current_app.config['FEED_PINNED_LIMIT'])
+    response = stream_page('index.html', posts=pinned_posts + posts, next_cursor=next_cursor, cursor=cursor)
+    return set_validators(response, etag, view_updated)
+
+def reindex_post(repos, post_id, title, content):
+    """검색 색인을 갱신합니다. 색인 실패가 글 저장을 막지 않도록 오류는 기록만 합니다."""
+    try:
+        repos.search.index_post(post_id, title, content)
+    except Exception as e:
+        print(f"Error updating search index for {post_id}: {e}")
 
 @main.route('/admin')
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
         abort(403)
-    db_fs = get_db()
+    repos = get_repos()
     users = []
     logs = []
-    if db_fs:
+    jobs = []
+    if repos:
         # 회원 목록 가져오기
         try:
-            users_ref = db_fs.collection('users')
-            query_users = users_ref.order_by('created_at', direction=firestore_module.Query.DESCENDING).stream()
-            users = [User.from_dict(doc.to_dict(), doc.id) for doc in query_users]
+            users = repos.users.list_recent()
         except Exception as e:
             print(f"Error fetching users for admin: {e}")
-            try:
-                users = [User.from_dict(doc.to_dict(), doc.id) for doc in users_ref.stream()]
-            except:
-                users = []
 
         # 로그 목록 가져오기 (최신 10개)
         try:
-            logs_ref = db_fs.collection('logs')
-            query_logs = logs_ref.order_by('timestamp', direction=firestore_module.Query.DESCENDING).limit(10).stream()
-            logs = [Log.from_dict(doc.to_dict(), doc.id) for doc in query_logs]
+            logs = repos.logs.recent(10)
         except Exception as e:
             print(f"Error fetching logs for admin: {e}")
-            try:
-                # 인덱스 미생성 시 정렬 없이 가져오기
-                logs = [Log.from_dict(doc.to_dict(), doc.id) for doc in logs_ref.limit(10).stream()]
-            except:
-                logs = []
-                
-    return render_template('admin.html', users=users, logs=logs)
+
+        # 백그라운드 작업 진행 상황 (최신 10개)
+        try:
+            jobs = repos.jobs.recent(10)
+        except Exception as e:
+            print(f"Error fetching jobs for admin: {e}")
+
+    return render_template('admin.html', users=users, logs=logs, jobs=jobs)
 
 @main.route('/admin/logs')
 @login_required
@@ -89,33 +137,144 @@ def all_logs():
     if not current_user.is_admin:
         abort(403)
         
-    db_fs = get_db()
-    logs = []
-    if db_fs:
+    filters = {
+        'action': request.args.get('action', '').strip(),
+        'user_id': request.args.get('user_id', '').strip(),
+        'since': request.args.get('since', '').strip(),
+        'until': request.args.get('until', '').strip()
+    }
+    cursor = request.args.get('cursor', '').strip()
+
+    repos = get_repos()
+    logs, next_cursor = [], None
+    if repos:
         try:
-            logs_ref = db_fs.collection('logs')
-            query_logs = logs_ref.order_by('timestamp', direction=firestore_module.Query.DESCENDING).stream()
-            logs = [Log.from_dict(doc.to_dict(), doc.id) for doc in query_logs]
+            logs, next_cursor = repos.logs.page(filters, cursor, current_app.config['LOG_PAGE_SIZE'])
+        except ValueError:
+            flash('날짜 또는 커서 형식이 올바르지 않습니다.')
         except Exception as e:
+            # 복합 색인이 없으면 실패합니다. (firestore.indexes.json 배포 필요)
             print(f"Error fetching all logs for admin: {e}")
-            try:
-                # 인덱스 미생성 시 정렬 없이 가져온 후 파이썬에서 정렬
-                logs = [Log.from_dict(doc.to_dict(), doc.id) for doc in logs_ref.stream()]
-                logs.sort(key=lambda x: x.timestamp, reverse=True)
-            except:
-                logs = []
-                
-    return render_template('admin_logs.html', logs=logs)
+            flash('로그를 불러오지 못했습니다. Firestore 색인 설정을 확인해주세요.')
+
+    active_filters = {k: v for k, v in filters.items() if v}
+    return stream_page('admin_logs.html', logs=logs, filters=filters, active_filters=active_filters,
+                       cursor=cursor, next_cursor=next_cursor, actions=LOG_ACTIONS)
+
+@main.route('/admin/user/<string:user_id>/role', methods=['POST'])
+@login_required
+def toggle_admin(user_id):
+    if not current_user.is_admin:
+        abort(403)
+    if user_id == current_user.id:
+        flash('자신의 권한은 변경할 수 없습니다.')
+        return redirect(url_for('main.admin_dashboard'))
+
+    repos = get_repos()
+    if not repos:
+        abort(404)
+
+    user = repos.users.get(user_id)
+    if user is None:
+        abort(404)
+
+    new_is_admin = not user.is_admin
+    repos.users.update(user_id, {'is_admin': new_is_admin})
+    # 세션 사용자 캐시를 모든 워커에서 무효화하여 권한 변경을 즉시 반영합니다.
+    invalidate_user(user_id)
+
+    action_text = "관리자 권한 부여" if new_is_admin else "관리자 권한 해제"
+
+    # [LOG] 권한 변경 기록
+    audit_log.record(action_text, current_user.id, current_user.name, f"대상: '{user.username}' (ID: {user_id})")
+
+    flash(f"{action_text} 완료되었습니다.")
+    return redirect(url_for('main.admin_dashboard'))
+
+@main.route('/admin/stats')
+@login_required
+def admin_stats():
+    if not current_user.is_admin:
+        abort(403)
+    # 워커별 카운터이므로 응답한 워커의 값만 보입니다.
+    return jsonify({
+        'cache': cache.stats(),
+        'audit_log': audit_log.stats(),
+        'db': db_metrics.stats(),
+        'fragments': fragment_cache.stats(),
+        'passwords': password_hasher.stats(),
+        'cascade': cascade_worker.stats(),
+        'posts_view': posts_view.stats(),
+        'rate_limit': rate_limiter.stats(),
+        'views': view_counter.stats()
+    })
+
+@main.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if not current_user.is_admin:
+        abort(403)
+    # Prometheus 텍스트 형식 (워커별 값)
+    return current_app.response_class(db_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/admin/export/<string:collection>.<string:fmt>')
+@login_required
+def export_data(collection, fmt):
+    if not current_user.is_admin:
+        abort(403)
+    if collection not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+        abort(404)
+    repos = get_repos()
+    if not repos:
+        abort(503)
+
+    # [LOG] 데이터 내보내기 기록
+    audit_log.record('데이터 내보내기', current_user.id, current_user.name, f"{collection}.{fmt}")
+
+    filename = f"{collection}-{get_now_kst().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    # 응답 길이를 정하지 않은 스트리밍(chunked) 응답으로 보냅니다.
+    return current_app.response_class(
+        generate_export(repos.client, collection, fmt, current_app.config['EXPORT_PAGE_SIZE']),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 @main.route('/board')
 def board():
     return redirect(url_for('main.index'))
 
+@main.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    cursor = request.args.get('cursor', '').strip()
+    posts, next_cursor, truncated = [], None, False
+    repos = get_repos()
+    if query and repos:
+        config = current_app.config
+        try:
+            # 점수순 게시글 ID 목록을 캐시해 두고, 페이지마다 해당 글만 get_all 로 읽습니다.
+            ranked, truncated = cache.get_or_load(
+                f'search:{query}',
+                lambda: repos.search.rank(query, config['SEARCH_MAX_POSTINGS']),
+                ttl=config['SEARCH_CACHE_TTL'],
+                namespaces=('search',)
+            )
+            page, next_cursor = repos.search.page(ranked, cursor, config['SEARCH_PAGE_SIZE'])
+            posts = repos.posts.get_many([post_id for _, post_id in page])
+        except ValueError:
+            abort(400)
+        except Exception as e:
+            print(f"Error searching posts: {e}")
+            flash('검색 중 오류가 발생했습니다.')
+    return render_template('search.html', query=query, posts=posts, cursor=cursor, next_cursor=next_cursor,
+                           truncated=truncated)
+
 @main.route('/post/new', methods=['GET', 'POST'])
 @login_required
+@rate_limiter.limit('post', template='post_form.html', title='새 글 작성', legend='새 글 작성')
 def new_post():
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         flash('데이터베이스 연동 설정이 필요합니다.')
         return redirect(url_for('main.index'))
 
@@ -125,26 +284,14 @@ def new_post():
         if not title or not content:
             flash('제목과 내용을 모두 입력해주세요.')
         else:
-            new_post_data = {
-                'title': title,
-                'content': content,
-                'author_id': current_user.id,
-                'author_name': current_user.name,
-                'date_posted': get_now_kst()
-            }
-            post_ref = db_fs.collection('posts').add(new_post_data)
+            # sort_key, excerpt, content_length 는 Post 가 채웁니다.
+            post = Post(None, title, content, current_user.id, current_user.name, date_posted=get_now_kst())
+            post_id = repos.posts.create(post)
+            reindex_post(repos, post_id, title, content)
+            cache.invalidate('feed', 'search')
             
             # [LOG] 게시글 작성 기록
-            try:
-                db_fs.collection('logs').add({
-                    'action': '게시글 작성',
-                    'user_id': current_user.id,
-                    'user_name': current_user.name,
-                    'details': f"제목: '{title}'",
-                    'timestamp': get_now_kst()
-                })
-            except Exception as e:
-                print(f"Error logging new post: {e}")
+            audit_log.record('게시글 작성', current_user.id, current_user.name, f"제목: '{title}'")
 
             flash('게시글이 등록되었습니다!')
             return redirect(url_for('main.index'))
@@ -152,105 +299,108 @@ def new_post():
 
 @main.route('/post/<string:post_id>')
 def post_detail(post_id):
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
     
-    post_doc = db_fs.collection('posts').document(post_id).get()
-    if not post_doc.exists:
+    # 구체화 뷰에 없으면(꺼져 있거나, 방금 쓴 글이 아직 반영되지 않음) 직접 조회합니다.
+    post = posts_view.get(post_id) if posts_view.ready() else None
+    if post is None:
+        post = cache.get_or_load(f'post:{post_id}', lambda: repos.posts.get(post_id),
+                                 namespaces=(f'post:{post_id}',))
+    if post is None:
         abort(404)
-    
-    post = Post.from_dict(post_doc.to_dict(), post_doc.id)
-    
-    # 댓글 가져오기 (게시글의 서브 컬렉션 'comments' 또는 전역 'comments' 컬렉션에서 post_id로 필터링)
-    # 여기서는 확장성을 위해 전역 'comments' 컬렉션 사용
-    comments = []
+
+    cursor = request.args.get('cursor', '').strip()
+    page_size = current_app.config['COMMENT_PAGE_SIZE']
+    # 글 수정, 고정, 댓글 작성/삭제는 모두 게시글의 version 을 올립니다. (조회 수 반영은 version 을 올리지 않음)
+    etag = make_etag('post', post_id, post.version, post.view_count, cursor, page_size)
+    if is_not_modified(etag):
+        return not_modified_response(etag, post.updated_at)
+    # 304 재검증은 조회로 세지 않습니다.
+    view_counter.record(post_id)
+
     try:
-        comments_ref = db_fs.collection('comments')
-        query = comments_ref.where('post_id', '==', post_id).order_by('timestamp', direction=firestore_module.Query.ASCENDING).stream()
-        comments = [Comment.from_dict(doc.to_dict(), doc.id) for doc in query]
+        comments, next_cursor = cache.get_or_load(
+            f'comments:{post_id}:{cursor}:{page_size}',
+            lambda: repos.comments.page(post_id, cursor, page_size),
+            namespaces=(f'comments:{post_id}',)
+        )
+    except ValueError:
+        abort(400)
     except Exception as e:
         print(f"Error fetching comments: {e}")
-        # 인덱스 미생성 시 정렬 없이 가져오기
-        try:
-            query = comments_ref.where('post_id', '==', post_id).stream()
-            comments = [Comment.from_dict(doc.to_dict(), doc.id) for doc in query]
-            comments.sort(key=lambda x: x.timestamp)
-        except:
-            comments = []
+        comments, next_cursor = [], None
+        etag = None
 
-    return render_template('post_detail.html', post=post, comments=comments)
+    response = make_response(render_template('post_detail.html', post=post, comments=comments,
+                                             cursor=cursor, next_cursor=next_cursor))
+    if etag:
+        set_validators(response, etag, post.updated_at)
+    return response
 
 @main.route('/post/<string:post_id>/update', methods=['GET', 'POST'])
 @login_required
 def update_post(post_id):
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
         
-    post_doc = db_fs.collection('posts').document(post_id).get()
-    if not post_doc.exists:
+    post = repos.posts.get(post_id)
+    if post is None:
         abort(404)
     
-    post_data = post_doc.to_dict()
     # 작성자 본인이거나 관리자인 경우에만 수정 가능
-    if post_data.get('author_id') != current_user.id and not current_user.is_admin:
+    if post.author_id != current_user.id and not current_user.is_admin:
         abort(403)
     
     if request.method == 'POST':
+        content = request.form.get('content') or ''
         updated_data = {
             'title': request.form.get('title'),
-            'content': request.form.get('content')
+            'content': content,
+            'excerpt': make_excerpt(content),
+            'content_length': len(content)
         }
-        db_fs.collection('posts').document(post_id).update(updated_data)
+        repos.posts.update(post_id, updated_data)
+        reindex_post(repos, post_id, updated_data['title'], content)
+        cache.invalidate('feed', 'search', f'post:{post_id}')
         
         # [LOG] 게시글 수정 기록
-        try:
-            db_fs.collection('logs').add({
-                'action': '게시글 수정',
-                'user_id': current_user.id,
-                'user_name': current_user.name,
-                'details': f"제목: '{updated_data['title']}' (ID: {post_id})",
-                'timestamp': get_now_kst()
-            })
-        except Exception as e:
-            print(f"Error logging update post: {e}")
+        audit_log.record('게시글 수정', current_user.id, current_user.name, f"제목: '{updated_data['title']}' (ID: {post_id})")
 
         flash('게시글이 수정되었습니다!')
         return redirect(url_for('main.post_detail', post_id=post_id))
     
-    post = Post.from_dict(post_data, post_doc.id)
     return render_template('post_form.html', title='글 수정', legend='글 수정', post=post)
 
 @main.route('/post/<string:post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
         
-    post_doc = db_fs.collection('posts').document(post_id).get()
-    if not post_doc.exists:
+    post = repos.posts.get(post_id)
+    if post is None:
         abort(404)
     
-    post_data = post_doc.to_dict()
     # 작성자 본인이거나 관리자인 경우에만 삭제 가능
-    if post_data.get('author_id') != current_user.id and not current_user.is_admin:
+    if post.author_id != current_user.id and not current_user.is_admin:
         abort(403)
     
-    db_fs.collection('posts').document(post_id).delete()
-    
-    # [LOG] 게시글 삭제 기록
+    repos.posts.delete(post_id)
     try:
-        db_fs.collection('logs').add({
-            'action': '게시글 삭제',
-            'user_id': current_user.id,
-            'user_name': current_user.name,
-            'details': f"제목: '{post_data.get('title')}' (ID: {post_id})",
-            'timestamp': get_now_kst()
-        })
+        repos.search.remove_post(post_id)
     except Exception as e:
-        print(f"Error logging delete post: {e}")
+        print(f"Error removing {post_id} from search index: {e}")
+    cache.invalidate('feed', 'search', f'post:{post_id}', f'comments:{post_id}')
+    # 남은 댓글은 삭제 배치에 함께 등록된 작업으로 백그라운드에서 지웁니다.
+    cascade_worker.wake()
+    view_counter.forget(post_id)
+    
+    # [LOG] 게시글 삭제 기록
+    audit_log.record('게시글 삭제', current_user.id, current_user.name, f"제목: '{post.title}' (ID: {post_id})")
 
     flash('게시글이 삭제되었습니다!')
     return redirect(url_for('main.index'))
@@ -261,69 +411,50 @@ def pin_post(post_id):
     if not current_user.is_admin:
         abort(403)
         
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
         
-    post_doc = db_fs.collection('posts').document(post_id).get()
-    if not post_doc.exists:
+    post = repos.posts.get(post_id)
+    if post is None:
         abort(404)
         
-    post_data = post_doc.to_dict()
-    new_pin_status = not post_data.get('is_pinned', False)
-    
-    db_fs.collection('posts').document(post_id).update({'is_pinned': new_pin_status})
+    new_pin_status = not post.is_pinned
+    repos.posts.set_pinned(post, new_pin_status)
+    cache.invalidate('feed', f'post:{post_id}')
     
     action_text = "게시글 고정" if new_pin_status else "게시글 고정 해제"
     
     # [LOG] 고정/해제 기록
-    try:
-        db_fs.collection('logs').add({
-            'action': action_text,
-            'user_id': current_user.id,
-            'user_name': current_user.name,
-            'details': f"제목: '{post_data.get('title')}' (ID: {post_id})",
-            'timestamp': get_now_kst()
-        })
-    except Exception as e:
-        print(f"Error logging pin post: {e}")
+    audit_log.record(action_text, current_user.id, current_user.name, f"제목: '{post.title}' (ID: {post_id})")
 
     flash(f"{action_text} 완료되었습니다.")
     return redirect(url_for('main.post_detail', post_id=post_id))
 
 @main.route('/post/<string:post_id>/comment', methods=['POST'])
 @login_required
+@rate_limiter.limit('comment')
 def add_comment(post_id):
     content = request.form.get('content')
     if not content:
         flash('댓글 내용을 입력해주세요.')
         return redirect(url_for('main.post_detail', post_id=post_id))
     
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
         
-    new_comment_data = {
-        'post_id': post_id,
-        'author_id': current_user.id,
-        'author_name': current_user.name,
-        'content': content,
-        'timestamp': get_now_kst()
-    }
-    
-    db_fs.collection('comments').add(new_comment_data)
+    comment = Comment(None, post_id, current_user.id, current_user.name, content, timestamp=get_now_kst())
+    try:
+        # 댓글 생성과 comment_count 증가는 하나의 배치로 커밋됩니다. (게시글이 없으면 NotFound)
+        repos.comments.add(comment)
+    except api_exceptions.NotFound:
+        abort(404)
+    # 피드 캐시는 비우지 않습니다. (피드 카드의 댓글 수는 최대 FEED_CACHE_TTL 만큼 늦음)
+    cache.invalidate(f'post:{post_id}', f'comments:{post_id}')
     
     # [LOG] 댓글 작성 기록
-    try:
-        db_fs.collection('logs').add({
-            'action': '댓글 작성',
-            'user_id': current_user.id,
-            'user_name': current_user.name,
-            'details': f"게시글 ID: {post_id}, 내용: {content[:20]}...",
-            'timestamp': get_now_kst()
-        })
-    except Exception as e:
-        print(f"Error logging add comment: {e}")
+    audit_log.record('댓글 작성', current_user.id, current_user.name, f"게시글 ID: {post_id}, 내용: {content[:20]}...")
 
     flash('댓글이 등록되었습니다.')
     return redirect(url_for('main.post_detail', post_id=post_id))
@@ -331,35 +462,24 @@ def add_comment(post_id):
 @main.route('/comment/<string:comment_id>/delete', methods=['POST'])
 @login_required
 def delete_comment(comment_id):
-    db_fs = get_db()
-    if not db_fs:
+    repos = get_repos()
+    if not repos:
         abort(404)
         
-    comment_ref = db_fs.collection('comments').document(comment_id)
-    comment_doc = comment_ref.get()
-    
-    if not comment_doc.exists:
+    comment = repos.comments.get(comment_id)
+    if comment is None:
         abort(404)
         
-    comment_data = comment_doc.to_dict()
     # 작성자 본인이거나 관리자인 경우에만 삭제 가능
-    if comment_data.get('author_id') != current_user.id and not current_user.is_admin:
+    if comment.author_id != current_user.id and not current_user.is_admin:
         abort(403)
         
-    post_id = comment_data.get('post_id')
-    comment_ref.delete()
+    post_id = comment.post_id
+    repos.comments.delete(comment)
+    cache.invalidate(f'post:{post_id}', f'comments:{post_id}')
     
     # [LOG] 댓글 삭제 기록
-    try:
-        db_fs.collection('logs').add({
-            'action': '댓글 삭제',
-            'user_id': current_user.id,
-            'user_name': current_user.name,
-            'details': f"게시글 ID: {post_id}, 내용: {comment_data.get('content')[:20]}...",
-            'timestamp': get_now_kst()
-        })
-    except Exception as e:
-        print(f"Error logging delete comment: {e}")
+    audit_log.record('댓글 삭제', current_user.id, current_user.name, f"게시글 ID: {post_id}, 내용: {comment.content[:20]}...")
 
     flash('댓글이 삭제되었습니다.')
     return redirect(url_for('main.post_detail', post_id=post_id))
@@ -0,0 +1,604 @@
+"""Firestore 클라이언트의 인메모리 대체 구현 (테스트/로컬 프로파일링용)
+
+google.cloud.firestore.Client 중 이 앱이 사용하는 부분만 같은 모양으로 구현합니다.
+- collection / document: get, set(merge), create, update, delete, add
+- 쿼리: where(==, !=, <, <=, >, >=, in, not-in, array_contains), order_by, limit,
+  start_after(dict 또는 스냅샷), select, count
+- WriteBatch, 트랜잭션(run_transaction), Increment / DELETE_FIELD / SERVER_TIMESTAMP
+- on_snapshot 리스너 (커밋한 스레드에서 바로 콜백을 호출합니다)
+
+RPC 종류별 호출 수와 읽은 문서 수를 stats 로 세고, latency 로 네트워크 지연을 흉내낼 수 있어
+라우트별 쿼리 수를 네트워크 없이 확인할 수 있습니다.
+"""
+import copy
+import enum
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from google.cloud.firestore_v1.transforms import DELETE_FIELD, SERVER_TIMESTAMP, Increment
+from firebase_config import api_exceptions
+
+DESCENDING = 'DESCENDING'
+ASCENDING = 'ASCENDING'
+
+_MISSING = object()
+
+def _get_field(data, field_path, doc_id=None):
+    if field_path == '__name__':
+        return doc_id
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _set_field(data, field_path, value):
+    parts = field_path.split('.')
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    if value is DELETE_FIELD:
+        data.pop(parts[-1], None)
+    else:
+        data[parts[-1]] = value
+
+def _compare(a, b):
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        # 타입이 다른 값은 타입 이름으로 순서를 정합니다.
+        return (type(a).__name__ > type(b).__name__) - (type(a).__name__ < type(b).__name__)
+
+def _matches(value, op, operand):
+    if value is _MISSING:
+        return False
+    try:
+        if op == '==':
+            return value == operand
+        if op == '!=':
+            return value != operand and value is not None
+        if op == '<':
+            return value < operand
+        if op == '<=':
+            return value <= operand
+        if op == '>':
+            return value > operand
+        if op == '>=':
+            return value >= operand
+        if op == 'in':
+            return value in operand
+        if op == 'not-in':
+            return value not in operand
+        if op == 'array_contains':
+            return isinstance(value, list) and operand in value
+        if op == 'array_contains_any':
+            return isinstance(value, list) and any(v in value for v in operand)
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator: {op}")
+
+class _StoredDocument:
+    __slots__ = ('data', 'create_time', 'update_time')
+
+    def __init__(self, data, create_time, update_time):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data, create_time=None, update_time=None, read_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = read_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path, self.id)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+class AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+class MemoryAggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias or 'field_1'
+
+    def get(self, transaction=None):
+        client = self._query._client
+        client._rpc('queries')
+        docs = self._query._execute()
+        # 집계 쿼리는 최소 1회 읽기로 과금됩니다.
+        client._count('reads', max(1, len(docs) // 1000))
+        return [[AggregationResult(self._alias, len(docs))]]
+
+class MemoryQuery:
+    def __init__(self, client, path, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        params = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                      cursor=self._cursor, fields=self._fields)
+        params.update(changes)
+        return MemoryQuery(self._client, self._path, **params)
+
+    def where(self, field_path, op_string, value):
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def count(self, alias=None):
+        return MemoryAggregationQuery(self, alias)
+
+    def _sort_orders(self):
+        orders = list(self._orders)
+        if not any(field == '__name__' for field, _ in orders):
+            # Firestore 와 같이 마지막 정렬 방향으로 문서 ID 를 암묵적으로 정렬합니다.
+            last_direction = orders[-1][1] if orders else ASCENDING
+            orders.append(('__name__', last_direction))
+        return orders
+
+    def _cursor_values(self, orders):
+        cursor = self._cursor
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            data = cursor._data or {}
+            return [_get_field(data, field, cursor.id) for field, _ in orders]
+        # dict 커서는 명시적으로 지정한 정렬 필드 값만 사용합니다. (문서 ID 는 문자열 또는 문서 참조)
+        values = []
+        for field, _ in orders:
+            value = cursor.get(field, _MISSING)
+            if field == '__name__' and isinstance(value, MemoryDocumentReference):
+                value = value.id
+            values.append(value)
+        return values
+
+    def _execute(self):
+        with self._client._lock:
+            stored = list(self._client._collection_store(self._path).items())
+
+        docs = []
+        for doc_id, doc in stored:
+            if all(_matches(_get_field(doc.data, f, doc_id), op, v) for f, op, v in self._filters):
+                docs.append((doc_id, doc))
+
+        orders = self._sort_orders()
+        # 정렬 필드가 없는 문서는 결과에서 빠집니다. (Firestore 동작과 동일)
+        docs = [(doc_id, doc) for doc_id, doc in docs
+                if all(_get_field(doc.data, f, doc_id) is not _MISSING for f, _ in orders)]
+        for field, direction in reversed(orders):
+            docs.sort(key=lambda item, f=field: _SortKey(_get_field(item[1].data, f, item[0])),
+                      reverse=(direction == DESCENDING))
+
+        if self._cursor is not None:
+            cursor_values = self._cursor_values(orders)
+            docs = [(doc_id, doc) for doc_id, doc in docs
+                    if self._is_after(doc_id, doc, orders, cursor_values)]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+    @staticmethod
+    def _is_after(doc_id, doc, orders, cursor_values):
+        for (field, direction), cursor_value in zip(orders, cursor_values):
+            if cursor_value is _MISSING:
+                continue
+            cmp = _compare(_get_field(doc.data, field, doc_id), cursor_value)
+            if direction == DESCENDING:
+                cmp = -cmp
+            if cmp != 0:
+                return cmp > 0
+        return False
+
+    def stream(self, transaction=None):
+        client = self._client
+        client._rpc('queries')
+        docs = self._execute()
+        # 결과가 없어도 쿼리 1회는 1건 읽기로 과금됩니다.
+        client._count('reads', max(1, len(docs)))
+        client._count('documents_returned', len(docs))
+        read_time = client._now()
+        for doc_id, doc in docs:
+            data = doc.data
+            if self._fields is not None:
+                data = {}
+                for field in self._fields:
+                    value = _get_field(doc.data, field, doc_id)
+                    if value is not _MISSING:
+                        _set_field(data, field, value)
+            ref = MemoryDocumentReference(client, f"{self._path}/{doc_id}")
+            yield MemoryDocumentSnapshot(ref, copy.deepcopy(data), doc.create_time, doc.update_time, read_time)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+    def on_snapshot(self, callback):
+        """callback(docs, changes, read_time) 리스너를 등록합니다. 처음에는 현재 문서 전체를 ADDED 로 보냅니다."""
+        watch = MemoryWatch(self, callback)
+        client = self._client
+        with client._lock:
+            docs = [MemoryDocumentSnapshot(MemoryDocumentReference(client, f"{self._path}/{doc_id}"),
+                                           copy.deepcopy(doc.data), doc.create_time, doc.update_time)
+                    for doc_id, doc in self._execute()]
+            client._watches.append(watch)
+            read_time = client._now()
+        client._count('reads', len(docs))
+        callback(docs, [DocumentChange(ChangeType.ADDED, doc, -1, i) for i, doc in enumerate(docs)], read_time)
+        return watch
+
+    def _watch_matches(self, reference, data):
+        collection_path, doc_id = reference.path.rsplit('/', 1)
+        return (collection_path == self._path and data is not None
+                and all(_matches(_get_field(data, f, doc_id), op, v) for f, op, v in self._filters))
+
+class ChangeType(enum.Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+class DocumentChange:
+    def __init__(self, type, document, old_index, new_index):
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+class MemoryWatch:
+    """on_snapshot 이 돌려주는 리스너 핸들"""
+
+    def __init__(self, query, callback):
+        self._query = query
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        client = self._query._client
+        with client._lock:
+            if self in client._watches:
+                client._watches.remove(self)
+        self.is_active = False
+
+    close = unsubscribe
+
+    def _deliver(self, touched, read_time):
+        changes = []
+        for reference, before, after in touched:
+            was_in = self._query._watch_matches(reference, before and before.data)
+            is_in = self._query._watch_matches(reference, after and after.data)
+            if is_in:
+                snapshot = MemoryDocumentSnapshot(reference, copy.deepcopy(after.data), after.create_time,
+                                                  after.update_time, read_time)
+                changes.append(DocumentChange(ChangeType.MODIFIED if was_in else ChangeType.ADDED, snapshot, -1, -1))
+            elif was_in:
+                snapshot = MemoryDocumentSnapshot(reference, copy.deepcopy(before.data), before.create_time,
+                                                  before.update_time, read_time)
+                changes.append(DocumentChange(ChangeType.REMOVED, snapshot, -1, -1))
+        if not changes:
+            return
+        client = self._query._client
+        with client._lock:
+            docs = [MemoryDocumentSnapshot(MemoryDocumentReference(client, f"{self._query._path}/{doc_id}"),
+                                           copy.deepcopy(doc.data), doc.create_time, doc.update_time, read_time)
+                    for doc_id, doc in self._query._execute()]
+        client._count('reads', len(changes))
+        self._callback(docs, changes, read_time)
+
+class _SortKey:
+    """타입이 섞인 값도 정렬할 수 있게 하는 비교 래퍼"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return _compare(self.value, other.value) < 0
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        document_id = document_id or uuid.uuid4().hex[:20]
+        return MemoryDocumentReference(self._client, f"{self._path}/{document_id}")
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        write_result = ref.create(document_data)
+        return write_result.update_time, ref
+
+    def list_documents(self):
+        with self._client._lock:
+            ids = list(self._client._collection_store(self._path))
+        return [self.document(doc_id) for doc_id in ids]
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+class MemoryDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return MemoryCollectionReference(self._client, self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id):
+        return MemoryCollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def get(self, field_paths=None, transaction=None):
+        client = self._client
+        client._rpc('gets')
+        client._count('reads')
+        snapshot = client._snapshot(self)
+        if transaction is not None:
+            transaction._record_read(self, snapshot)
+        return snapshot
+
+    def set(self, document_data, merge=False):
+        return self._client._commit([('set', self, document_data, merge)])[0]
+
+    def create(self, document_data):
+        return self._client._commit([('create', self, document_data, False)])[0]
+
+    def update(self, field_updates):
+        return self._client._commit([('update', self, field_updates, False)])[0]
+
+    def delete(self):
+        return self._client._commit([('delete', self, None, False)])[0]
+
+class MemoryWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference, document_data, False))
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+class TransactionConflict(Exception):
+    """트랜잭션에서 읽은 문서가 커밋 전에 바뀌었을 때 (재시도 대상)"""
+
+class MemoryTransaction(MemoryWriteBatch):
+    def __init__(self, client):
+        super().__init__(client)
+        self._read_versions = {}
+
+    def _record_read(self, reference, snapshot):
+        self._read_versions[reference.path] = snapshot.update_time
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        snapshots = list(ref_or_query.stream())
+        for snapshot in snapshots:
+            self._record_read(snapshot.reference, snapshot)
+        return iter(snapshots)
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes, read_versions=self._read_versions)
+
+class MemoryClient:
+    """google.cloud.firestore.Client 의 인메모리 대체 구현"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._store = {}
+        self._watches = []
+        self._lock = threading.RLock()
+        self._last_time = None
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+        self.reset_stats()
+
+    # --- 통계 / 지연 ---
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = dict.fromkeys(('queries', 'gets', 'commits', 'reads', 'writes', 'documents_returned'), 0)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _rpc(self, name):
+        self._count(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _now(self):
+        # 같은 시각이 반복되지 않도록 update_time 을 단조 증가시킵니다.
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            if self._last_time is not None and now <= self._last_time:
+                now = self._last_time + timedelta(microseconds=1)
+            self._last_time = now
+            return now
+
+    # --- 저장소 ---
+
+    def _collection_store(self, path):
+        return self._store.setdefault(path, {})
+
+    def _locate(self, reference):
+        collection_path, doc_id = reference.path.rsplit('/', 1)
+        return self._collection_store(collection_path), doc_id
+
+    def _snapshot(self, reference):
+        with self._lock:
+            store, doc_id = self._locate(reference)
+            doc = store.get(doc_id)
+            read_time = self._now()
+            if doc is None:
+                return MemoryDocumentSnapshot(reference, None, read_time=read_time)
+            return MemoryDocumentSnapshot(reference, copy.deepcopy(doc.data), doc.create_time,
+                                          doc.update_time, read_time)
+
+    def _apply_transforms(self, base, updates, now):
+        for field_path, value in updates.items():
+            if isinstance(value, Increment):
+                current = _get_field(base, field_path)
+                current = current if isinstance(current, (int, float)) else 0
+                value = current + value.value
+            elif value is SERVER_TIMESTAMP:
+                value = now
+            else:
+                value = copy.deepcopy(value)
+            _set_field(base, field_path, value)
+        return base
+
+    def _commit(self, writes, read_versions=None):
+        self._rpc('commits')
+        with self._lock:
+            if read_versions:
+                for path, update_time in read_versions.items():
+                    store, doc_id = self._locate(MemoryDocumentReference(self, path))
+                    doc = store.get(doc_id)
+                    if (doc.update_time if doc else None) != update_time:
+                        raise TransactionConflict(path)
+
+            # 모든 쓰기를 먼저 검증해 배치를 원자적으로 적용합니다.
+            for op, reference, _, _ in writes:
+                store, doc_id = self._locate(reference)
+                if op == 'update' and doc_id not in store:
+                    raise api_exceptions.NotFound(f"No document to update: {reference.path}")
+                if op == 'create' and doc_id in store:
+                    raise api_exceptions.AlreadyExists(f"Document already exists: {reference.path}")
+
+            now = self._now()
+            results = []
+            # 리스너가 있을 때만 바뀌기 전 문서를 남겨 둡니다.
+            watches = list(self._watches)
+            touched = {}
+            for op, reference, data, merge in writes:
+                store, doc_id = self._locate(reference)
+                existing = store.get(doc_id)
+                if watches and reference.path not in touched:
+                    before = None if existing is None else _StoredDocument(
+                        copy.deepcopy(existing.data), existing.create_time, existing.update_time)
+                    touched[reference.path] = (reference, before)
+                if op == 'delete':
+                    store.pop(doc_id, None)
+                elif op == 'update' or (op == 'set' and merge and existing is not None):
+                    existing.data = self._apply_transforms(existing.data, data, now)
+                    existing.update_time = now
+                else:
+                    new_data = self._apply_transforms({}, data, now)
+                    store[doc_id] = _StoredDocument(new_data, now, now)
+                results.append(WriteResult(now))
+            if watches:
+                changes = []
+                for reference, before in touched.values():
+                    store, doc_id = self._locate(reference)
+                    after = store.get(doc_id)
+                    if after is not None:
+                        after = _StoredDocument(copy.deepcopy(after.data), after.create_time, after.update_time)
+                    changes.append((reference, before, after))
+        self._count('writes', len(writes))
+        for watch in watches:
+            watch._deliver(changes, now)
+        return results
+
+    # --- 공개 API ---
+
+    def collection(self, collection_path):
+        return MemoryCollectionReference(self, collection_path)
+
+    def document(self, document_path):
+        return MemoryDocumentReference(self, document_path)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def transaction(self):
+        return MemoryTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self._rpc('gets')
+        references = list(references)
+        self._count('reads', len(references))
+        for reference in references:
+            snapshot = self._snapshot(reference)
+            if transaction is not None:
+                transaction._record_read(reference, snapshot)
+            yield snapshot
+
+    def run_transaction(self, func, *args, max_attempts=5, **kwargs):
+        """func(transaction, ...) 를 실행하고 커밋합니다. 읽은 문서가 바뀌었으면 재시도합니다."""
+        last_exc = None
+        for _ in range(max_attempts):
+            transaction = self.transaction()
+            result = func(transaction, *args, **kwargs)
+            try:
+                transaction.commit()
+                return result
+            except TransactionConflict as e:
+                last_exc = e
+        raise ValueError(f"Failed to commit transaction in {max_attempts} attempts.") from last_exc
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
@@ -0,0 +1,174 @@
+"""Firestore 데이터 마이그레이션 (백필) 스크립트
+
+사용법:
+    python migrations.py              # 모든 마이그레이션 실행
+    python migrations.py post_sort_key
+    python migrations.py search_index  # 검색 색인 재구축
+    python migrations.py search_terms  # 바뀐 토큰 규칙으로 검색 색인 갱신 (바뀐 postings 만 기록)
+    python migrations.py username_index  # 아이디 색인(usernames) 채우기
+"""
+import sys
+from firebase_config import get_db
+from models import make_sort_key, make_excerpt
+from repositories import SearchRepository, username_key
+
+# Firestore WriteBatch 한 번에 담을 수 있는 최대 작업 수
+BATCH_LIMIT = 500
+
+def iter_documents(collection_ref, page_size=BATCH_LIMIT):
+    """컬렉션 전체를 문서 ID 순서로 페이지 단위로 순회합니다. (긴 스트림 타임아웃 방지)"""
+    last_doc = None
+    while True:
+        query = collection_ref.order_by('__name__').limit(page_size)
+        if last_doc is not None:
+            query = query.start_after(last_doc)
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield from docs
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+class BatchWriter:
+    """BATCH_LIMIT 단위로 자동 커밋하는 WriteBatch 래퍼입니다."""
+
+    def __init__(self, db_fs):
+        self.db_fs = db_fs
+        self.batch = db_fs.batch()
+        self.pending = 0
+        self.written = 0
+
+    def update(self, ref, data):
+        self.batch.update(ref, data)
+        self._count()
+
+    def set(self, ref, data, merge=False):
+        self.batch.set(ref, data, merge=merge)
+        self._count()
+
+    def delete(self, ref):
+        self.batch.delete(ref)
+        self._count()
+
+    def _count(self):
+        self.pending += 1
+        if self.pending >= BATCH_LIMIT:
+            self.commit()
+
+    def commit(self):
+        if self.pending:
+            self.batch.commit()
+            self.written += self.pending
+            self.batch = self.db_fs.batch()
+            self.pending = 0
+        return self.written
+
+def backfill_post_sort_keys(db_fs):
+    """sort_key 필드가 없거나 어긋난 게시글에 정렬 키를 채웁니다."""
+    writer = BatchWriter(db_fs)
+    for doc in iter_documents(db_fs.collection('posts')):
+        data = doc.to_dict()
+        is_pinned = bool(data.get('is_pinned', False))
+        sort_key = make_sort_key(is_pinned, data.get('date_posted'))
+        if data.get('sort_key') == sort_key and 'is_pinned' in data:
+            continue
+        writer.update(doc.reference, {'is_pinned': is_pinned, 'sort_key': sort_key})
+    return writer.commit()
+
+def backfill_comment_counts(db_fs):
+    """게시글마다 실제 댓글 수를 집계(count) 쿼리로 세어 comment_count 를 맞춥니다."""
+    writer = BatchWriter(db_fs)
+    comments_ref = db_fs.collection('comments')
+    for doc in iter_documents(db_fs.collection('posts')):
+        result = comments_ref.where('post_id', '==', doc.id).count().get()
+        count = result[0][0].value
+        if doc.to_dict().get('comment_count') == count:
+            continue
+        writer.update(doc.reference, {'comment_count': count})
+    return writer.commit()
+
+def backfill_post_excerpts(db_fs):
+    """피드 projection 조회용 excerpt/content_length 필드를 채웁니다."""
+    writer = BatchWriter(db_fs)
+    for doc in iter_documents(db_fs.collection('posts')):
+        data = doc.to_dict()
+        content = data.get('content') or ''
+        fields = {'excerpt': make_excerpt(content), 'content_length': len(content)}
+        if all(data.get(k) == v for k, v in fields.items()):
+            continue
+        writer.update(doc.reference, fields)
+    return writer.commit()
+
+def rebuild_search_index(db_fs):
+    """검색 역색인을 모두 지우고 게시글 전체로 다시 만듭니다."""
+    writer = BatchWriter(db_fs)
+    for name in ('search_postings', 'search_docs'):
+        for doc in iter_documents(db_fs.collection(name)):
+            writer.delete(doc.reference)
+    writer.commit()
+
+    search = SearchRepository(db_fs)
+    indexed = 0
+    for doc in iter_documents(db_fs.collection('posts')):
+        data = doc.to_dict()
+        search.index_post(doc.id, data.get('title') or '', data.get('content') or '')
+        indexed += 1
+    return indexed
+
+def reindex_search_terms(db_fs):
+    """게시글마다 검색 토큰을 다시 계산해 바뀐 postings 만 씁니다. (한 글자 토큰 추가 등 토큰 규칙 변경 후)"""
+    search = SearchRepository(db_fs)
+    written = 0
+    for doc in iter_documents(db_fs.collection('posts')):
+        data = doc.to_dict()
+        written += search.index_post(doc.id, data.get('title') or '', data.get('content') or '')
+    return written
+
+def backfill_username_index(db_fs):
+    """기존 사용자마다 usernames/{아이디} 색인 문서를 만듭니다.
+
+    색인 이전의 조회-후-추가 방식 때문에 같은 아이디가 여럿이면 먼저 가입한 사용자만 색인하고 나머지는 출력합니다.
+    """
+    usernames_ref = db_fs.collection('usernames')
+    indexed = {doc.id: doc.to_dict().get('user_id') for doc in iter_documents(usernames_ref)}
+    users = sorted(iter_documents(db_fs.collection('users').select(['username', 'created_at'])),
+                   key=lambda doc: (doc.to_dict().get('created_at') is None, doc.to_dict().get('created_at') or 0, doc.id))
+    writer = BatchWriter(db_fs)
+    for doc in users:
+        username = doc.to_dict().get('username')
+        if not username:
+            continue
+        key = username_key(username)
+        if key in indexed:
+            if indexed[key] != doc.id:
+                print(f"중복 아이디 '{username}': 사용자 {doc.id} 는 색인하지 않았습니다. (색인: {indexed[key]})")
+            continue
+        indexed[key] = doc.id
+        writer.set(usernames_ref.document(key), {'user_id': doc.id})
+    return writer.commit()
+
+MIGRATIONS = {
+    'post_sort_key': backfill_post_sort_keys,
+    'comment_count': backfill_comment_counts,
+    'post_excerpt': backfill_post_excerpts,
+    'search_index': rebuild_search_index,
+    'search_terms': reindex_search_terms,
+    'username_index': backfill_username_index,
+}
+
+def run(names=None):
+    db_fs = get_db()
+    if not db_fs:
+        print("Firebase 설정이 없어 마이그레이션을 실행할 수 없습니다.")
+        return False
+    for name in names or MIGRATIONS:
+        if name not in MIGRATIONS:
+            print(f"알 수 없는 마이그레이션: {name} (가능: {', '.join(MIGRATIONS)})")
+            return False
+        updated = MIGRATIONS[name](db_fs)
+        print(f"[{name}] {updated}건 업데이트 완료")
+    return True
+
+if __name__ == '__main__':
+    sys.exit(0 if run(sys.argv[1:]) else 1)
@@ -1,4 +1,3 @@
-from flask_login import UserMixin
 from datetime import datetime, timezone, timedelta
 
 # KST (UTC+9) 설정
@@ -17,7 +16,68 @@ def to_kst(dt):
         dt = dt.replace(tzinfo=timezone.utc)
     return dt.astimezone(KST)
 
-class User(UserMixin):
+# 고정 게시글이 항상 먼저 오도록 정렬 키에 더하는 값 (마이크로초 타임스탬프보다 충분히 큼)
+PIN_OFFSET = 10 ** 16
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def make_sort_key(is_pinned, date_posted):
+    """고정 여부와 작성 시간을 하나의 정수 정렬 키로 합칩니다. (내림차순 정렬용)"""
+    micros = 0
+    if date_posted:
+        if date_posted.tzinfo is None:
+            date_posted = date_posted.replace(tzinfo=timezone.utc)
+        micros = (date_posted - _EPOCH) // timedelta(microseconds=1)
+    return (PIN_OFFSET if is_pinned else 0) + micros
+
+# 피드 카드에 보여줄 본문 요약 길이 (카드는 두 줄까지만 표시)
+EXCERPT_LENGTH = 160
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """본문의 공백을 정리하여 피드 카드용 요약을 만듭니다."""
+    if not content:
+        return ''
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rstrip() + '…'
+
+class KstDateTime:
+    """datetime 필드 디스크립터: 저장된 값을 그대로 두었다가 처음 읽을 때 KST 로 변환해 둡니다.
+
+    목록을 불러올 때 화면에 쓰지 않는 시각까지 모두 변환하지 않도록 하기 위한 것입니다.
+    값은 밑줄이 붙은 슬롯(_created_at 등)에 저장됩니다.
+    """
+    __slots__ = ('slot',)
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if value and value.tzinfo is not KST:
+            value = to_kst(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+def hydrate(model, snapshots):
+    """쿼리 결과(스냅샷 스트림)를 한 번에 모델 목록으로 바꿉니다."""
+    from_dict = model.from_dict
+    return [from_dict(snapshot.to_dict() or {}, snapshot.id) for snapshot in snapshots]
+
+class User:
+    """Flask-Login 사용자 (UserMixin 과 같은 인터페이스를 __slots__ 클래스로 직접 구현)"""
+    __slots__ = ('id', 'username', 'name', 'password', 'is_admin', '_created_at')
+    created_at = KstDateTime()
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
     def __init__(self, id, username, name, password, is_admin=False, created_at=None):
         self.id = id
         self.username = username
@@ -26,16 +86,20 @@ class User(UserMixin):
         self.is_admin = is_admin
         self.created_at = created_at or get_now_kst()
 
-    @staticmethod
-    def from_dict(source, id):
-        return User(
-            id=id,
-            username=source.get('username'),
-            name=source.get('name'),
-            password=source.get('password'),
-            is_admin=source.get('is_admin', False),
-            created_at=to_kst(source.get('created_at'))
-        )
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    @classmethod
+    def from_dict(cls, source, id):
+        get = source.get
+        return cls(id, get('username'), get('name'), get('password'), get('is_admin', False), get('created_at'))
 
     def to_dict(self):
         return {
@@ -47,26 +111,37 @@ class User(UserMixin):
         }
 
 class Post:
-    def __init__(self, id, title, content, author_id, author_name, date_posted=None, is_pinned=False):
+    __slots__ = ('id', 'title', 'content', 'author_id', 'author_name', '_date_posted', 'is_pinned', 'sort_key',
+                 'comment_count', 'excerpt', 'content_length', 'version', '_updated_at', 'view_count')
+    date_posted = KstDateTime()
+    updated_at = KstDateTime()
+
+    def __init__(self, id, title, content, author_id, author_name, date_posted=None, is_pinned=False, sort_key=None,
+                 comment_count=0, excerpt=None, content_length=None, version=0, updated_at=None, view_count=0):
         self.id = id
         self.title = title
         self.content = content
         self.author_id = author_id
         self.author_name = author_name
-        self.date_posted = date_posted or get_now_kst()
+        self.date_posted = date_posted = date_posted or get_now_kst()
         self.is_pinned = is_pinned
+        self.sort_key = sort_key if sort_key is not None else make_sort_key(is_pinned, date_posted)
+        self.comment_count = comment_count
+        # 피드 조회는 본문(content) 없이 요약만 가져오므로 저장된 값을 우선 사용합니다.
+        self.excerpt = excerpt if excerpt is not None else make_excerpt(content)
+        self.content_length = content_length if content_length is not None else len(content or '')
+        # 글/댓글이 바뀔 때마다 올라가는 번호와 시각 (조건부 GET 검증값)
+        self.version = version
+        self.updated_at = updated_at or date_posted
+        # 조회 수 샤드의 합계 (view_counter 가 주기적으로 기록하므로 실제보다 조금 늦음)
+        self.view_count = view_count
 
-    @staticmethod
-    def from_dict(source, id):
-        return Post(
-            id=id,
-            title=source.get('title'),
-            content=source.get('content'),
-            author_id=source.get('author_id'),
-            author_name=source.get('author_name'),
-            date_posted=to_kst(source.get('date_posted')),
-            is_pinned=source.get('is_pinned', False)
-        )
+    @classmethod
+    def from_dict(cls, source, id):
+        get = source.get
+        return cls(id, get('title'), get('content'), get('author_id'), get('author_name'), get('date_posted'),
+                   get('is_pinned', False), get('sort_key'), get('comment_count', 0), get('excerpt'),
+                   get('content_length'), get('version', 0), get('updated_at'), get('view_count', 0))
 
     def to_dict(self):
         return {
@@ -75,10 +150,19 @@ class Post:
             'author_id': self.author_id,
             'author_name': self.author_name,
             'date_posted': self.date_posted,
-            'is_pinned': self.is_pinned
+            'is_pinned': self.is_pinned,
+            'sort_key': self.sort_key,
+            'comment_count': self.comment_count,
+            'excerpt': self.excerpt,
+            'content_length': self.content_length,
+            'version': self.version,
+            'updated_at': self.updated_at
         }
 
 class Log:
+    __slots__ = ('id', 'action', 'user_id', 'user_name', 'details', '_timestamp')
+    timestamp = KstDateTime()
+
     def __init__(self, id, action, user_id, user_name, details, timestamp=None):
         self.id = id
         self.action = action
@@ -87,16 +171,10 @@ class Log:
         self.details = details
         self.timestamp = timestamp or get_now_kst()
 
-    @staticmethod
-    def from_dict(source, id):
-        return Log(
-            id=id,
-            action=source.get('action'),
-            user_id=source.get('user_id'),
-            user_name=source.get('user_name'),
-            details=source.get('details'),
-            timestamp=to_kst(source.get('timestamp'))
-        )
+    @classmethod
+    def from_dict(cls, source, id):
+        get = source.get
+        return cls(id, get('action'), get('user_id'), get('user_name'), get('details'), get('timestamp'))
 
     def to_dict(self):
         return {
@@ -108,6 +186,9 @@ class Log:
         }
 
 class Comment:
+    __slots__ = ('id', 'post_id', 'author_id', 'author_name', 'content', '_timestamp')
+    timestamp = KstDateTime()
+
     def __init__(self, id, post_id, author_id, author_name, content, timestamp=None):
         self.id = id
         self.post_id = post_id
@@ -116,16 +197,10 @@ class Comment:
         self.content = content
         self.timestamp = timestamp or get_now_kst()
 
-    @staticmethod
-    def from_dict(source, id):
-        return Comment(
-            id=id,
-            post_id=source.get('post_id'),
-            author_id=source.get('author_id'),
-            author_name=source.get('author_name'),
-            content=source.get('content'),
-            timestamp=to_kst(source.get('timestamp'))
-        )
+    @classmethod
+    def from_dict(cls, source, id):
+        get = source.get
+        return cls(id, get('post_id'), get('author_id'), get('author_name'), get('content'), get('timestamp'))
 
     def to_dict(self):
         return {
@@ -135,3 +210,29 @@ class Comment:
             'content': self.content,
             'timestamp': self.timestamp
         }
+
+class Job:
+    """백그라운드 작업 (jobs 컬렉션). 현재는 삭제된 게시글의 댓글 정리(cascade)만 있습니다."""
+    __slots__ = ('id', 'kind', 'post_id', 'status', 'deleted', 'batches', 'attempts', 'error',
+                 '_created_at', '_updated_at')
+    created_at = KstDateTime()
+    updated_at = KstDateTime()
+
+    def __init__(self, id, kind, post_id, status='pending', deleted=0, batches=0, attempts=0,
+                 error=None, created_at=None, updated_at=None):
+        self.id = id
+        self.kind = kind
+        self.post_id = post_id
+        self.status = status
+        self.deleted = deleted
+        self.batches = batches
+        self.attempts = attempts
+        self.error = error
+        self.created_at = created_at = created_at or get_now_kst()
+        self.updated_at = updated_at or created_at
+
+    @classmethod
+    def from_dict(cls, source, id):
+        get = source.get
+        return cls(id, get('kind'), get('post_id'), get('status', 'pending'), get('deleted', 0), get('batches', 0),
+                   get('attempts', 0), get('error'), get('created_at'), get('updated_at'))
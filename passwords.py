@@ -0,0 +1,151 @@
+"""비밀번호 해시 생성/검증 전용 프로세스 풀
+
+pbkdf2/scrypt 계산은 GIL 을 잡은 채 수백 ms 동안 CPU 를 쓰므로, 요청 스레드에서 바로 하면
+로그인이 몰릴 때 같은 워커의 다른 요청이 모두 느려집니다. 계산은 별도 프로세스에서 하고,
+동시에 맡길 수 있는 작업 수를 제한해 넘치면 기다리지 않고 PasswordHasherBusy 로 거절합니다.
+자리는 풀에서 작업이 실제로 끝날 때 돌려주므로, 시간 초과(PASSWORD_POOL_TIMEOUT)로 포기한 작업도
+끝날 때까지 자리를 차지합니다. 시간 초과도 PasswordHasherBusy 로 알립니다.
+
+PASSWORD_POOL_WORKERS=0 이면 풀 없이 요청 스레드에서 계산합니다. (테스트/단일 프로세스 환경)
+PASSWORD_POOL_KIND=thread 이면 프로세스 대신 스레드 풀을 씁니다. hashlib 은 계산 중 GIL 을 놓으므로
+gevent 워커(async 모드)에서는 gevent 의 네이티브 스레드 풀에서 계산하여 이벤트 루프를 막지 않습니다.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+from serving import gevent_patched
+
+class PasswordHasherBusy(Exception):
+    """처리 대기 중인 해시 작업이 PASSWORD_POOL_MAX_PENDING 을 넘었거나, 작업이 PASSWORD_POOL_TIMEOUT 안에 끝나지 않았을 때"""
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # 'pbkdf2:sha256' 처럼 반복 횟수를 생략한 설정도 실제 해시의 머리('pbkdf2:sha256:600000')로 맞춰 비교합니다.
+    return generate_password_hash('', method).split('$', 1)[0]
+
+def _hash(password, method):
+    return generate_password_hash(password, method)
+
+def _verify(pwhash, password, method):
+    """(일치 여부, 새 해시) 를 반환합니다. 해시 설정이 바뀌었으면 새 설정으로 다시 만든 해시를 함께 돌려줍니다."""
+    if not pwhash or not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != _method_prefix(method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256'
+        self.workers = 2
+        self.kind = 'process'
+        self.max_pending = 16
+        self.acquire_timeout = 0
+        self.timeout = 10.0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(('hashed', 'verified', 'rehashed', 'rejected', 'timed_out'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.method = config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        self.workers = config.get('PASSWORD_POOL_WORKERS', 2)
+        self.kind = config.get('PASSWORD_POOL_KIND', 'process')
+        self.max_pending = config.get('PASSWORD_POOL_MAX_PENDING', 16)
+        self.acquire_timeout = config.get('PASSWORD_POOL_ACQUIRE_TIMEOUT', 0)
+        self.timeout = config.get('PASSWORD_POOL_TIMEOUT', 10.0)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _get_executor(self):
+        # fork 된 워커는 부모의 풀을 쓸 수 없으므로 pid 가 바뀌면 새로 만듭니다.
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = self._create_executor()
+                self._pid = os.getpid()
+                if not self._atexit_registered:
+                    atexit.register(self.shutdown)
+                    self._atexit_registered = True
+        return self._executor
+
+    def _create_executor(self):
+        if self.kind == 'thread':
+            if gevent_patched():
+                # 패치된 threading 은 greenlet 이므로 실제 OS 스레드를 쓰는 gevent 풀을 사용합니다.
+                from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                return NativeThreadPoolExecutor(max_workers=self.workers)
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+        # 스레드가 있는 gunicorn 워커를 그대로 fork 하지 않도록 forkserver/spawn 으로 자식을 만듭니다.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def _run(self, func, *args):
+        # init_app 이 세마포어를 바꿔도 이 작업이 잡은 자리를 돌려주도록 지역 변수로 잡아 둡니다.
+        slots = self._slots
+        if not slots.acquire(timeout=self.acquire_timeout):
+            self._incr('rejected')
+            raise PasswordHasherBusy()
+        if self.workers <= 0:
+            try:
+                return func(*args)
+            finally:
+                slots.release()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 아직 시작하지 않았으면 취소하고, 이미 계산 중이면 끝날 때 자리를 돌려줍니다.
+            future.cancel()
+            self._incr('timed_out')
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        """설정된 방식(PASSWORD_HASH_METHOD)으로 해시를 만듭니다."""
+        pwhash = self._run(_hash, password, self.method)
+        self._incr('hashed')
+        return pwhash
+
+    def verify(self, pwhash, password):
+        """(일치 여부, 새 해시 또는 None) 을 반환합니다. 새 해시가 있으면 저장된 해시를 교체해야 합니다."""
+        ok, new_hash = self._run(_verify, pwhash, password, self.method)
+        self._incr('verified')
+        if new_hash:
+            self._incr('rehashed')
+        return ok, new_hash
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['kind'] = self.kind
+        stats['max_pending'] = self.max_pending
+        return stats
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,255 @@
+"""posts 컬렉션의 인메모리 구체화 뷰 (POSTS_VIEW_ENABLED=1)
+
+각 워커가 posts 컬렉션에 on_snapshot 리스너를 붙여, 바뀐 글만 반영하면서
+피드 순서(고정 글 먼저, 그다음 최신순 = sort_key 내림차순)로 정렬된 목록을 메모리에 유지합니다.
+뷰가 준비되면 홈 피드와 게시글 본문은 Firestore 호출 없이 이 뷰에서 읽습니다. (댓글은 기존대로 조회)
+
+- 워커마다 첫 요청 때 리스너를 시작하고, 첫 스냅샷을 받기 전까지는 기존 쿼리 경로를 씁니다.
+- 리스너가 끊기면 감시 스레드가 RECONNECT_BASE 초부터 두 배씩(최대 RECONNECT_MAX 초) 기다리며 다시 붙입니다.
+  다시 붙으면 첫 스냅샷(전체 문서)으로 뷰를 새로 만듭니다.
+- 끊긴 뒤 POSTS_VIEW_MAX_STALENESS 초가 지나면 뷰를 쓰지 않고 직접 조회로 돌아갑니다.
+- 리스너 반영은 보통 1초 안쪽이지만 즉시는 아니므로, 방금 쓴 글이 뷰에 없으면 게시글 화면은 직접 조회합니다.
+"""
+import bisect
+import hashlib
+import os
+import threading
+import time
+from models import Post, PIN_OFFSET, to_kst
+from repositories import encode_cursor, parse_feed_cursor
+
+def _desc_id(post_id):
+    """문서 ID 를 내림차순으로 정렬하는 키 (피드 쿼리의 order_by(__name__, DESCENDING) 와 같은 순서)"""
+    # 마지막의 1 은 어떤 글자보다 크므로, 짧은 ID 가 자신으로 시작하는 긴 ID 보다 뒤에 옵니다.
+    return tuple(-ord(c) for c in post_id) + (1,)
+
+def _order_key(sort_key, post_id):
+    return (-sort_key, _desc_id(post_id), post_id)
+
+def _doc_digest(doc_id, update_time):
+    # 워커마다 같은 값이 나오도록 (프로세스마다 달라지는 hash() 대신) 문서 ID 와 수정 시각으로 만듭니다.
+    raw = f"{doc_id}:{update_time}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big')
+
+class PostsView:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_staleness = 30.0
+        self.check_interval = 5.0
+        self.reconnect_base = 1.0
+        self.reconnect_max = 60.0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._reset()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('POSTS_VIEW_ENABLED', False)
+        self.max_staleness = config.get('POSTS_VIEW_MAX_STALENESS', 30.0)
+        self.check_interval = config.get('POSTS_VIEW_CHECK_INTERVAL', 5.0)
+        self.reconnect_base = config.get('POSTS_VIEW_RECONNECT_BASE', 1.0)
+        self.reconnect_max = config.get('POSTS_VIEW_RECONNECT_MAX', 60.0)
+        self.stop()
+        app.extensions['posts_view'] = self
+        if self.enabled:
+            app.before_request(self._ensure_started)
+
+    def _reset(self):
+        self._posts = {}
+        # _order_key 오름차순 = 피드 순서 (sort_key 내림차순, 같으면 문서 ID 내림차순)
+        self._order = []
+        self._digests = {}
+        self._update_times = {}
+        self._digest = 0
+        self._updated_at = None
+        self._watch = None
+        self._generation = 0
+        self._synced_generation = None
+        self._disconnected_at = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._stats = dict.fromkeys(('snapshots', 'changes', 'reconnects', 'connect_errors'), 0)
+
+    # --- 리스너 수명 ---
+
+    def _ensure_started(self):
+        # fork 된 워커에서는 부모의 리스너/스레드를 쓸 수 없으므로 pid 가 바뀌면 새로 시작합니다.
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            with self._lock:
+                self._reset()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='posts-view', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while self._thread is threading.current_thread():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error supervising posts view: {e}")
+            time.sleep(self.check_interval)
+
+    def check(self):
+        """리스너가 살아 있는지 확인하고, 끊겼으면 (재시도 대기 시간이 지났을 때) 다시 붙입니다."""
+        from repositories import get_repos
+        with self._check_lock:
+            watch = self._watch
+            if watch is not None and watch.is_active:
+                return True
+            now = time.monotonic()
+            with self._lock:
+                if self._synced_generation is not None and self._disconnected_at is None:
+                    self._disconnected_at = now
+            if now < self._retry_at:
+                return False
+            repos = get_repos()
+            if not repos:
+                return False
+            if watch is not None:
+                try:
+                    watch.unsubscribe()
+                except Exception:
+                    pass
+                self._stats['reconnects'] += 1
+            with self._lock:
+                self._generation += 1
+                generation = self._generation
+            try:
+                self._watch = repos.posts.collection.on_snapshot(
+                    lambda docs, changes, read_time: self._on_snapshot(generation, docs, changes, read_time))
+                self._failures = 0
+                return True
+            except Exception as e:
+                self._watch = None
+                self._failures += 1
+                self._stats['connect_errors'] += 1
+                self._retry_at = now + min(self.reconnect_base * 2 ** (self._failures - 1), self.reconnect_max)
+                print(f"Error attaching posts listener: {e}")
+                return False
+
+    def stop(self):
+        """리스너를 떼고 감시 스레드를 멈춥니다. (테스트/앱 재설정용)"""
+        watch, self._watch = self._watch, None
+        self._thread = None
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print(f"Error closing posts listener: {e}")
+        with self._lock:
+            self._reset()
+
+    # --- 스냅샷 반영 ---
+
+    def _on_snapshot(self, generation, docs, changes, read_time):
+        with self._lock:
+            if generation != self._generation:
+                return  # 이미 교체된 리스너
+            if self._synced_generation != generation:
+                # 새 리스너의 첫 스냅샷에는 전체 문서가 들어 있으므로 뷰를 새로 만듭니다.
+                self._posts, self._order, self._digests, self._update_times, self._digest = {}, [], {}, {}, 0
+                for doc in docs:
+                    self._put(doc)
+                self._synced_generation = generation
+                self._disconnected_at = None
+            else:
+                for change in changes:
+                    if change.type.name == 'REMOVED':
+                        self._remove(change.document.id)
+                    else:
+                        self._put(change.document)
+                self._stats['changes'] += len(changes)
+            self._updated_at = to_kst(read_time)
+            self._stats['snapshots'] += 1
+
+    def _put(self, doc):
+        if doc.id in self._posts:
+            known = self._update_times[doc.id]
+            if doc.update_time is not None and known is not None and doc.update_time < known:
+                return  # 늦게 도착한 이전 변경
+            self._remove(doc.id)
+        post = Post.from_dict(doc.to_dict() or {}, doc.id)
+        self._posts[doc.id] = post
+        bisect.insort(self._order, _order_key(post.sort_key, doc.id))
+        self._update_times[doc.id] = doc.update_time
+        digest = _doc_digest(doc.id, doc.update_time)
+        self._digests[doc.id] = digest
+        self._digest ^= digest
+
+    def _remove(self, post_id):
+        post = self._posts.pop(post_id, None)
+        if post is None:
+            return
+        key = _order_key(post.sort_key, post_id)
+        index = bisect.bisect_left(self._order, key)
+        if index < len(self._order) and self._order[index] == key:
+            del self._order[index]
+        self._digest ^= self._digests.pop(post_id)
+        self._update_times.pop(post_id, None)
+
+    # --- 읽기 ---
+
+    def ready(self):
+        """뷰를 믿고 읽어도 되면 True (첫 스냅샷을 받았고, 끊긴 지 최대 허용 시간이 지나지 않음)"""
+        if not self.enabled or self._pid != os.getpid():
+            return False
+        with self._lock:
+            if self._synced_generation is None:
+                return False
+            return self._disconnected_at is None or time.monotonic() - self._disconnected_at <= self.max_staleness
+
+    def state(self):
+        """(내용 요약값, 마지막 반영 시각) — 조건부 GET 검증값으로 씁니다. 워커가 달라도 내용이 같으면 같은 값입니다."""
+        with self._lock:
+            return f"{self._digest:016x}", self._updated_at
+
+    def feed_page(self, cursor, page_size, pinned_limit):
+        """PostRepository.feed_page 와 같은 결과(같은 커서)를 메모리에서 만듭니다."""
+        parsed = parse_feed_cursor(cursor)
+        with self._lock:
+            order, posts = self._order, self._posts
+            pinned_posts = []
+            if parsed is None:
+                for key in order[:pinned_limit]:
+                    if -key[0] < PIN_OFFSET:
+                        break
+                    pinned_posts.append(posts[key[-1]])
+                # 한도를 넘는 고정 게시글은 일반 페이지 앞쪽에 이어서 나옵니다.
+                start = len(pinned_posts)
+            elif parsed[1] is None:
+                # 문서 ID 가 없는 예전 커서: 같은 sort_key 는 모두 건너뜀
+                start = bisect.bisect_left(order, (-parsed[0] + 1,))
+            else:
+                start = bisect.bisect_right(order, _order_key(*parsed))
+            page = [posts[key[-1]] for key in order[start:start + page_size + 1]]
+        next_cursor = None
+        if len(page) > page_size:
+            last = page[page_size - 1]
+            next_cursor = encode_cursor(last.sort_key, last.id)
+        return pinned_posts, page[:page_size], next_cursor
+
+    def get(self, post_id):
+        with self._lock:
+            return self._posts.get(post_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['posts'] = len(self._posts)
+            stats['generation'] = self._generation
+            stats['disconnected_for'] = (round(time.monotonic() - self._disconnected_at, 1)
+                                         if self._disconnected_at is not None else None)
+        stats['enabled'] = self.enabled
+        stats['ready'] = self.ready()
+        return stats
+
+posts_view = PostsView()
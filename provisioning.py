@@ -0,0 +1,102 @@
+"""필수 계정/문서 초기 준비 (프로비저닝)
+
+배포 단계에서 `flask --app app provision` (Procfile 의 release) 또는 `python init_db.py` 로 실행합니다.
+앱 생성(create_app)의 부수 효과로는 PROVISION_ON_STARTUP 이 켜져 있을 때만 실행합니다. (인메모리 백엔드 기본값)
+완료 여부는 Firestore 'meta/provisioning' 문서와 호스트 로컬 표시 파일에 기록하여,
+이후 워커와 콜드 스타트는 관리자 계정 확인 쿼리를 건너뜁니다.
+"""
+import os
+import click
+from werkzeug.security import generate_password_hash
+from firebase_config import get_db
+from models import get_now_kst
+from repositories import Repositories, UsernameTaken
+from migrations import backfill_username_index
+
+# 프로비저닝 내용이 바뀌면 올려서 모든 환경에서 다시 실행되게 합니다.
+PROVISION_VERSION = 2
+
+def _meta_ref(db_fs):
+    return db_fs.collection('meta').document('provisioning')
+
+def _marker_is_current(marker_path):
+    try:
+        with open(marker_path) as f:
+            return f.read().strip() == str(PROVISION_VERSION)
+    except OSError:
+        return False
+
+def _write_marker(marker_path):
+    if not marker_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+        with open(marker_path, 'w') as f:
+            f.write(str(PROVISION_VERSION))
+    except OSError as e:
+        print(f"Error writing provisioning marker: {e}")
+
+def ensure_admin_user(db_fs, admin_password):
+    """관리자 계정이 없으면 생성합니다. 생성했으면 True 를 반환합니다."""
+    admin_username = 'admin'
+    users = Repositories(db_fs).users
+    if users.find_by_username(admin_username):
+        return False
+    try:
+        users.create(admin_username, '관리자', generate_password_hash(admin_password, method='pbkdf2:sha256'),
+                     is_admin=True)
+    except UsernameTaken:
+        # 동시에 실행된 다른 워커/배포가 먼저 만들었으므로 준비된 것으로 봅니다.
+        print(f"Admin user already created by another process: {admin_username}")
+        return False
+    print(f"Admin user created in Firestore: {admin_username}")
+    return True
+
+def ensure_provisioned(db_fs, admin_password='admin123', marker_path=None, force=False):
+    """필수 데이터를 멱등적으로 준비합니다. 실제로 프로비저닝을 수행했으면 True 를 반환합니다."""
+    if not force and marker_path and _marker_is_current(marker_path):
+        return False
+
+    meta_ref = _meta_ref(db_fs)
+    if not force:
+        meta_doc = meta_ref.get()
+        if meta_doc.exists and meta_doc.to_dict().get('version', 0) >= PROVISION_VERSION:
+            _write_marker(marker_path)
+            return False
+
+    # 관리자 계정 확인이 아이디 색인을 쓰므로 색인을 먼저 채웁니다. (v2)
+    backfill_username_index(db_fs)
+    ensure_admin_user(db_fs, admin_password)
+    meta_ref.set({'version': PROVISION_VERSION, 'completed_at': get_now_kst()})
+    _write_marker(marker_path)
+    return True
+
+def provision_app(app, force=False):
+    db_fs = get_db()
+    if not db_fs:
+        return False
+    return ensure_provisioned(
+        db_fs,
+        admin_password=app.config['ADMIN_INITIAL_PASSWORD'],
+        # 인메모리 백엔드는 프로세스마다 비어 있으므로 호스트 완료 기록을 쓰지 않습니다.
+        marker_path=app.config.get('PROVISION_MARKER_PATH') if app.config.get('DATABASE_BACKEND') != 'memory' else None,
+        force=force
+    )
+
+def init_app(app):
+    """`provision` CLI 명령을 등록하고, 설정에 따라 시작 시 프로비저닝을 실행합니다."""
+
+    @app.cli.command('provision')
+    @click.option('--force', is_flag=True, help='완료 기록을 무시하고 다시 실행합니다.')
+    def provision_command(force):
+        """관리자 계정 등 필수 데이터를 준비합니다."""
+        if provision_app(app, force=force):
+            click.echo('프로비저닝을 완료했습니다.')
+        else:
+            click.echo('이미 프로비저닝되어 있거나 데이터베이스 설정이 없습니다.')
+
+    if app.config.get('PROVISION_ON_STARTUP'):
+        try:
+            provision_app(app)
+        except Exception as e:
+            print(f"Error during startup provisioning: {e}")
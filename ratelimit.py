@@ -0,0 +1,223 @@
+"""쓰기 라우트 요청 수 제한 (토큰 버킷)
+
+로그인/가입(비밀번호 해시)과 글/댓글 작성(Firestore 쓰기 2회 이상)을 라우트별 한도로 제한합니다.
+한도는 RATE_LIMIT_<이름> = 'N/second|minute|hour' 형식이며, 순간적으로 N 번까지 허용하고
+그 뒤로는 기간당 N 번 속도로 다시 채워집니다. 빈 값이면 그 라우트는 제한하지 않습니다.
+
+- 키: 로그인한 사용자는 사용자 ID, 그 외에는 클라이언트 IP.
+  프록시 뒤에서는 remote_addr 가 프록시 주소이므로 RATE_LIMIT_TRUSTED_PROXIES 에 X-Forwarded-For 를 덧붙이는
+  프록시 수를 줍니다. (Heroku 라우터 1, Firebase Hosting + Functions 2. 배포 설정에 기본값이 들어 있음)
+- 로그인은 클라이언트별 한도(login)와 함께 대상 아이디별 한도(login_account)도 적용해,
+  여러 IP 에서 한 계정의 비밀번호를 맞춰 보는 시도도 막습니다.
+- 버킷 저장소: 같은 호스트의 모든 gunicorn 워커가 공유하는 /dev/shm 파일(mmap).
+  키 해시로 정한 칸 하나를 fcntl 바이트 범위 잠금으로 보호하므로, 요청당 비용은 잠금/해제 시스템 호출 정도입니다.
+  칸이 다른 키와 겹치면 그 키의 버킷은 가득 찬 상태로 다시 시작합니다. (한도를 넘게 허용하는 쪽으로만 틀림)
+  RATE_LIMIT_SHARED_DIR='' 이면 워커별 메모리 저장소를 씁니다.
+- 한도를 넘으면 Firestore 나 해시 작업 없이 바로 429 와 Retry-After 를 돌려줍니다.
+"""
+import fcntl
+import functools
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, flash, render_template, request
+from flask_login import current_user
+from cache import default_shared_dir, ensure_private_dir
+
+# 제한 대상 라우트 이름과 기본 한도
+DEFAULT_LIMITS = {
+    'login': '10/minute',
+    'login_account': '30/hour',
+    'signup': '5/minute',
+    'post': '5/minute',
+    'comment': '10/minute',
+}
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+def default_limit_dir():
+    return os.path.join(os.path.dirname(default_shared_dir()), 'hyyum-ratelimit')
+
+def parse_limit(spec):
+    """'10/minute' -> (버킷 크기 10, 초당 충전량 10/60). 빈 값이면 None"""
+    if not spec:
+        return None
+    try:
+        count, period = spec.split('/')
+        count = int(count)
+        seconds = _PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit: {spec!r} (예: '10/minute')")
+    if count <= 0:
+        return None
+    return count, count / seconds
+
+def _refill(tokens, updated, capacity, rate, now):
+    # 시계가 뒤로 가도 토큰이 줄지 않도록 경과 시간은 0 이상으로 둡니다.
+    return min(capacity, tokens + max(now - updated, 0.0) * rate)
+
+def _take(tokens, capacity, rate):
+    """(허용 여부, 남은 토큰, 다시 시도까지 초)"""
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+class LocalBuckets:
+    """워커 내부 버킷 저장소 (최대 항목 수를 넘으면 오래 쓰지 않은 키부터 버림)"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            allowed, tokens, retry_after = _take(_refill(tokens, updated, capacity, rate, now), capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+class SharedBuckets:
+    """워커 간 공유 버킷 저장소 (/dev/shm 파일의 고정 크기 칸 배열)
+
+    칸 구조: 키 해시(8바이트), 남은 토큰(double), 마지막 갱신 시각(double, time.time())
+    """
+
+    SLOT = struct.Struct('<Qdd')
+
+    def __init__(self, directory, slots=65536):
+        self.slots = slots
+        self.collisions = 0
+        ensure_private_dir(directory)
+        path = os.path.join(directory, f'buckets-{slots}')
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * self.SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # fcntl 잠금은 프로세스 단위이므로 같은 워커의 스레드끼리는 이 잠금으로 막습니다.
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def take(self, key, capacity, rate):
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big') | 1
+        offset = (digest % self.slots) * self.SLOT.size
+        if self._pid != os.getpid():
+            # fork 전에 부모가 잡고 있던 잠금일 수 있으므로 워커에서 새로 만듭니다.
+            self._lock, self._pid = threading.Lock(), os.getpid()
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                now = time.time()
+                stored, tokens, updated = self.SLOT.unpack_from(self._map, offset)
+                if stored != digest:
+                    if stored:
+                        self.collisions += 1
+                    tokens, updated = capacity, now
+                allowed, tokens, retry_after = _take(_refill(tokens, updated, capacity, rate, now), capacity, rate)
+                self.SLOT.pack_into(self._map, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+        return allowed, retry_after
+
+class RateLimiter:
+    """라우트별 토큰 버킷 제한 (Flask 확장 형태)"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.limits = {}
+        self.trusted_proxies = 0
+        self.store = LocalBuckets()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('RATE_LIMIT_ENABLED', True)
+        self.limits = {name: parse_limit(config.get(f'RATE_LIMIT_{name.upper()}', default))
+                       for name, default in DEFAULT_LIMITS.items()}
+        self.trusted_proxies = config.get('RATE_LIMIT_TRUSTED_PROXIES', 0)
+        self.store = LocalBuckets()
+        shared_dir = config.get('RATE_LIMIT_SHARED_DIR', default_limit_dir())
+        if self.enabled and shared_dir:
+            try:
+                self.store = SharedBuckets(shared_dir, config.get('RATE_LIMIT_SHARED_SLOTS', 65536))
+            except OSError as e:
+                print(f"Shared rate limit store disabled ({shared_dir}): {e}")
+        with self._stats_lock:
+            self._stats = {name: {'allowed': 0, 'limited': 0} for name in self.limits}
+        app.extensions['rate_limiter'] = self
+
+    def client_key(self):
+        if current_user.is_authenticated:
+            return f"user:{current_user.id}"
+        if self.trusted_proxies and len(request.access_route) >= self.trusted_proxies:
+            # 맨 앞 프록시가 덧붙인 주소 (그보다 앞의 항목은 클라이언트가 마음대로 보낼 수 있음)
+            return f"ip:{request.access_route[-self.trusted_proxies]}"
+        return f"ip:{request.remote_addr}"
+
+    def hit(self, name, key=None):
+        """요청 하나를 기록합니다. 허용되면 None, 한도를 넘으면 다시 시도까지 기다릴 초를 반환합니다.
+
+        key 가 없으면 client_key() 로 셉니다.
+        """
+        limit = self.limits.get(name)
+        if not self.enabled or limit is None:
+            return None
+        capacity, rate = limit
+        try:
+            allowed, retry_after = self.store.take(f"{name}:{key or self.client_key()}", capacity, rate)
+        except Exception as e:
+            # 저장소 오류로 정상 요청을 막지 않습니다.
+            print(f"Error checking rate limit: {e}")
+            return None
+        with self._stats_lock:
+            self._stats[name]['allowed' if allowed else 'limited'] += 1
+        return None if allowed else retry_after
+
+    def limit(self, name, template=None, key=None, **context):
+        """라우트 데코레이터. GET/HEAD 는 세지 않습니다.
+
+        key 는 요청마다 버킷 키를 돌려주는 함수이며, 없거나 빈 값을 돌려주면 client_key() 로 셉니다.
+        한도를 넘으면 template 이 있으면 안내 메시지와 함께 그 화면을, 없으면 짧은 텍스트를 429 로 돌려줍니다.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method in ('GET', 'HEAD', 'OPTIONS'):
+                    return view(*args, **kwargs)
+                retry_after = self.hit(name, key and key())
+                if retry_after is None:
+                    return view(*args, **kwargs)
+                seconds = max(1, math.ceil(retry_after))
+                message = f'요청이 너무 많습니다. {seconds}초 후에 다시 시도해주세요.'
+                headers = {'Retry-After': str(seconds)}
+                if template:
+                    flash(message)
+                    return render_template(template, **context), 429, headers
+                return current_app.response_class(message, status=429, headers=headers, mimetype='text/plain')
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """현재 워커의 라우트별 허용/거절 수"""
+        with self._stats_lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+        stats['enabled'] = self.enabled
+        stats['shared'] = isinstance(self.store, SharedBuckets)
+        stats['collisions'] = getattr(self.store, 'collisions', 0)
+        stats['limits'] = {name: limit and f"{limit[0]} burst, {limit[1]:.3g}/s" for name, limit in self.limits.items()}
+        return stats
+
+rate_limiter = RateLimiter()
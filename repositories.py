@@ -0,0 +1,607 @@
+"""데이터 접근 계층 (users, posts, comments, logs, jobs, view counts)
+
+라우트는 Firestore 쿼리를 직접 만들지 않고 이 저장소들을 통해 읽고 씁니다.
+저장소는 google.cloud.firestore.Client 와 같은 모양의 클라이언트라면 무엇이든 받으므로
+실제 Firestore 와 memory_firestore.MemoryClient 백엔드를 그대로 바꿔 끼울 수 있습니다.
+"""
+from datetime import datetime, timedelta
+from urllib.parse import quote
+from firebase_config import get_db, firestore_module, api_exceptions
+from models import Post, User, Log, Comment, Job, hydrate, get_now_kst, to_kst, make_sort_key, PIN_OFFSET, KST
+from search import index_terms, query_terms, parse_cursor
+
+# firestore_module.Query.DESCENDING 과 같은 값 (모듈을 읽을 때 Firestore SDK 를 가져오지 않도록 문자열로 둠)
+DESCENDING = 'DESCENDING'
+
+# Firestore WriteBatch 한 번에 담을 수 있는 최대 작업 수
+MAX_BATCH_WRITES = 500
+
+# 피드 카드에 필요한 필드만 전송받도록 하는 projection (본문 content 제외)
+FEED_FIELDS = ['title', 'excerpt', 'author_id', 'author_name', 'date_posted', 'is_pinned', 'sort_key', 'comment_count',
+               'version', 'view_count']
+
+def run_transaction(client, func, *args):
+    """func(transaction, *args) 를 트랜잭션으로 실행합니다. (충돌 시 재시도)"""
+    if hasattr(client, 'run_transaction'):
+        return client.run_transaction(func, *args)
+    return firestore_module.transactional(func)(client.transaction(), *args)
+
+def version_bump():
+    """버전 번호를 1 올리고 수정 시각을 서버 시각으로 기록하는 필드 변경 (조건부 GET 검증값)"""
+    return {'version': firestore_module.Increment(1), 'updated_at': firestore_module.SERVER_TIMESTAMP}
+
+def commit_writes(client, writes):
+    """(method, ref, data) 작업들을 WriteBatch 한도(500건) 단위로 나눠 커밋합니다."""
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = client.batch()
+        for method, ref, data in writes[start:start + MAX_BATCH_WRITES]:
+            if method == 'delete':
+                batch.delete(ref)
+            else:
+                getattr(batch, method)(ref, data)
+        batch.commit()
+
+def cascade_job_id(post_id):
+    """게시글 댓글 정리 작업의 문서 ID (같은 게시글에 작업이 두 번 생기지 않도록 고정)"""
+    return f'delete-comments-{post_id}'
+
+def new_job(kind, post_id):
+    """대기 상태의 jobs 문서 내용. lease_until 이 지금이므로 바로 맡을 수 있습니다."""
+    now = get_now_kst()
+    return {'kind': kind, 'post_id': post_id, 'status': 'pending', 'active': True,
+            'lease_owner': None, 'lease_until': now, 'deleted': 0, 'batches': 0, 'attempts': 0,
+            'error': None, 'created_at': now, 'updated_at': now}
+
+# 문서 ID 정렬 필드 (firestore_module.FieldPath.document_id() 와 같은 값)
+DOCUMENT_ID = '__name__'
+
+def encode_cursor(value, doc_id):
+    """정렬 값과 문서 ID 를 'value~doc_id' 커서로 만듭니다.
+
+    정렬 값이 같은 문서가 페이지 경계에 걸쳐도 빠지지 않도록 문서 ID 로 순서를 끝까지 정합니다.
+    """
+    return f"{value}~{doc_id}"
+
+def decode_cursor(cursor, convert):
+    """커서를 (정렬 값, 문서 ID) 로 바꿉니다. 문서 ID 가 없는 예전 커서는 (정렬 값, None) 입니다."""
+    value, sep, doc_id = cursor.partition('~')
+    if sep and not doc_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return convert(value), doc_id or None
+
+def cursor_fields(field, value, doc_id):
+    """start_after 에 넘길 커서 값 (order_by(field).order_by(DOCUMENT_ID) 순서)"""
+    return {field: value, DOCUMENT_ID: doc_id} if doc_id else {field: value}
+
+def parse_feed_cursor(cursor):
+    """피드 커서 -> (sort_key, post_id). 커서가 없으면 None"""
+    return decode_cursor(cursor, int) if cursor else None
+
+def parse_kst_date(value):
+    """'YYYY-MM-DD' 문자열을 KST 자정 datetime 으로 변환합니다."""
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=KST)
+
+class UsernameTaken(Exception):
+    """이미 다른 사용자가 쓰고 있는 아이디로 가입하려 할 때"""
+
+def username_key(username):
+    """usernames 색인 문서 ID. ('/', '.', '..', '__이름__' 처럼 문서 ID 로 쓸 수 없는 값을 피하도록 인코딩)"""
+    return quote(username, safe='').replace('.', '%2E').replace('_', '%5F')
+
+class UserRepository:
+    """사용자 저장소
+
+    usernames/{아이디} 색인 문서({'user_id': ...})를 사용자 생성과 같은 트랜잭션에서 만들어
+    아이디 조회를 쿼리 대신 문서 get 으로 처리하고, 아이디 중복을 원자적으로 막습니다.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.collection = client.collection('users')
+        self.usernames = client.collection('usernames')
+
+    def get(self, user_id):
+        user_doc = self.collection.document(user_id).get()
+        if not user_doc.exists:
+            return None
+        return User.from_dict(user_doc.to_dict(), user_doc.id)
+
+    def username_ref(self, username):
+        return self.usernames.document(username_key(username))
+
+    def username_exists(self, username):
+        return self.username_ref(username).get().exists
+
+    def find_by_username(self, username):
+        """색인 문서 get + 사용자 문서 get 으로 찾습니다. (없는 아이디는 get 1회)"""
+        if not username:
+            return None
+        index_doc = self.username_ref(username).get()
+        if not index_doc.exists:
+            return None
+        return self.get(index_doc.to_dict()['user_id'])
+
+    def create(self, username, name, password_hash, is_admin=False, created_at=None):
+        """새 사용자를 만들고 문서 ID 를 반환합니다. 아이디가 이미 있으면 UsernameTaken 을 던집니다."""
+        user_ref = self.collection.document()
+        index_ref = self.username_ref(username)
+        user_data = {
+            'username': username,
+            'name': name,
+            'password': password_hash,
+            'is_admin': is_admin,
+            'created_at': created_at or get_now_kst()
+        }
+
+        def create_user(transaction):
+            # 색인 문서를 트랜잭션 안에서 읽어 두면, 동시에 같은 아이디로 가입하는 쪽은 충돌 후 재시도에서 걸러집니다.
+            if index_ref.get(transaction=transaction).exists:
+                raise UsernameTaken(username)
+            transaction.set(user_ref, user_data)
+            transaction.set(index_ref, {'user_id': user_ref.id})
+
+        run_transaction(self.client, create_user)
+        return user_ref.id
+
+    def update(self, user_id, fields):
+        self.collection.document(user_id).update(fields)
+
+    def list_recent(self):
+        query = self.collection.order_by('created_at', direction=DESCENDING).stream()
+        return hydrate(User, query)
+
+class PostRepository:
+    """게시글 저장소
+
+    글 작성/수정/삭제/고정은 같은 배치에서 meta/feed 의 버전도 올립니다.
+    (피드 캐시 키가 이 버전을 사용합니다. 댓글 수와 조회 수는 버전을 올리지 않고 피드 캐시가 만료될 때 반영)
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.collection = client.collection('posts')
+        self.feed_ref = client.collection('meta').document('feed')
+        self.jobs = client.collection('jobs')
+
+    def feed_version(self):
+        """(피드 버전, 마지막 변경 시각) 을 반환합니다."""
+        doc = self.feed_ref.get()
+        data = doc.to_dict() if doc.exists else {}
+        return data.get('version', 0), to_kst(data.get('updated_at'))
+
+    def feed_page(self, cursor, page_size, pinned_limit):
+        """고정 게시글과 게시글 한 페이지를 'sort_key~post_id' 커서로 가져옵니다.
+
+        게시판 크기와 상관없이 (고정 게시글 수 + 페이지 크기 + 1)건만 읽습니다.
+        첫 페이지에서는 고정 게시글을 pinned_limit 건까지 별도의 작은 쿼리로 가져오고,
+        나머지는 sort_key 내림차순(고정 게시글이 먼저)으로 그 다음부터 이어 읽으므로
+        한도를 넘는 고정 게시글도 일반 페이지 앞쪽에 나옵니다.
+        """
+        # sort_key 정렬 뒤 문서 ID 를 같은 방향으로 정렬하므로 복합 색인이 필요 없습니다.
+        query = self.collection.select(FEED_FIELDS) \
+            .order_by('sort_key', direction=DESCENDING).order_by(DOCUMENT_ID, direction=DESCENDING)
+        pinned_posts, next_cursor = [], None
+        if cursor is None:
+            pinned_query = self.collection.select(FEED_FIELDS).where('sort_key', '>=', PIN_OFFSET) \
+                .order_by('sort_key', direction=DESCENDING).order_by(DOCUMENT_ID, direction=DESCENDING) \
+                .limit(pinned_limit)
+            pinned_posts = hydrate(Post, pinned_query.stream())
+            if pinned_posts:
+                query = query.start_after(cursor_fields('sort_key', pinned_posts[-1].sort_key, pinned_posts[-1].id))
+        else:
+            query = query.start_after(cursor_fields('sort_key', *parse_feed_cursor(cursor)))
+        # 다음 페이지 존재 여부를 알기 위해 한 건 더 읽습니다.
+        docs = list(query.limit(page_size + 1).stream())
+        posts = hydrate(Post, docs[:page_size])
+        if len(docs) > page_size:
+            next_cursor = encode_cursor(posts[-1].sort_key, posts[-1].id)
+        return pinned_posts, posts, next_cursor
+
+    def get(self, post_id):
+        post_doc = self.collection.document(post_id).get()
+        if not post_doc.exists:
+            return None
+        return Post.from_dict(post_doc.to_dict(), post_doc.id)
+
+    def get_many(self, post_ids):
+        """여러 게시글을 한 번의 get_all 로 읽어 post_ids 순서대로 반환합니다. (없는 글은 제외)"""
+        refs = [self.collection.document(post_id) for post_id in post_ids]
+        docs = [doc for doc in self.client.get_all(refs, field_paths=FEED_FIELDS) if doc.exists]
+        found = {post.id: post for post in hydrate(Post, docs)}
+        return [found[post_id] for post_id in post_ids if post_id in found]
+
+    def create(self, post):
+        """Post 객체를 저장하고 문서 ID 를 반환합니다."""
+        post_ref = self.collection.document()
+        batch = self.client.batch()
+        batch.set(post_ref, post.to_dict())
+        batch.set(self.feed_ref, version_bump(), merge=True)
+        batch.commit()
+        return post_ref.id
+
+    def update(self, post_id, fields):
+        batch = self.client.batch()
+        batch.update(self.collection.document(post_id), dict(fields, **version_bump()))
+        batch.set(self.feed_ref, version_bump(), merge=True)
+        batch.commit()
+
+    def delete(self, post_id):
+        """게시글을 지우고, 남은 댓글을 지울 백그라운드 작업을 같은 배치로 등록합니다."""
+        batch = self.client.batch()
+        batch.delete(self.collection.document(post_id))
+        batch.set(self.jobs.document(cascade_job_id(post_id)), new_job('delete_comments', post_id))
+        batch.set(self.feed_ref, version_bump(), merge=True)
+        batch.commit()
+
+    def set_pinned(self, post, is_pinned):
+        self.update(post.id, {
+            'is_pinned': is_pinned,
+            'sort_key': make_sort_key(is_pinned, post.date_posted)
+        })
+
+class CommentRepository:
+    def __init__(self, client):
+        self.client = client
+        self.collection = client.collection('comments')
+        self.posts = client.collection('posts')
+
+    def page(self, post_id, cursor, page_size):
+        """댓글을 최신순으로 한 페이지만 가져옵니다. (전역 'comments' 컬렉션에서 post_id로 필터링)
+
+        화면에는 페이지 안에서 작성 순서대로 보여주고, 더 오래된 댓글은 커서로 이어서 봅니다.
+        """
+        query = self.collection.where('post_id', '==', post_id) \
+            .order_by('timestamp', direction=DESCENDING).order_by(DOCUMENT_ID, direction=DESCENDING)
+        if cursor:
+            query = query.start_after(cursor_fields('timestamp', *decode_cursor(cursor, datetime.fromisoformat)))
+        docs = list(query.limit(page_size + 1).stream())
+        comments = hydrate(Comment, docs[:page_size])
+        next_cursor = None
+        if len(docs) > page_size:
+            next_cursor = encode_cursor(comments[-1].timestamp.isoformat(), comments[-1].id)
+        comments.reverse()
+        return comments, next_cursor
+
+    def get(self, comment_id):
+        comment_doc = self.collection.document(comment_id).get()
+        if not comment_doc.exists:
+            return None
+        return Comment.from_dict(comment_doc.to_dict(), comment_doc.id)
+
+    def add(self, comment):
+        """댓글 생성과 게시글의 comment_count 증가를 하나의 배치로 원자적으로 커밋합니다.
+
+        게시글이 없으면 update 가 실패하여(NotFound) 댓글도 생성되지 않습니다.
+        댓글은 meta/feed 버전을 올리지 않습니다. (피드의 댓글 수는 최대 FEED_CACHE_TTL 만큼 늦음)
+        """
+        comment_ref = self.collection.document()
+        batch = self.client.batch()
+        batch.set(comment_ref, comment.to_dict())
+        batch.update(self.posts.document(comment.post_id),
+                     dict(version_bump(), comment_count=firestore_module.Increment(1)))
+        batch.commit()
+        return comment_ref.id
+
+    def delete(self, comment):
+        comment_ref = self.collection.document(comment.id)
+        batch = self.client.batch()
+        batch.delete(comment_ref)
+        batch.update(self.posts.document(comment.post_id),
+                     dict(version_bump(), comment_count=firestore_module.Increment(-1)))
+        try:
+            batch.commit()
+        except api_exceptions.NotFound:
+            # 게시글이 이미 삭제된 경우 댓글만 지웁니다.
+            comment_ref.delete()
+
+class LogRepository:
+    def __init__(self, client):
+        self.client = client
+        self.collection = client.collection('logs')
+
+    def add_many(self, entries):
+        """로그 항목들을 WriteBatch 단위(최대 500건)로 기록하고, 기록한 건수를 반환합니다."""
+        written = 0
+        for start in range(0, len(entries), MAX_BATCH_WRITES):
+            chunk = entries[start:start + MAX_BATCH_WRITES]
+            batch = self.client.batch()
+            for entry in chunk:
+                batch.set(self.collection.document(), entry)
+            batch.commit()
+            written += len(chunk)
+        return written
+
+    def recent(self, limit):
+        query = self.collection.order_by('timestamp', direction=DESCENDING).limit(limit).stream()
+        return hydrate(Log, query)
+
+    def page(self, filters, cursor, page_size):
+        """필터를 Firestore 색인 쿼리로 실행하고 timestamp 커서로 한 페이지만 읽습니다.
+
+        action/user_id 는 등호 조건, 기간은 timestamp 범위 조건이므로
+        정렬 필드(timestamp)와 함께 firestore.indexes.json 의 복합 색인을 사용합니다.
+        """
+        query = self.collection
+        if filters.get('action'):
+            query = query.where('action', '==', filters['action'])
+        if filters.get('user_id'):
+            query = query.where('user_id', '==', filters['user_id'])
+        if filters.get('since'):
+            query = query.where('timestamp', '>=', parse_kst_date(filters['since']))
+        if filters.get('until'):
+            # 종료일 당일을 포함합니다.
+            query = query.where('timestamp', '<', parse_kst_date(filters['until']) + timedelta(days=1))
+        query = query.order_by('timestamp', direction=DESCENDING).order_by(DOCUMENT_ID, direction=DESCENDING)
+        if cursor:
+            query = query.start_after(cursor_fields('timestamp', *decode_cursor(cursor, datetime.fromisoformat)))
+
+        docs = list(query.limit(page_size + 1).stream())
+        logs = hydrate(Log, docs[:page_size])
+        next_cursor = None
+        if len(docs) > page_size:
+            next_cursor = encode_cursor(logs[-1].timestamp.isoformat(), logs[-1].id)
+        return logs, next_cursor
+
+class SearchRepository:
+    """게시글 bigram/unigram 역색인
+
+    - search_postings/{post_id}_{토큰 hex}: {token, post_id, weight}  (토큰별 조회용)
+    - search_docs/{post_id}: {terms: {토큰: 가중치}}  (수정/삭제 시 바뀐 토큰만 고치기 위한 기록)
+    검색 비용은 검색어 토큰에 해당하는 postings 수에만 비례하고 게시판 크기와는 무관합니다.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.postings = client.collection('search_postings')
+        self.docs = client.collection('search_docs')
+
+    def _posting_ref(self, post_id, token):
+        # 토큰에 문서 ID 로 쓸 수 없는 문자가 있을 수 있어 hex 로 인코딩합니다.
+        return self.postings.document(f"{post_id}_{token.encode('utf-8').hex()}")
+
+    def index_post(self, post_id, title, content):
+        """게시글의 토큰을 다시 계산하고 바뀐 postings 만 쓰거나 지웁니다."""
+        doc = self.docs.document(post_id).get()
+        old_terms = (doc.to_dict() or {}).get('terms', {}) if doc.exists else {}
+        new_terms = index_terms(title, content)
+
+        writes = []
+        for token in old_terms.keys() - new_terms.keys():
+            writes.append(('delete', self._posting_ref(post_id, token), None))
+        for token, weight in new_terms.items():
+            if old_terms.get(token) != weight:
+                writes.append(('set', self._posting_ref(post_id, token),
+                               {'token': token, 'post_id': post_id, 'weight': weight}))
+        writes.append(('set', self.docs.document(post_id), {'terms': new_terms}))
+        commit_writes(self.client, writes)
+        return len(writes)
+
+    def remove_post(self, post_id):
+        doc = self.docs.document(post_id).get()
+        if not doc.exists:
+            return 0
+        terms = (doc.to_dict() or {}).get('terms', {})
+        writes = [('delete', self._posting_ref(post_id, token), None) for token in terms]
+        writes.append(('delete', self.docs.document(post_id), None))
+        commit_writes(self.client, writes)
+        return len(writes)
+
+    def rank(self, query, max_postings):
+        """검색어의 모든 토큰을 포함하는 게시글을 ([(score, post_id), ...] 점수순, 잘림 여부) 로 반환합니다.
+
+        토큰마다 postings 를 최대 max_postings 건만 읽으므로, 한도에 닿은 토큰이 있으면
+        결과에서 빠진 글이 있을 수 있어 잘림 여부를 True 로 돌려줍니다.
+        """
+        terms = query_terms(query)
+        scores, matched = {}, {}
+        truncated = False
+        for token in terms:
+            docs = list(self.postings.select(['post_id', 'weight']).where('token', '==', token)
+                        .limit(max_postings).stream())
+            truncated = truncated or len(docs) >= max_postings
+            for doc in docs:
+                data = doc.to_dict()
+                post_id = data['post_id']
+                scores[post_id] = scores.get(post_id, 0) + data.get('weight', 1)
+                matched[post_id] = matched.get(post_id, 0) + 1
+        ranked = [(score, post_id) for post_id, score in scores.items() if matched[post_id] == len(terms)]
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return ranked, truncated
+
+    @staticmethod
+    def page(ranked, cursor, page_size):
+        """점수순 목록에서 'score:post_id' 커서 다음부터 한 페이지를 잘라냅니다."""
+        if cursor:
+            score, post_id = parse_cursor(cursor)
+            after = (-score, post_id)
+            ranked = [item for item in ranked if (-item[0], item[1]) > after]
+        page = ranked[:page_size]
+        next_cursor = f"{page[-1][0]}:{page[-1][1]}" if len(ranked) > page_size else None
+        return page, next_cursor
+
+class JobRepository:
+    """백그라운드 작업 저장소 (jobs 컬렉션)
+
+    작업은 lease_until 시각까지 한 워커(lease_owner)가 맡습니다. 워커가 죽으면 lease 가 지난 뒤
+    다른 워커가 이어받고, 진행 상황은 댓글 삭제와 같은 트랜잭션에 기록되므로 남은 부분부터 계속합니다.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.collection = client.collection('jobs')
+        self.comments = client.collection('comments')
+        self.views = ViewCountRepository(client)
+
+    def claim(self, owner, lease_seconds):
+        """lease 가 비었거나 만료된 작업 하나를 맡아 Job 으로 반환합니다. 없으면 None"""
+        query = self.collection.where('active', '==', True).order_by('lease_until').limit(1)
+
+        def claim_job(transaction):
+            docs = list(transaction.get(query))
+            if not docs:
+                return None
+            now = get_now_kst()
+            data = docs[0].to_dict()
+            # lease 가 가장 먼저 끝나는 작업도 아직 누가 맡고 있으면 맡을 작업이 없습니다.
+            if to_kst(data['lease_until']) > now:
+                return None
+            data.update(status='running', lease_owner=owner, lease_until=now + timedelta(seconds=lease_seconds),
+                        attempts=data.get('attempts', 0) + 1, updated_at=now)
+            transaction.update(docs[0].reference, {
+                k: data[k] for k in ('status', 'lease_owner', 'lease_until', 'attempts', 'updated_at')})
+            return Job.from_dict(data, docs[0].id)
+
+        return run_transaction(self.client, claim_job)
+
+    def delete_comment_batch(self, job, owner, limit, lease_seconds):
+        """댓글을 최대 limit 건 지우고 진행 상황과 lease 연장을 같은 트랜잭션으로 기록합니다.
+
+        지운 건수를 반환하고, lease 를 다른 워커에게 빼앗겼으면 None 을 반환합니다.
+        lease 확인도 같은 트랜잭션에서 하므로, 그사이 다른 워커가 작업을 맡으면 커밋이 충돌해 다시 확인합니다.
+        limit 보다 적게 지웠으면 남은 댓글이 없으므로 조회 수 샤드까지 지우고 작업을 완료로 표시합니다.
+        """
+        job_ref = self.collection.document(job.id)
+        docs = list(self.comments.where('post_id', '==', job.post_id).select(['post_id']).limit(limit).stream())
+        done = len(docs) < limit
+        if done:
+            # 완료 기록보다 먼저 지우므로 실패해도 다시 시도할 때 이어서 지웁니다. (삭제된 글의 샤드이므로 언제 지워도 안전)
+            self.views.delete(job.post_id)
+
+        def write_batch(transaction):
+            job_doc = job_ref.get(transaction=transaction)
+            if not job_doc.exists or job_doc.to_dict().get('lease_owner') != owner:
+                return None
+            now = get_now_kst()
+            fields = {
+                'deleted': firestore_module.Increment(len(docs)),
+                'batches': firestore_module.Increment(1),
+                'lease_until': now + timedelta(seconds=lease_seconds),
+                'updated_at': now
+            }
+            if done:
+                fields.update(status='done', active=False, lease_owner=None, error=None)
+            for doc in docs:
+                transaction.delete(doc.reference)
+            transaction.update(job_ref, fields)
+            return len(docs)
+
+        return run_transaction(self.client, write_batch)
+
+    def fail(self, job, error, retry_delay, max_attempts):
+        """실패를 기록하고 lease 를 풀어 retry_delay 뒤(시도할수록 2배) 다시 맡을 수 있게 합니다."""
+        now = get_now_kst()
+        fields = {'error': str(error)[:500], 'lease_owner': None, 'updated_at': now}
+        if job.attempts >= max_attempts:
+            fields.update(status='failed', active=False)
+        else:
+            fields.update(status='pending',
+                          lease_until=now + timedelta(seconds=retry_delay * 2 ** (job.attempts - 1)))
+        self.collection.document(job.id).update(fields)
+
+    def recent(self, limit):
+        query = self.collection.order_by('created_at', direction=DESCENDING).limit(limit).stream()
+        return hydrate(Job, query)
+
+class ViewCountRepository:
+    """게시글 조회 수 샤드 (posts/{id}/view_shards/{0..shards-1})
+
+    조회 수를 게시글 문서 하나에 바로 더하면 문서당 쓰기 한도(초당 약 1회)에 걸리므로,
+    워커가 모은 증가분을 여러 샤드 문서에 나눠 더하고(add_many), 합계는 가끔 게시글의 view_count 에 옮깁니다(rollup).
+    샤드 수는 늘리기만 해야 합니다. (줄이면 남은 샤드의 수가 합계에서 빠짐)
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.posts = client.collection('posts')
+
+    def shard_ref(self, post_id, shard):
+        return self.posts.document(post_id).collection('view_shards').document(str(shard))
+
+    def add_many(self, counts, shard):
+        """{post_id: 증가분} 을 게시글마다 같은 번호의 샤드에 더합니다. 쓰기 수를 반환합니다."""
+        items = list(counts.items())
+        for start in range(0, len(items), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for post_id, count in items[start:start + MAX_BATCH_WRITES]:
+                batch.set(self.shard_ref(post_id, shard), {'count': firestore_module.Increment(count)}, merge=True)
+            batch.commit()
+        return len(items)
+
+    def totals(self, post_ids, shards):
+        """게시글마다 모든 샤드의 합을 한 번의 get_all 로 읽습니다. (읽기 수 = 게시글 수 x 샤드 수)"""
+        refs = [self.shard_ref(post_id, shard) for post_id in post_ids for shard in range(shards)]
+        totals = dict.fromkeys(post_ids, 0)
+        for doc in self.client.get_all(refs):
+            if doc.exists:
+                # get_all 은 순서를 보장하지 않으므로 경로(posts/{id}/view_shards/{n})에서 게시글 ID 를 꺼냅니다.
+                totals[doc.reference.path.split('/')[-3]] += (doc.to_dict() or {}).get('count', 0)
+        return totals
+
+    def rollup(self, totals):
+        """합계를 게시글 문서의 view_count 에 기록합니다. (version 은 올리지 않음) 기록한 게시글 수를 반환합니다.
+
+        여러 워커가 같은 글을 동시에 롤업해도 조회 수가 줄지 않도록, 트랜잭션 안에서 현재 값보다 클 때만 씁니다.
+        그사이 삭제된 글은 건너뛰고, 삭제 뒤 늦게 플러시되어 다시 생긴 샤드 문서를 지웁니다.
+        """
+        items = list(totals.items())
+        written, deleted = 0, set()
+        for start in range(0, len(items), MAX_BATCH_WRITES):
+            chunk = dict(items[start:start + MAX_BATCH_WRITES])
+
+            def write_totals(transaction):
+                refs = [self.posts.document(post_id) for post_id in chunk]
+                updates, missing = 0, set(chunk)
+                for doc in self.client.get_all(refs, field_paths=['view_count'], transaction=transaction):
+                    if not doc.exists:
+                        continue
+                    missing.discard(doc.id)
+                    if chunk[doc.id] > ((doc.to_dict() or {}).get('view_count') or 0):
+                        transaction.update(doc.reference, {'view_count': chunk[doc.id]})
+                        updates += 1
+                return updates, missing
+
+            updates, missing = run_transaction(self.client, write_totals)
+            written += updates
+            deleted |= missing
+        for post_id in deleted:
+            self.delete(post_id)
+        return written
+
+    def delete(self, post_id):
+        """게시글의 샤드 문서를 모두 지웁니다. (샤드 수 설정이 바뀌었어도 남은 샤드를 모두 찾음)"""
+        shards = self.posts.document(post_id).collection('view_shards')
+        refs = [doc.reference for doc in shards.select(['count']).stream()]
+        for start in range(0, len(refs), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for ref in refs[start:start + MAX_BATCH_WRITES]:
+                batch.delete(ref)
+            batch.commit()
+        return len(refs)
+
+class Repositories:
+    """하나의 데이터 백엔드 클라이언트에 연결된 저장소 묶음"""
+
+    def __init__(self, client):
+        self.client = client
+        self.users = UserRepository(client)
+        self.posts = PostRepository(client)
+        self.comments = CommentRepository(client)
+        self.logs = LogRepository(client)
+        self.search = SearchRepository(client)
+        self.jobs = JobRepository(client)
+        self.views = ViewCountRepository(client)
+
+    def run_transaction(self, func, *args):
+        return run_transaction(self.client, func, *args)
+
+_repos = None
+
+def get_repos():
+    """현재 데이터 백엔드에 연결된 저장소 묶음을 반환합니다. (데이터베이스 설정이 없으면 None)"""
+    global _repos
+    client = get_db()
+    if client is None:
+        return None
+    if _repos is None or _repos.client is not client:
+        _repos = Repositories(client)
+    return _repos
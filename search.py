@@ -0,0 +1,63 @@
+"""게시글 검색용 토큰화 (한국어 친화적인 문자 bigram + 한 글자 unigram)
+
+형태소 분석 없이 단어를 두 글자씩 겹쳐 자릅니다. ('게시판' -> '게시', '시판')
+조사가 붙은 단어('게시판에')로 써도 같은 bigram 이 나오므로 부분 일치 검색이 됩니다.
+한 글자 검색어도 그 글자가 들어간 모든 단어와 맞도록, 단어의 각 글자도 토큰으로 색인합니다.
+검색어는 두 글자 이상 단어면 bigram 을, 한 글자 단어면 그 글자를 씁니다.
+"""
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r'\w+')
+
+# 제목에 나온 토큰은 본문보다 높은 가중치를 줍니다.
+TITLE_WEIGHT = 3
+
+# 검색어에서 사용하는 최대 토큰 수 (토큰마다 postings 쿼리 1회)
+MAX_QUERY_TERMS = 8
+
+def normalize(text):
+    """전각/반각 등을 NFKC 로 통일하고 소문자로 바꿉니다."""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+def bigrams(text):
+    """검색어 토큰: 두 글자 이상 단어는 bigram, 한 글자 단어는 그 글자"""
+    for word in _WORD_RE.findall(normalize(text)):
+        if len(word) == 1:
+            yield word
+            continue
+        for i in range(len(word) - 1):
+            yield word[i:i + 2]
+
+def index_tokens(text):
+    """색인 토큰: 두 글자 이상 단어의 bigram 과 모든 단어의 각 글자(unigram)"""
+    for word in _WORD_RE.findall(normalize(text)):
+        for i in range(len(word) - 1):
+            yield word[i:i + 2]
+        yield from word
+
+def index_terms(title, content):
+    """게시글의 {토큰: 가중치} 를 만듭니다. 가중치 = 제목 등장 수 * TITLE_WEIGHT + 본문 등장 수"""
+    terms = {}
+    for token in index_tokens(title):
+        terms[token] = terms.get(token, 0) + TITLE_WEIGHT
+    for token in index_tokens(content):
+        terms[token] = terms.get(token, 0) + 1
+    return terms
+
+def query_terms(query):
+    """검색어의 토큰을 중복 없이 최대 MAX_QUERY_TERMS 개 반환합니다."""
+    terms = []
+    for token in bigrams(query):
+        if token not in terms:
+            terms.append(token)
+            if len(terms) >= MAX_QUERY_TERMS:
+                break
+    return terms
+
+def parse_cursor(cursor):
+    """'score:post_id' 커서를 (score, post_id) 로 변환합니다."""
+    score, _, post_id = cursor.partition(':')
+    if not post_id:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+    return int(score), post_id
@@ -0,0 +1,39 @@
+"""서빙 모드 (SERVING_MODE)
+
+- sync (기본): gunicorn gthread 워커. 워커당 동시 처리 수는 스레드 수(WEB_THREADS)로 제한됩니다.
+- async: gunicorn gevent 워커. 요청마다 greenlet 하나를 쓰므로, Firestore 응답을 기다리는 동안
+  다른 요청을 처리하여 워커 하나가 수백 개의 요청을 동시에 기다릴 수 있습니다. (WORKER_CONNECTIONS)
+
+async 모드에서도 라우트와 저장소 코드는 그대로입니다. Firestore 동기 클라이언트는 gRPC 를 쓰는데,
+gRPC 의 gevent 연동을 켜면 호출이 이벤트 루프를 막지 않고 greenlet 만 기다리게 됩니다.
+gevent 는 선택 의존성입니다. (requirements-async.txt)
+"""
+import os
+
+SERVING_MODES = ('sync', 'async')
+
+def serving_mode():
+    mode = os.environ.get('SERVING_MODE', 'sync')
+    if mode not in SERVING_MODES:
+        raise ValueError(f"Unknown SERVING_MODE: {mode} (가능: {', '.join(SERVING_MODES)})")
+    return mode
+
+def gevent_patched():
+    """gunicorn gevent 워커처럼 표준 라이브러리가 gevent 로 패치된 프로세스인지 확인합니다."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def init_async_runtime():
+    """gRPC 를 gevent 와 연동합니다. Firestore 클라이언트를 만들기 전에 호출해야 합니다.
+
+    gevent 로 패치되지 않은 프로세스(flask run, 테스트 등)에서는 아무것도 하지 않고 False 를 반환합니다.
+    """
+    if not gevent_patched():
+        print("SERVING_MODE=async 이지만 gevent 워커가 아니므로 동기 모드로 실행합니다.")
+        return False
+    from grpc.experimental import gevent as grpc_gevent
+    grpc_gevent.init_gevent()
+    return True
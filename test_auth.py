@@ -1,23 +1,41 @@
+import csv
+import io
+import json
+import time
 import pytest
+import firebase_config
 from app import create_app
-from models import db, User
+import migrations
+import provisioning
+from models import Post
+from passwords import PasswordHasherBusy
+from ratelimit import rate_limiter, SharedBuckets
+from repositories import get_repos, UsernameTaken
 from werkzeug.security import generate_password_hash
 
 @pytest.fixture
 def app():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
+    app = create_app({
+        'TESTING': True,
+        'DATABASE_BACKEND': 'memory',
+        'CACHE_SHARED_DIR': '',
+        'AUDIT_LOG_ASYNC': False,
+        'PROVISION_ON_STARTUP': False,
+        'PASSWORD_POOL_WORKERS': 0,
+        'CASCADE_WORKER_ENABLED': False,
+        'RATE_LIMIT_ENABLED': False,
+        'VIEW_COUNTER_ENABLED': False
+    })
+    yield app
 
 @pytest.fixture
 def client(app):
     return app.test_client()
 
+def create_user(username, name, password, is_admin=False):
+    return get_repos().users.create(
+        username, name, generate_password_hash(password, method='pbkdf2:sha256'), is_admin=is_admin)
+
 def test_index_page(client):
     """홈 페이지 접근 테스트"""
     response = client.get('/')
@@ -31,24 +49,24 @@ def test_signup(client, app):
         'name': 'Test User',
         'password': 'password123'
     }, follow_redirects=True)
-    
+
     assert response.status_code == 200
-    with app.app_context():
-        user = User.query.filter_by(username='testuser').first()
-        assert user is not None
-        assert user.name == 'Test User'
+    user = get_repos().users.find_by_username('testuser')
+    assert user is not None
+    assert user.name == 'Test User'
+
+    # 같은 아이디로 다시 가입하면 거부
+    response = client.post('/signup', data={
+        'username': 'testuser',
+        'name': 'Other',
+        'password': 'password123'
+    }, follow_redirects=True)
+    assert '이미 존재하는 아이디입니다.' in response.get_data(as_text=True)
 
 def test_login_logout(client, app):
     """로그인 및 로그아웃 기능 테스트"""
     # 먼저 사용자 생성
-    with app.app_context():
-        user = User(
-            username='loginuser',
-            name='Login User',
-            password=generate_password_hash('password123', method='pbkdf2:sha256')
-        )
-        db.session.add(user)
-        db.session.commit()
+    create_user('loginuser', 'Login User', 'password123')
 
     # 로그인
     response = client.post('/login', data={
@@ -56,7 +74,7 @@ def test_login_logout(client, app):
         'password': 'password123'
     }, follow_redirects=True)
     assert b'Login User' in response.data
-    
+
     # 로그아웃
     response = client.get('/logout', follow_redirects=True)
     assert b'\xeb\xa1\x9c\xea\xb7\xb8\xec\x9d\xb8' in response.data # '로그인' in Korean UTF-8
@@ -64,22 +82,8 @@ def test_login_logout(client, app):
 def test_admin_access(client, app):
     """관리자 권한 접근 제어 테스트"""
     # 일반 사용자 생성 및 로그인
-    with app.app_context():
-        user = User(
-            username='normaluser',
-            name='Normal User',
-            password=generate_password_hash('pass', method='pbkdf2:sha256'),
-            is_admin=False
-        )
-        admin = User(
-            username='adminuser',
-            name='Admin User',
-            password=generate_password_hash('pass', method='pbkdf2:sha256'),
-            is_admin=True
-        )
-        db.session.add(user)
-        db.session.add(admin)
-        db.session.commit()
+    create_user('normaluser', 'Normal User', 'pass')
+    create_user('adminuser', 'Admin User', 'pass', is_admin=True)
 
     # 일반 사용자로 관리자 페이지 접근 시도 (403 예상)
     client.post('/login', data={'username': 'normaluser', 'password': 'pass'})
@@ -92,3 +96,209 @@ def test_admin_access(client, app):
     response = client.get('/admin')
     assert response.status_code == 200
     assert b'ADMIN ONLY' in response.data
+
+def test_session_user_cache(client, app):
+    """세션 사용자는 캐시에서 불러오고, 권한 변경 시 즉시 반영되는지 테스트"""
+    user_id = create_user('member', 'Member', 'pass')
+    create_user('boss', 'Boss', 'pass', is_admin=True)
+    client.post('/login', data={'username': 'member', 'password': 'pass'})
+
+    # 인증된 페이지 조회는 users 문서 읽기 없이 처리
+    db_fs = get_repos().client
+    client.get('/')
+    db_fs.reset_stats()
+    client.get('/admin')
+    assert db_fs.stats['gets'] == 0
+
+    # 다른 클라이언트의 관리자가 권한을 부여하면 다음 요청부터 관리자 페이지 접근 가능
+    admin_client = app.test_client()
+    admin_client.post('/login', data={'username': 'boss', 'password': 'pass'})
+    admin_client.post(f'/admin/user/{user_id}/role')
+    assert client.get('/admin').status_code == 200
+
+def test_export(client, app):
+    """관리자 데이터 내보내기(CSV/NDJSON) 테스트"""
+    create_user('member', 'Member', 'pass')
+    create_user('boss', 'Boss', 'pass', is_admin=True)
+
+    client.post('/login', data={'username': 'member', 'password': 'pass'})
+    assert client.get('/admin/export/users.csv').status_code == 403
+    client.get('/logout')
+
+    client.post('/login', data={'username': 'boss', 'password': 'pass'})
+    response = client.get('/admin/export/users.csv')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('\ufeff'))))
+    assert rows[0] == ['id', 'username', 'name', 'is_admin', 'created_at']
+    assert sorted(row[1] for row in rows[1:]) == ['boss', 'member']
+    # 비밀번호 해시는 내보내지 않음
+    assert 'pbkdf2' not in response.get_data(as_text=True)
+
+    response = client.get('/admin/export/logs.ndjson')
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert any(record['action'] == '로그인' for record in records)
+    assert client.get('/admin/export/secrets.csv').status_code == 404
+
+def test_password_rehash_on_login(client, app):
+    """해시 설정이 바뀌면 로그인 성공 시 새 설정으로 다시 저장되는지 테스트"""
+    user_id = create_user('member', 'Member', 'pass')
+    app.extensions['password_hasher'].method = 'pbkdf2:sha256:1000'
+
+    client.post('/login', data={'username': 'member', 'password': 'wrong'})
+    assert get_repos().users.get(user_id).password.startswith('pbkdf2:sha256:600000$')
+
+    client.post('/login', data={'username': 'member', 'password': 'pass'})
+    assert get_repos().users.get(user_id).password.startswith('pbkdf2:sha256:1000$')
+    client.get('/logout')
+    response = client.post('/login', data={'username': 'member', 'password': 'pass'})
+    assert response.status_code == 302
+    assert app.extensions['password_hasher'].stats()['rehashed'] == 1
+
+def test_password_pool_busy(client, app):
+    """해시 작업 자리가 모두 차 있으면 기다리지 않고 503 으로 거절하는지 테스트"""
+    create_user('member', 'Member', 'pass')
+    hasher = app.extensions['password_hasher']
+    hasher.acquire_timeout = 0
+    for _ in range(hasher.max_pending):
+        hasher._slots.acquire()
+    try:
+        response = client.post('/login', data={'username': 'member', 'password': 'pass'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    finally:
+        for _ in range(hasher.max_pending):
+            hasher._slots.release()
+    assert client.post('/login', data={'username': 'member', 'password': 'pass'}).status_code == 302
+
+def test_password_pool_timeout(client, app):
+    """작업이 시간 안에 끝나지 않으면 503 으로 거절하고, 끝날 때까지 자리를 돌려주지 않는지 테스트"""
+    create_user('member', 'Member', 'pass')
+    hasher = app.extensions['password_hasher']
+    app.config.update(PASSWORD_POOL_WORKERS=1, PASSWORD_POOL_KIND='thread', PASSWORD_POOL_MAX_PENDING=1,
+                      PASSWORD_POOL_TIMEOUT=0.05)
+    hasher.init_app(app)
+    before = hasher.stats()
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher._run(time.sleep, 0.3)
+        # 포기한 작업이 아직 자리를 차지하므로 바로 거절
+        response = client.post('/login', data={'username': 'member', 'password': 'pass'})
+        assert response.status_code == 503
+        stats = hasher.stats()
+        assert stats['timed_out'] - before['timed_out'] == 1 and stats['rejected'] - before['rejected'] == 1
+
+        time.sleep(0.4)
+        app.config['PASSWORD_POOL_TIMEOUT'] = 10.0
+        hasher.timeout = 10.0
+        assert client.post('/login', data={'username': 'member', 'password': 'pass'}).status_code == 302
+    finally:
+        hasher.shutdown()
+
+def test_username_index(client, app):
+    """아이디 조회는 색인 문서 get 으로 처리하고, 중복 가입은 원자적으로 거부하는지 테스트"""
+    repos = get_repos()
+    user_id = create_user('member', 'Member', 'pass')
+    repos.client.reset_stats()
+    assert repos.users.find_by_username('member').id == user_id
+    assert repos.users.find_by_username('nobody') is None
+    assert repos.client.stats['queries'] == 0
+
+    with pytest.raises(UsernameTaken):
+        create_user('member', 'Other', 'pass')
+    assert len(list(repos.client.collection('users').stream())) == 1
+
+def test_username_index_backfill(client, app):
+    """색인 이전에 만든 사용자도 마이그레이션 후 로그인할 수 있는지 테스트"""
+    db_fs = get_repos().client
+    db_fs.collection('users').add({'username': 'legacy', 'name': 'Legacy', 'is_admin': False,
+                                   'password': generate_password_hash('pass', method='pbkdf2:sha256')})
+    assert get_repos().users.find_by_username('legacy') is None
+
+    assert migrations.backfill_username_index(db_fs) == 1
+    assert migrations.backfill_username_index(db_fs) == 0
+    response = client.post('/login', data={'username': 'legacy', 'password': 'pass'})
+    assert response.headers['Location'] == '/'
+
+def test_provisioning_race(app, monkeypatch, tmp_path):
+    """다른 워커가 먼저 관리자를 만들어도 프로비저닝을 완료로 기록하는지 테스트"""
+    db_fs = get_repos().client
+    create_user('admin', '관리자', 'pass', is_admin=True)
+    # 확인 시점에는 없었던 것처럼 보이게 하여 생성 경합을 재현
+    monkeypatch.setattr(type(get_repos().users), 'find_by_username', lambda self, username: None)
+    marker = str(tmp_path / 'provisioned')
+    assert provisioning.ensure_provisioned(db_fs, marker_path=marker)
+    assert db_fs.collection('meta').document('provisioning').get().exists
+    assert open(marker).read() == str(provisioning.PROVISION_VERSION)
+
+def test_readiness(client, app, monkeypatch):
+    """준비 상태 점검과, 클라이언트 초기화 실패 시 재시도 대기 동안 설정을 다시 읽지 않는지 테스트"""
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['ready'] is True
+
+    attempts = []
+    monkeypatch.setattr(firebase_config, '_load_credentials', lambda: attempts.append(1) or (None, None))
+    firebase_config.configure_backend('firestore')
+    assert firebase_config.get_db() is None
+    assert firebase_config.get_db() is None
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['failures'] == 1
+    assert len(attempts) == 1
+
+    # 재시도 시각이 지나면 다시 시도
+    monkeypatch.setattr(firebase_config, '_retry_at', 0.0)
+    assert firebase_config.get_db() is None
+    assert len(attempts) == 2
+    assert firebase_config.db_status()['failures'] == 2
+
+def test_rate_limit(client, app, tmp_path):
+    """한도를 넘은 로그인/댓글 요청이 Firestore 호출 없이 429 로 거절되는지 테스트"""
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_LOGIN='2/minute', RATE_LIMIT_COMMENT='1/hour',
+                      RATE_LIMIT_SHARED_DIR='')
+    rate_limiter.init_app(app)
+    create_user('writer', 'Writer', 'pass')
+    writer = app.test_client()
+    writer.post('/login', data={'username': 'writer', 'password': 'pass'})
+
+    client.post('/login', data={'username': 'writer', 'password': 'wrong'})
+    db_fs = get_repos().client
+    db_fs.reset_stats()
+    response = client.post('/login', data={'username': 'writer', 'password': 'pass'})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert db_fs.stats['queries'] == 0 and db_fs.stats['gets'] == 0
+    # 로그인 화면(GET)은 세지 않음
+    assert client.get('/login').status_code == 200
+
+    # 로그인한 사용자는 IP 가 아니라 사용자 ID 로 셈
+    post_id = get_repos().posts.create(Post(None, 'Hello', 'content', 'someone', 'Someone'))
+    assert writer.post(f'/post/{post_id}/comment', data={'content': 'first'}).status_code == 302
+    assert writer.post(f'/post/{post_id}/comment', data={'content': 'second'}).status_code == 429
+    stats = rate_limiter.stats()
+    assert stats['login'] == {'allowed': 2, 'limited': 1}
+    assert stats['comment'] == {'allowed': 1, 'limited': 1}
+
+    # 여러 IP 에서 한 계정을 노려도 아이디별 한도로 막힘
+    app.config.update(RATE_LIMIT_LOGIN_ACCOUNT='3/hour')
+    rate_limiter.init_app(app)
+    codes = [app.test_client().post('/login', data={'username': 'Writer', 'password': 'guess'},
+                                    environ_base={'REMOTE_ADDR': f'10.0.0.{i}'}).status_code for i in range(4)]
+    assert codes[-1] == 429 and 429 not in codes[:3]
+
+    # 프록시 뒤에서는 신뢰하는 프록시가 덧붙인 주소로 셈 (클라이언트가 보낸 앞쪽 항목은 무시)
+    app.config.update(RATE_LIMIT_TRUSTED_PROXIES=2)
+    rate_limiter.init_app(app)
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.1.1.1'},
+                                  headers={'X-Forwarded-For': '6.6.6.6, 1.2.3.4, 10.9.9.9'}):
+        assert rate_limiter.client_key() == 'ip:1.2.3.4'
+
+    # 워커 간 공유 저장소: 다른 프로세스(인스턴스)가 쓴 토큰 소모가 보임
+    first, second = SharedBuckets(str(tmp_path), slots=64), SharedBuckets(str(tmp_path), slots=64)
+    assert first.take('login:ip:1.2.3.4', 2, 2 / 60)[0]
+    assert second.take('login:ip:1.2.3.4', 2, 2 / 60)[0]
+    allowed, retry_after = first.take('login:ip:1.2.3.4', 2, 2 / 60)
+    assert not allowed and 0 < retry_after <= 30
@@ -1,18 +1,33 @@
+import gzip
+import os
+import time
 import pytest
+from datetime import timedelta
 from app import create_app
-from models import db, User, Post
+from cache import Cache, SharedMemoryStore, cache
+from compression import compress
+from fragments import fragment_cache
+from cascade import cascade_worker
+from posts_view import posts_view
+from view_counter import view_counter
+from models import Post, Comment, get_now_kst
+from repositories import get_repos
 from werkzeug.security import generate_password_hash
 
 @pytest.fixture
 def app():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
+    app = create_app({
+        'TESTING': True,
+        'DATABASE_BACKEND': 'memory',
+        'CACHE_SHARED_DIR': '',
+        'AUDIT_LOG_ASYNC': False,
+        'PROVISION_ON_STARTUP': False,
+        'PASSWORD_POOL_WORKERS': 0,
+        'CASCADE_WORKER_ENABLED': False,
+        'RATE_LIMIT_ENABLED': False,
+        'VIEW_COUNTER_ENABLED': False
+    })
+    yield app
 
 @pytest.fixture
 def client(app):
@@ -24,66 +39,591 @@ def login(client, username, password):
         password=password
     ), follow_redirects=True)
 
+def create_user(username, name, password, is_admin=False):
+    return get_repos().users.create(
+        username, name, generate_password_hash(password, method='pbkdf2:sha256'), is_admin=is_admin)
+
+def create_post(title, author_id, author_name, minutes_ago=0, content='content'):
+    post = Post(None, title, content, author_id, author_name,
+                date_posted=get_now_kst() - timedelta(minutes=minutes_ago))
+    return get_repos().posts.create(post)
+
+def find_post_id(title):
+    docs = get_repos().posts.collection.where('title', '==', title).limit(1).stream()
+    return next(docs).id
+
 def test_board_crud(client, app):
     """게시판 CRUD 기본 기능 테스트"""
     # 1. 사용자 생성 및 로그인
-    with app.app_context():
-        user = User(username='writer', name='Writer', password=generate_password_hash('pass', method='pbkdf2:sha256'))
-        db.session.add(user)
-        db.session.commit()
-    
+    create_user('writer', 'Writer', 'pass')
+
     login(client, 'writer', 'pass')
-    
+
     # 2. 글 작성
     response = client.post('/post/new', data=dict(
         title='Test Post',
         content='This is a test content'
     ), follow_redirects=True)
     assert b'Test Post' in response.data
-    
+
     # 홈 화면에서 글이 보이는지 확인 (추가된 검증)
     response = client.get('/', follow_redirects=True)
     assert b'Test Post' in response.data
-    
+
     # 3. 글 수정
-    with app.app_context():
-        post = Post.query.filter_by(title='Test Post').first()
-        post_id = post.id
-        
+    post_id = find_post_id('Test Post')
+
     response = client.post(f'/post/{post_id}/update', data=dict(
         title='Updated Post',
         content='Updated content'
     ), follow_redirects=True)
     assert b'Updated Post' in response.data
-    
+
     # 4. 글 삭제
     response = client.post(f'/post/{post_id}/delete', follow_redirects=True)
     assert b'\xec\x82\xad\xec\xa0\x9c\xeb\x90\x98\xec\x97\x88\xec\x8a\xb5\xeb\x8b\x88\xeb\x8b\xa4' in response.data # '삭제되었습니다'
 
 def test_admin_authority(client, app):
     """관리자의 타인 게시글 관리 권한 테스트"""
-    with app.app_context():
-        user = User(username='user', name='User', password=generate_password_hash('pass', method='pbkdf2:sha256'))
-        admin = User(username='admin_boss', name='Admin', password=generate_password_hash('pass', method='pbkdf2:sha256'), is_admin=True)
-        db.session.add(user)
-        db.session.add(admin)
-        db.session.commit()
-        
-        post = Post(title='User Post', content='Secret', author=user)
-        db.session.add(post)
-        db.session.commit()
-        post_id = post.id
+    user_id = create_user('user', 'User', 'pass')
+    create_user('admin_boss', 'Admin', 'pass', is_admin=True)
+    post_id = create_post('User Post', user_id, 'User', content='Secret')
 
     # 1. 관리자로 로그인
     login(client, 'admin_boss', 'pass')
-    
+
     # 2. 다른 사용자의 글 수정 시도
     response = client.post(f'/post/{post_id}/update', data=dict(
         title='Admin Hijacked',
         content='I am admin'
     ), follow_redirects=True)
     assert b'Admin Hijacked' in response.data
-    
+
     # 3. 다른 사용자의 글 삭제 시도
     response = client.post(f'/post/{post_id}/delete', follow_redirects=True)
     assert b'\xec\x82\xad\xec\xa0\x9c\xeb\x90\x98\xec\x97\x88\xec\x8a\xb5\xeb\x8b\x88\xeb\x8b\xa4' in response.data
+
+def test_feed_pagination_cost(client, app):
+    """피드 한 페이지의 조회 비용이 게시글 수와 무관한지 테스트"""
+    user_id = create_user('writer', 'Writer', 'pass')
+    page_size = app.config['FEED_PAGE_SIZE']
+    for i in range(page_size * 3):
+        create_post(f'Post {i}', user_id, 'Writer', minutes_ago=i)
+
+    db_fs = get_repos().client
+    db_fs.reset_stats()
+    response = client.get('/')
+    assert response.status_code == 200
+    # 고정 게시글 쿼리 + 일반 게시글 쿼리
+    assert db_fs.stats['queries'] == 2
+    assert db_fs.stats['documents_returned'] == page_size + 1
+    assert b'Post 0' in response.data
+    assert f'Post {page_size}'.encode() not in response.data
+
+    _, _, next_cursor = get_repos().posts.feed_page(None, page_size, 5)
+    response = client.get(f'/?cursor={next_cursor}')
+    assert f'Post {page_size}'.encode() in response.data
+    assert b'Post 0<' not in response.data
+
+def test_cursor_ties(client, app):
+    """정렬 값이 같은 글/댓글이 페이지 경계에서 빠지거나 중복되지 않는지 테스트"""
+    app.config['FEED_PAGE_SIZE'] = 2
+    repos = get_repos()
+    same_time = get_now_kst()
+    for i in range(5):
+        repos.posts.create(Post(None, f'Tie {i}', 'content', 'someone', 'Someone', date_posted=same_time))
+    post_id = find_post_id('Tie 0')
+    for i in range(5):
+        repos.comments.add(Comment(None, post_id, 'someone', 'Someone', f'c{i}', timestamp=same_time))
+
+    def walk(load):
+        seen, cursor = [], None
+        while True:
+            items, cursor = load(cursor)
+            seen.extend(items)
+            if not cursor:
+                return seen
+
+    feed = walk(lambda cursor: repos.posts.feed_page(cursor, 2, 5)[1:])
+    assert sorted(post.title for post in feed) == [f'Tie {i}' for i in range(5)]
+    comments = walk(lambda cursor: repos.comments.page(post_id, cursor, 2))
+    assert sorted(comment.content for comment in comments) == [f'c{i}' for i in range(5)]
+
+    # 구체화 뷰도 같은 커서로 같은 순서를 돌려줌
+    app.config.update(POSTS_VIEW_ENABLED=True, POSTS_VIEW_CHECK_INTERVAL=3600)
+    posts_view.init_app(app)
+    client.get('/')
+    assert posts_view.ready()
+    assert [post.id for post in walk(lambda cursor: posts_view.feed_page(cursor, 2, 5)[1:])] == \
+        [post.id for post in feed]
+
+def test_pinned_overflow(client, app):
+    """고정 게시글이 FEED_PINNED_LIMIT 보다 많아도 모든 글이 한 번씩 나오는지 테스트"""
+    user_id = create_user('writer', 'Writer', 'pass')
+    for i in range(4):
+        post_id = create_post(f'Pinned {i}', user_id, 'Writer', minutes_ago=i)
+        get_repos().posts.set_pinned(get_repos().posts.get(post_id), True)
+    for i in range(3):
+        create_post(f'Normal {i}', user_id, 'Writer', minutes_ago=10 + i)
+    expected = [f'Pinned {i}' for i in range(4)] + [f'Normal {i}' for i in range(3)]
+
+    def walk(load):
+        pinned, posts, cursor = load(None)
+        seen = pinned + posts
+        while cursor:
+            _, posts, cursor = load(cursor)
+            seen.extend(posts)
+        return seen
+
+    feed = walk(lambda cursor: get_repos().posts.feed_page(cursor, 2, 2))
+    assert [post.title for post in feed] == expected
+
+    # 구체화 뷰도 같은 결과
+    app.config.update(POSTS_VIEW_ENABLED=True, POSTS_VIEW_CHECK_INTERVAL=3600)
+    posts_view.init_app(app)
+    client.get('/')
+    assert posts_view.ready()
+    assert [post.id for post in walk(lambda cursor: posts_view.feed_page(cursor, 2, 2))] == [post.id for post in feed]
+
+    # 첫 화면에는 한도만큼의 고정 게시글 뒤에 넘친 고정 게시글이 이어서 나옴
+    app.config.update(FEED_PAGE_SIZE=2, FEED_PINNED_LIMIT=2)
+    html = client.get('/').get_data(as_text=True)
+    assert html.index('Pinned 1') < html.index('Pinned 2') < html.index('Pinned 3')
+    assert 'Normal 0' not in html
+
+def test_cache_shared_ttl(tmp_path):
+    """공유 단계에서 가져온 항목이 워커 로컬 캐시에 원래 TTL 보다 오래 남지 않는지 테스트"""
+    app = type('App', (), {'config': {'CACHE_SHARED_DIR': str(tmp_path), 'CACHE_DEFAULT_TTL': 60}, 'extensions': {}})
+    writer, reader = Cache(), Cache()
+    writer.init_app(app)
+    reader.init_app(app)
+    writer.set('feed-version', 1, ttl=0.2)
+    assert reader.get('feed-version') == 1
+    time.sleep(0.3)
+    assert reader.get('feed-version') is None
+
+def test_cache_shared_dir_permissions(tmp_path):
+    """공유 캐시 디렉터리는 0700 으로 만들고, 다른 사용자가 쓸 수 있거나 소유한 디렉터리는 쓰지 않는지 테스트"""
+    directory = tmp_path / 'shared'
+    SharedMemoryStore(str(directory))
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        SharedMemoryStore(str(directory))
+
+    if os.getuid() == 0:
+        foreign = tmp_path / 'foreign'
+        foreign.mkdir()
+        os.chown(foreign, 12345, 12345)
+        with pytest.raises(PermissionError):
+            SharedMemoryStore(str(foreign))
+        app = type('App', (), {'config': {'CACHE_SHARED_DIR': str(foreign)}, 'extensions': {}})
+        assert Cache(app).shared is None
+
+def test_pinned_posts_first(client, app):
+    """고정된 게시글이 최신 글보다 먼저 보이는지 테스트"""
+    create_user('admin_boss', 'Admin', 'pass', is_admin=True)
+    old_id = create_post('Old Notice', 'someone', 'Someone', minutes_ago=60)
+    create_post('Fresh Post', 'someone', 'Someone')
+
+    login(client, 'admin_boss', 'pass')
+    client.post(f'/post/{old_id}/pin')
+
+    html = client.get('/').get_data(as_text=True)
+    assert html.index('Old Notice') < html.index('Fresh Post')
+
+def test_comment_count(client, app):
+    """댓글 작성/삭제 시 comment_count 가 함께 갱신되는지 테스트"""
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Talk', user_id, 'Writer')
+    login(client, 'writer', 'pass')
+
+    client.post(f'/post/{post_id}/comment', data={'content': 'first'})
+    client.post(f'/post/{post_id}/comment', data={'content': 'second'})
+    assert get_repos().posts.get(post_id).comment_count == 2
+
+    comments, _ = get_repos().comments.page(post_id, None, 10)
+    client.post(f'/comment/{comments[0].id}/delete')
+    assert get_repos().posts.get(post_id).comment_count == 1
+    assert b'second' in client.get(f'/post/{post_id}').data
+
+def test_db_instrumentation(client, app):
+    """요청별 Firestore 호출이 Server-Timing 헤더와 /admin/metrics 에 집계되는지 테스트"""
+    create_user('admin_boss', 'Admin', 'pass', is_admin=True)
+    create_post('Hello', 'someone', 'Someone')
+
+    response = client.get('/')
+    # 피드 버전 문서 1건 + 고정/일반 게시글 쿼리
+    assert '2 queries, 1 gets, 2 reads' in response.headers['Server-Timing']
+
+    login(client, 'admin_boss', 'pass')
+    metrics = client.get('/admin/metrics').get_data(as_text=True)
+    # 로그인 후 첫 화면은 피드 캐시 적중 + 세션 사용자 문서 1건 조회
+    assert 'hyyum_firestore_reads_total{route="/"} 3' in metrics
+    assert 'hyyum_request_duration_seconds_count{route="/admin/metrics"}' not in metrics
+
+def test_read_budget_strict(app):
+    """개발 모드에서 읽기 예산을 넘긴 요청은 500 으로 실패하는지 테스트"""
+    app = create_app({
+        'TESTING': True,
+        'DATABASE_BACKEND': 'memory',
+        'CACHE_ENABLED': False,
+        'CACHE_SHARED_DIR': '',
+        'AUDIT_LOG_ASYNC': False,
+        'PROVISION_ON_STARTUP': False,
+        'DB_READ_BUDGET': 3,
+        'DB_READ_BUDGET_STRICT': True
+    })
+    for i in range(5):
+        create_post(f'Post {i}', 'someone', 'Someone', minutes_ago=i)
+    response = app.test_client().get('/')
+    assert response.status_code == 500
+    assert b'read budget exceeded' in response.data
+
+def test_search(client, app):
+    """bigram 색인 검색이 글 작성/수정/삭제를 따라가는지 테스트"""
+    create_user('writer', 'Writer', 'pass')
+    login(client, 'writer', 'pass')
+    client.post('/post/new', data={'title': '동아리 모집 공고', 'content': '신입 부원을 모집합니다'})
+    client.post('/post/new', data={'title': '잡담', 'content': '오늘 동아리방에 갔다'})
+
+    # 제목에 나온 글이 본문에만 나온 글보다 먼저
+    html = client.get('/search?q=동아리').get_data(as_text=True)
+    assert html.index('동아리 모집 공고') < html.index('잡담')
+    assert '잡담' not in client.get('/search?q=부원').get_data(as_text=True)
+
+    post_id = find_post_id('잡담')
+    client.post(f'/post/{post_id}/update', data={'title': '잡담', 'content': '오늘은 도서관'})
+    assert '잡담' not in client.get('/search?q=동아리').get_data(as_text=True)
+    assert '잡담' in client.get('/search?q=도서관').get_data(as_text=True)
+
+    # 한 글자 검색어도 그 글자가 들어간 긴 단어와 맞음
+    assert '잡담' in client.get('/search?q=관').get_data(as_text=True)
+    assert '잡담' not in client.get('/search?q=관리').get_data(as_text=True)
+
+    # 토큰 postings 가 한도에 닿으면 결과가 잘렸다고 알림
+    app.config['SEARCH_MAX_POSTINGS'] = 1
+    html = client.get('/search?q=오늘').get_data(as_text=True)
+    assert '일부만 찾았습니다' in html
+    app.config['SEARCH_MAX_POSTINGS'] = 2000
+
+    client.post(f'/post/{post_id}/delete')
+    assert '잡담' not in client.get('/search?q=도서관').get_data(as_text=True)
+    assert list(get_repos().search.postings.where('post_id', '==', post_id).stream()) == []
+
+def test_search_pagination(client, app):
+    """검색 결과 커서 페이지네이션 테스트"""
+    app.config['SEARCH_PAGE_SIZE'] = 2
+    repos = get_repos()
+    for i in range(5):
+        post_id = create_post(f'공지 {i}', 'someone', 'Someone')
+        repos.search.index_post(post_id, f'공지 {i}', '내용')
+
+    ranked, truncated = repos.search.rank('공지', 100)
+    assert not truncated
+    page, next_cursor = repos.search.page(ranked, None, 2)
+    seen = [post_id for _, post_id in page]
+    while next_cursor:
+        page, next_cursor = repos.search.page(ranked, next_cursor, 2)
+        seen.extend(post_id for _, post_id in page)
+    assert len(seen) == len(set(seen)) == 5
+
+    response = client.get(f'/search?q=공지&cursor={ranked[1][0]}:{ranked[1][1]}')
+    assert response.status_code == 200
+    assert client.get('/search?q=공지&cursor=oops').status_code == 400
+
+def test_conditional_get(client, app):
+    """변경이 없으면 304, 글/댓글/로그인 상태가 바뀌면 새로 렌더링하는지 테스트
+
+    댓글은 피드 버전을 올리지 않으므로 피드는 피드 캐시가 만료된 뒤 새로 렌더링됩니다.
+    """
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Hello', user_id, 'Writer')
+
+    response = client.get('/')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert 'Last-Modified' in response.headers
+    db_fs = get_repos().client
+    db_fs.reset_stats()
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert db_fs.stats['queries'] == 0
+
+    # 피드 캐시가 만료되어 다시 읽어도 내용이 같으면 304
+    cache.invalidate('feed')
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    # 로그인하면 같은 피드라도 다른 ETag
+    login(client, 'writer', 'pass')
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+
+    response = client.get(f'/post/{post_id}')
+    post_etag = response.headers['ETag']
+    assert client.get(f'/post/{post_id}', headers={'If-None-Match': post_etag}).status_code == 304
+
+    # 댓글 작성 후 게시글은 바로, 피드는 다음 주기에 새로 렌더링
+    feed_etag = client.get('/').headers['ETag']
+    version = get_repos().posts.feed_version()[0]
+    client.post(f'/post/{post_id}/comment', data={'content': 'hi'})
+    assert get_repos().posts.feed_version()[0] == version
+    response = client.get(f'/post/{post_id}', headers={'If-None-Match': post_etag})
+    assert response.status_code == 200
+    assert b'hi' in response.data
+    assert client.get('/', headers={'If-None-Match': feed_etag}).status_code == 304
+    cache.invalidate('feed')
+    response = client.get('/', headers={'If-None-Match': feed_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != feed_etag
+
+def test_compression_and_streaming(client, app):
+    """피드가 스트리밍 + gzip 으로 전송되고, 플래시 메시지는 한 번만 보이는지 테스트"""
+    create_user('writer', 'Writer', 'pass')
+    login(client, 'writer', 'pass')
+    response = client.post('/post/new', data={'title': 'Streamed', 'content': 'body ' * 100},
+                           follow_redirects=True)
+    assert '게시글이 등록되었습니다!' in response.get_data(as_text=True)
+    assert '게시글이 등록되었습니다!' not in client.get('/').get_data(as_text=True)
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'Streamed' in gzip.decompress(response.data)
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+    response = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+    # 최소 크기보다 작은 (스트리밍이 아닌) 응답은 압축하지 않음
+    compress.min_size = 10 ** 6
+    response = client.get('/search', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+def test_fragment_cache(client, app):
+    """게시글 카드 조각이 사용자와 상관없이 재사용되고, 글이 바뀌면 다시 렌더링되는지 테스트"""
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Cached Card', user_id, 'Writer')
+    client.get(f'/post/{post_id}')
+    login(client, 'writer', 'pass')
+    client.post(f'/post/{post_id}/comment', data={'content': 'nice'})
+
+    fragment_cache.clear()
+    assert b'Cached Card' in app.test_client().get('/').data
+    assert fragment_cache.stats()['misses'] == 1
+    # 로그인한 다른 사용자 화면에서도 같은 조각을 사용
+    assert b'Cached Card' in client.get('/').data
+    assert fragment_cache.stats()['hits'] == 1
+
+    # 댓글 조각은 공유하되 삭제 버튼은 사용자별로 표시
+    html = client.get(f'/post/{post_id}').get_data(as_text=True)
+    assert 'nice' in html and 'delete-comment-' in html
+    html = app.test_client().get(f'/post/{post_id}').get_data(as_text=True)
+    assert 'nice' in html and 'delete-comment-' not in html
+
+    client.post(f'/post/{post_id}/update', data={'title': 'Renamed Card', 'content': 'x'})
+    html = client.get('/').get_data(as_text=True)
+    assert 'Renamed Card' in html and 'Cached Card' not in html
+
+def test_cascade_delete_comments(client, app):
+    """게시글 삭제 후 댓글이 백그라운드 작업으로 배치 단위로 지워지는지 테스트"""
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Doomed', user_id, 'Writer')
+    other_id = create_post('Kept', user_id, 'Writer')
+    repos = get_repos()
+    for i in range(5):
+        repos.comments.add(Comment(None, post_id, user_id, 'Writer', f'c{i}'))
+    repos.comments.add(Comment(None, other_id, user_id, 'Writer', 'keep'))
+    login(client, 'writer', 'pass')
+
+    # 삭제 응답은 댓글을 지우지 않고 작업만 등록
+    client.post(f'/post/{post_id}/delete')
+    assert len(list(repos.comments.collection.where('post_id', '==', post_id).stream())) == 5
+    assert repos.jobs.recent(10)[0].status == 'pending'
+
+    # 점유한 워커가 죽어 lease 가 만료된 작업도 다른 워커가 이어서 처리
+    repos.jobs.claim('crashed-worker', -1)
+    cascade_worker.batch_size = 2
+    cascade_worker.batch_interval = 0
+    assert cascade_worker.run_pending() == 1
+
+    job = repos.jobs.recent(10)[0]
+    assert (job.status, job.deleted, job.batches, job.attempts) == ('done', 5, 3, 2)
+    assert not list(repos.comments.collection.where('post_id', '==', post_id).stream())
+    assert repos.comments.page(other_id, None, 10)[0][0].content == 'keep'
+    assert cascade_worker.run_pending() == 0
+
+    client.get('/logout')
+    create_user('boss', 'Boss', 'pass', is_admin=True)
+    login(client, 'boss', 'pass')
+    assert '완료' in client.get('/admin').get_data(as_text=True)
+
+def test_cascade_lease_and_wake(client, app):
+    """lease 를 빼앗긴 워커는 댓글을 지우지 못하고, 요청은 감시 스레드를 띄우지 않는지 테스트"""
+    app.config['CASCADE_WORKER_ENABLED'] = True
+    cascade_worker.init_app(app)
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Doomed', user_id, 'Writer')
+    repos = get_repos()
+    repos.comments.add(Comment(None, post_id, user_id, 'Writer', 'c'))
+    repos.posts.delete(post_id)
+
+    # lease 가 끝난 워커가 배치를 준비하는 사이 다른 워커가 작업을 맡으면 예전 워커의 배치는 기록되지 않음
+    stale = repos.jobs.claim('stale-worker', -1)
+    original = repos.jobs.views.delete
+    repos.jobs.views.delete = lambda post_id: (original(post_id), repos.jobs.claim('new-worker', 60))
+    try:
+        assert repos.jobs.delete_comment_batch(stale, 'stale-worker', 10, 60) is None
+    finally:
+        repos.jobs.views.delete = original
+    assert len(list(repos.comments.collection.where('post_id', '==', post_id).stream())) == 1
+
+    # 일반 요청은 감시 스레드를 시작하지 않음
+    client.get('/')
+    assert cascade_worker._thread is None
+
+    # wake() 는 남은 작업을 처리하고 끝나는 스레드만 띄움 (new-worker 의 lease 가 끝나면 이어받음)
+    repos.jobs.collection.document(stale.id).update({'lease_until': get_now_kst() - timedelta(seconds=1)})
+    cascade_worker.wake()
+    cascade_worker._thread.join(5)
+    assert not cascade_worker._thread.is_alive()
+    assert repos.jobs.recent(1)[0].status == 'done'
+    assert not list(repos.comments.collection.where('post_id', '==', post_id).stream())
+
+def test_posts_view(app):
+    """구체화 뷰가 준비되면 피드/게시글을 Firestore 호출 없이 제공하고, 끊기면 다시 붙는지 테스트"""
+    app.config.update(POSTS_VIEW_ENABLED=True, POSTS_VIEW_CHECK_INTERVAL=3600, POSTS_VIEW_RECONNECT_BASE=0)
+    posts_view.init_app(app)
+    user_id = create_user('writer', 'Writer', 'pass')
+    create_post('Old', user_id, 'Writer', minutes_ago=10)
+    pinned_id = create_post('Notice', user_id, 'Writer', minutes_ago=20)
+    get_repos().posts.set_pinned(get_repos().posts.get(pinned_id), True)
+    client = app.test_client()
+    client.get('/')
+    assert posts_view.ready()
+
+    db_fs = get_repos().client
+    db_fs.reset_stats()
+    html = client.get('/').get_data(as_text=True)
+    assert html.index('Notice') < html.index('Old')
+    assert db_fs.stats['queries'] == 0 and db_fs.stats['gets'] == 0
+
+    # 새 글과 삭제가 리스너를 통해 반영되고, 검증값도 바뀜
+    etag = client.get('/').headers['ETag']
+    new_id = create_post('Fresh', user_id, 'Writer')
+    html = client.get('/').get_data(as_text=True)
+    assert 'Fresh' in html and client.get('/').headers['ETag'] != etag
+    assert 'Fresh' in client.get(f'/post/{new_id}').get_data(as_text=True)
+    get_repos().posts.collection.document(new_id).delete()
+    assert 'Fresh' not in client.get('/').get_data(as_text=True)
+
+    # 리스너가 끊기면 감시가 다시 붙이고 전체 스냅샷으로 뷰를 새로 만듦
+    posts_view._watch.unsubscribe()
+    assert posts_view.ready()
+    assert posts_view.check()
+    assert posts_view.stats()['reconnects'] == 1 and posts_view.stats()['posts'] == 2
+
+    # 끄면 기존 조회 경로로 돌아감
+    app.config['POSTS_VIEW_ENABLED'] = False
+    posts_view.init_app(app)
+    assert not posts_view.ready()
+    assert 'Notice' in client.get('/').get_data(as_text=True)
+
+def test_view_counter(client, app):
+    """조회 수를 메모리에 모았다가 샤드에 일괄 기록하고, 합계를 게시글 문서로 옮기는지 테스트"""
+    app.config.update(VIEW_COUNTER_ENABLED=True, VIEW_COUNTER_SHARDS=4, VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    view_counter.init_app(app)
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Popular', user_id, 'Writer')
+    other_id = create_post('Quiet', user_id, 'Writer', minutes_ago=1)
+    repos = get_repos()
+
+    # 조회 요청은 Firestore 에 쓰지 않음
+    db_fs = repos.client
+    db_fs.reset_stats()
+    for _ in range(5):
+        client.get(f'/post/{post_id}')
+    client.get(f'/post/{other_id}')
+    assert db_fs.stats['commits'] == 0
+    assert view_counter.stats()['pending_views'] == 6
+
+    # 플러시 두 번이 서로 다른 샤드에 가도 합계는 같음
+    assert view_counter.flush() == 2
+    for _ in range(3):
+        client.get(f'/post/{post_id}')
+    view_counter.flush()
+    assert repos.views.totals([post_id, other_id], 4) == {post_id: 8, other_id: 1}
+
+    # 롤업 후 피드와 게시글 화면에 추가 읽기 없이 표시
+    assert view_counter.rollup() == 2
+    assert repos.posts.get(post_id).view_count == 8
+    assert '👁 8' in app.test_client().get('/').get_data(as_text=True)
+    assert '조회 8' in client.get(f'/post/{post_id}').get_data(as_text=True)
+
+    # 기록 실패 시 증가분을 되돌려 다음 플러시 때 기록
+    original = repos.views.add_many
+    repos.views.add_many = lambda counts, shard: 1 / 0
+    assert view_counter.flush() == 0
+    repos.views.add_many = original
+    assert view_counter.stats()['pending_views'] == 1
+    view_counter.flush()
+    assert repos.views.totals([post_id], 4) == {post_id: 9}
+
+    # 삭제 요청은 샤드를 건드리지 않고, cascade 작업이 댓글과 함께 샤드를 지움. 롤업은 삭제된 글을 건너뜀
+    login(client, 'writer', 'pass')
+    client.get(f'/post/{other_id}')
+    view_counter.flush()
+    client.post(f'/post/{other_id}/delete')
+    assert repos.views.totals([other_id], 4) == {other_id: 2}
+    cascade_worker.run_pending()
+    assert repos.views.totals([other_id], 4) == {other_id: 0}
+    assert view_counter.rollup() == 1
+
+    # 작업이 끝난 뒤 다른 워커가 늦게 플러시한 샤드는 롤업이 지움
+    repos.views.add_many({other_id: 1}, 0)
+    assert repos.views.rollup(repos.views.totals([other_id], 4)) == 0
+    assert repos.views.totals([other_id], 4) == {other_id: 0}
+
+    # 다른 워커가 예전 합계로 늦게 롤업해도 조회 수가 줄지 않음
+    assert repos.views.rollup({post_id: 5}) == 0
+    assert repos.posts.get(post_id).view_count == 9
+
+def test_view_counter_not_modified(client, app):
+    """304 재검증은 조회로 세지 않는지 테스트"""
+    app.config.update(VIEW_COUNTER_ENABLED=True, VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    view_counter.init_app(app)
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Popular', user_id, 'Writer')
+
+    etag = client.get(f'/post/{post_id}').headers['ETag']
+    for _ in range(3):
+        assert client.get(f'/post/{post_id}', headers={'If-None-Match': etag}).status_code == 304
+    assert view_counter.stats()['pending_views'] == 1
+
+def test_view_rollup_feed_etag(client, app):
+    """롤업은 피드 버전을 올리지 않고, 피드 캐시가 만료되면 새 조회 수와 새 ETag 를 받는지 테스트"""
+    app.config.update(VIEW_COUNTER_ENABLED=True, VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    view_counter.init_app(app)
+    user_id = create_user('writer', 'Writer', 'pass')
+    post_id = create_post('Popular', user_id, 'Writer')
+
+    response = client.get('/')
+    etag = response.headers['ETag']
+    version = get_repos().posts.feed_version()[0]
+
+    for _ in range(3):
+        client.get(f'/post/{post_id}')
+    view_counter.flush()
+    assert view_counter.rollup() == 1
+    assert get_repos().posts.feed_version()[0] == version
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    # 피드 캐시 만료 후 재검증하면 새 조회 수
+    cache.invalidate('feed')
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert '👁 3' in response.get_data(as_text=True)
+    assert client.get('/', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,165 @@
+"""게시글 조회 수 (워커별 메모리 집계 + 샤드 카운터)
+
+post_detail 은 record() 로 메모리의 카운터만 올리고 바로 응답합니다. (요청마다 Firestore 쓰기 없음)
+백그라운드 스레드가 VIEW_COUNTER_FLUSH_INTERVAL 마다 모인 증가분을 게시글의 샤드 문서 하나(플러시마다 무작위)에
+Increment 로 WriteBatch 단위 기록하고, VIEW_COUNTER_ROLLUP_INTERVAL 마다 이 워커가 기록한 글들의 샤드 합계를
+게시글 문서의 view_count 에 옮겨 둡니다. 피드와 게시글 화면은 이미 읽는 게시글 문서의 view_count 를 보여주므로
+조회 수를 위한 추가 읽기가 없습니다. 롤업은 meta/feed 를 건드리지 않으므로, 피드 카드의 조회 수는
+댓글 수처럼 피드 캐시가 만료될 때(FEED_CACHE_TTL) 반영됩니다. 게시글 화면은 롤업 직후 반영됩니다.
+304 재검증 요청은 조회로 세지 않습니다.
+
+삭제된 글의 샤드 문서는 댓글과 함께 cascade 작업이 지우고, 그 뒤 다른 워커가 늦게 플러시해 다시 생긴 샤드는
+그 워커의 다음 롤업이 지웁니다.
+
+워커가 비정상 종료되면 마지막 플러시 이후의 증가분(최대 FLUSH_INTERVAL 동안)만 잃습니다.
+정상 종료 시에는 atexit 으로 남은 증가분을 기록합니다.
+"""
+import atexit
+import os
+import random
+import threading
+import time
+from collections import Counter
+from cache import cache
+from repositories import get_repos
+
+# 롤업 때 get_all 한 번에 읽을 게시글 수 (읽기 수 = 게시글 수 x 샤드 수)
+ROLLUP_CHUNK = 100
+
+class ViewCounter:
+    def __init__(self, app=None):
+        self.enabled = True
+        self.shards = 8
+        self.flush_interval = 10.0
+        self.rollup_interval = 60.0
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._dirty = set()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(('recorded', 'flushed', 'flushes', 'shard_writes', 'rollups', 'rolled_up',
+                                     'failed_flushes', 'failed_rollups'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('VIEW_COUNTER_ENABLED', True)
+        self.shards = max(1, config.get('VIEW_COUNTER_SHARDS', 8))
+        self.flush_interval = config.get('VIEW_COUNTER_FLUSH_INTERVAL', 10.0)
+        self.rollup_interval = config.get('VIEW_COUNTER_ROLLUP_INTERVAL', 60.0)
+        with self._lock:
+            self._pending = Counter()
+            self._dirty = set()
+        app.extensions['view_counter'] = self
+
+    def _incr(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def record(self, post_id):
+        """조회 1회를 메모리에 더합니다. 예외를 던지지 않습니다."""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        with self._lock:
+            self._pending[post_id] += 1
+        self._incr('recorded')
+
+    def _ensure_started(self):
+        # fork 된 워커에서는 부모의 스레드가 없으므로 pid 가 바뀌면 다시 시작합니다.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # 부모가 모은 증가분은 부모가 기록하므로 물려받지 않습니다.
+                self._lock = threading.Lock()
+                self._pending, self._dirty = Counter(), set()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+
+    def _run(self):
+        next_rollup = time.monotonic() + self.rollup_interval
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            if time.monotonic() >= next_rollup:
+                self.rollup()
+                next_rollup = time.monotonic() + self.rollup_interval
+
+    def flush(self):
+        """모인 증가분을 샤드에 기록합니다. 실패하면 다음 플러시 때 다시 기록하도록 되돌려 둡니다."""
+        with self._lock:
+            counts, self._pending = self._pending, Counter()
+        if not counts:
+            return 0
+        repos = get_repos()
+        try:
+            if not repos:
+                raise RuntimeError("database unavailable")
+            # 워커마다, 플러시마다 다른 샤드를 골라 같은 문서에 쓰기가 몰리지 않게 합니다.
+            writes = repos.views.add_many(counts, random.randrange(self.shards))
+        except Exception as e:
+            with self._lock:
+                self._pending.update(counts)
+            self._incr('failed_flushes')
+            print(f"Error flushing view counts: {e}")
+            return 0
+        with self._lock:
+            self._dirty.update(counts)
+        self._incr('flushes')
+        self._incr('shard_writes', writes)
+        self._incr('flushed', sum(counts.values()))
+        return writes
+
+    def rollup(self):
+        """이 워커가 샤드에 기록한 글들의 합계를 게시글 문서의 view_count 에 옮깁니다."""
+        with self._lock:
+            post_ids, self._dirty = list(self._dirty), set()
+        if not post_ids:
+            return 0
+        repos = get_repos()
+        written = 0
+        for start in range(0, len(post_ids), ROLLUP_CHUNK):
+            chunk = post_ids[start:start + ROLLUP_CHUNK]
+            try:
+                if not repos:
+                    raise RuntimeError("database unavailable")
+                written += repos.views.rollup(repos.views.totals(chunk, self.shards))
+                cache.invalidate(*(f'post:{post_id}' for post_id in chunk))
+            except Exception as e:
+                with self._lock:
+                    self._dirty.update(chunk)
+                self._incr('failed_rollups')
+                print(f"Error rolling up view counts: {e}")
+        self._incr('rollups')
+        self._incr('rolled_up', written)
+        return written
+
+    def forget(self, post_id):
+        """삭제된 게시글의 미기록 증가분을 버립니다. (샤드 문서는 cascade 작업이 지움)"""
+        with self._lock:
+            self._pending.pop(post_id, None)
+            self._dirty.discard(post_id)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._lock:
+            stats['pending_posts'] = len(self._pending)
+            stats['pending_views'] = sum(self._pending.values())
+            stats['dirty_posts'] = len(self._dirty)
+        stats['enabled'] = self.enabled
+        stats['shards'] = self.shards
+        return stats
+
+view_counter = ViewCounter()